@@ -0,0 +1,142 @@
+import bisect
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Fixed-capacity float32 ring buffer for streaming audio.
+
+    Every sample is stored twice, at i and i + capacity, so any span of up to
+    `capacity` samples is contiguous in memory and can be handed out as a
+    zero-copy view. Nothing is allocated after construction.
+
+    Positions are absolute sample counts since the stream started. Samples
+    before the read pointer stay readable (e.g. for overlap or instant windows)
+    until they are overwritten, which happens `capacity` samples after they
+    were written. A view handed to another thread can be checked with
+    contains() once it is done with it, to tell whether it was overwritten
+    in the meantime.
+    """
+
+    def __init__(self, capacity: int, buffer=None):
+        """buffer, if given, backs the samples (2 * capacity float32), e.g. shared memory"""
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+
+        self.capacity = capacity
+        if buffer is None:
+            self._data = np.zeros(2 * capacity, dtype=np.float32)
+        else:
+            self._data = np.ndarray((2 * capacity,), dtype=np.float32, buffer=buffer)
+        self._write = 0  # Absolute position of the next sample to write
+        self._read = 0  # Absolute position of the first unread sample
+        self.dropped_samples = 0  # Unread samples lost to overwrites
+
+    def __len__(self) -> int:
+        """Number of unread samples"""
+        return self._write - self._read
+
+    @property
+    def write_position(self) -> int:
+        return self._write
+
+    @property
+    def read_position(self) -> int:
+        return self._read
+
+    def append(self, samples: np.ndarray):
+        """Copy samples in, overwriting the oldest data if the buffer is full"""
+        cap = self.capacity
+        n = len(samples)
+        if n > cap:
+            samples = samples[-cap:]
+            self._write += n - cap
+            n = cap
+
+        data = self._data
+        start = self._write % cap
+        end = start + n
+        if end <= cap:
+            data[start:end] = samples
+            data[start + cap:end + cap] = samples
+        else:
+            first = cap - start
+            data[start:cap] = samples[:first]
+            data[start + cap:] = samples[:first]
+            data[:end - cap] = samples[first:]
+            data[cap:end] = samples[first:]
+
+        self._write += n
+        oldest = self._write - self.capacity
+        if self._read < oldest:
+            self.dropped_samples += oldest - self._read
+            self._read = oldest
+
+    def view(self, length: int = None) -> np.ndarray:
+        """Zero-copy view of the first `length` unread samples (all by default)"""
+        available = len(self)
+        length = available if length is None else min(length, available)
+        return self.span(self._read, self._read + length)
+
+    def latest(self, length: int) -> np.ndarray:
+        """Zero-copy view of the last `length` samples written, read or not"""
+        length = min(length, self.capacity, self._write)
+        return self.span(self._write - length, self._write)
+
+    def contains(self, start: int) -> bool:
+        """Whether absolute sample position start has not been overwritten yet"""
+        return start >= self._write - self.capacity
+
+    def span(self, start: int, end: int) -> np.ndarray:
+        """Zero-copy view of the absolute sample range [start, end)"""
+        if end > self._write or start < self._write - self.capacity or end < start:
+            raise IndexError(f"Samples {start}:{end} are not in the buffer")
+
+        offset = start % self.capacity
+        return self._data[offset:offset + (end - start)]
+
+    def consume(self, length: int):
+        """Advance the read pointer, e.g. keep an overlap by consuming less than a window"""
+        self._read += max(0, min(length, len(self)))
+
+    def clear(self):
+        """Mark everything written so far as read"""
+        self._read = self._write
+
+
+class TimeMap:
+    """Maps buffer positions to session positions when stretches of audio are skipped.
+
+    Both are absolute sample counts. Every skip records how much audio was
+    left out before a buffer position, so times decoded from the buffer can
+    be reported on the session's real timeline.
+    """
+
+    def __init__(self):
+        self._positions = [0]  # Buffer positions where the offset changes
+        self._offsets = [0]  # Samples skipped before each of those positions
+
+    @property
+    def skipped(self) -> int:
+        return self._offsets[-1]
+
+    def skip(self, buffer_position: int, samples: int):
+        """Record that `samples` were left out right before buffer_position"""
+        if samples <= 0:
+            return
+        if self._positions[-1] == buffer_position:
+            self._offsets[-1] += samples
+        else:
+            self._positions.append(buffer_position)
+            self._offsets.append(self._offsets[-1] + samples)
+
+    def to_session(self, buffer_position: int) -> int:
+        i = bisect.bisect_right(self._positions, buffer_position) - 1
+        return buffer_position + self._offsets[max(i, 0)]
+
+    def prune(self, oldest: int):
+        """Forget breakpoints before buffer position oldest, they can't be looked up anymore"""
+        i = bisect.bisect_right(self._positions, oldest) - 1
+        if i > 0:
+            del self._positions[:i]
+            del self._offsets[:i]
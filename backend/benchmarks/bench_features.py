@@ -0,0 +1,94 @@
+"""Micro-benchmark: log-mel features per window vs StreamingLogMel.
+
+Simulates one session in instant mode: 4096-sample chunks, an instant window
+of 8 chunks every 6 chunks and a final window over the growing buffer every
+half window, like websocket_endpoint. The per-window baseline runs the same
+STFT as faster-whisper's FeatureExtractor on every window; the streaming
+extractor computes each frame once and windows are read from the cache.
+
+    python benchmarks/bench_features.py --seconds 60 --n-mels 128
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from features import StreamingLogMel  # noqa: E402
+
+CHUNK_SAMPLES = 4096
+N_FFT = 400
+HOP = 160
+
+
+def window_log_mel(audio, filters, window):
+    """FeatureExtractor.__call__ without the normalization"""
+    audio = np.pad(audio, (0, HOP))
+    audio = np.pad(audio, (N_FFT // 2, N_FFT // 2), mode="reflect")
+    n = 1 + (len(audio) - N_FFT) // HOP
+    frames = audio[np.arange(n)[:, None] * HOP + np.arange(N_FFT)] * window
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    return np.log10(np.maximum(filters @ power[:-1].T, 1e-10))
+
+
+def windows(total_chunks, instant_chunks, final_chunks):
+    """(start, end) sample ranges of every instant and final window"""
+    result = []
+    final_start = 0
+    for i in range(1, total_chunks + 1):
+        end = i * CHUNK_SAMPLES
+        if i >= instant_chunks and (i - instant_chunks) % (instant_chunks - 2) == 0:
+            result.append((i, end - instant_chunks * CHUNK_SAMPLES, end))
+        if i % (final_chunks // 2) == 0:
+            result.append((i, final_start, end))
+            if end - final_start >= final_chunks * CHUNK_SAMPLES:
+                final_start = end - CHUNK_SAMPLES * 2
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--n-mels", type=int, default=128)
+    parser.add_argument("--vad", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    total_chunks = args.seconds * 16000 // CHUNK_SAMPLES
+    audio = rng.normal(0, 0.1, total_chunks * CHUNK_SAMPLES).astype(np.float32)
+    filters = np.abs(rng.normal(size=(args.n_mels, N_FFT // 2 + 1))).astype(np.float32)
+    window = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+    final_chunks = 30 - args.vad * 2
+    plan = windows(total_chunks, 8, final_chunks)
+
+    start_time = time.perf_counter()
+    frames = 0
+    for _, start, end in plan:
+        frames += window_log_mel(audio[start:end], filters, window).shape[1]
+    per_window = time.perf_counter() - start_time
+
+    cache = StreamingLogMel(final_chunks * CHUNK_SAMPLES * 3 // HOP + 1)
+    cache.add_filterbank(filters)
+    start_time = time.perf_counter()
+    cached_frames = 0
+    pending = iter(plan)
+    job = next(pending, None)
+    for i in range(1, total_chunks + 1):
+        cache.append(audio[(i - 1) * CHUNK_SAMPLES:i * CHUNK_SAMPLES])
+        while job is not None and job[0] == i:
+            _, log_mel = cache.span(args.n_mels, job[1], job[2])
+            cached_frames += np.array(log_mel).shape[1]
+            job = next(pending, None)
+    streaming = time.perf_counter() - start_time
+
+    print(f"{len(plan)} windows over {args.seconds} s of audio, {args.n_mels} mel bins")
+    print(f"per window:  {per_window * 1000:8.1f} ms  ({frames} frames computed)")
+    print(f"streaming:   {streaming * 1000:8.1f} ms  ({cache.frames_written} frames computed, {cached_frames} read)")
+    print(f"speedup:     {per_window / streaming:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark: per-session audio buffering, list + np.concatenate vs AudioRingBuffer.
+
+Simulates many concurrent sessions each receiving 4096-sample chunks and cutting
+a window with 1/4 overlap every `buffer_size` chunks, like websocket_endpoint.
+
+    python benchmarks/bench_ring_buffer.py --sessions 100 --seconds 60
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from audio_buffer import AudioRingBuffer  # noqa: E402
+
+CHUNK_SAMPLES = 4096
+SAMPLE_RATE = 16000
+
+
+def setup_list(sessions, buffer_size):
+    return [[] for _ in range(sessions)]
+
+
+def run_list(buffers, chunks, buffer_size):
+    sessions = len(buffers)
+    windows = 0
+    for chunk in chunks:
+        for s in range(sessions):
+            buffer = buffers[s]
+            buffer.append(chunk)
+            if len(buffer) >= buffer_size:
+                window = np.concatenate(buffer)
+                buffers[s] = buffer[-(buffer_size // 4):]
+                windows += window.shape[0] > 0
+    return windows
+
+
+def setup_ring(sessions, buffer_size, ring_windows):
+    buffers = [AudioRingBuffer(buffer_size * CHUNK_SAMPLES * ring_windows) for _ in range(sessions)]
+    # Touch every page so the timed run measures steady state, not page faults
+    for buffer in buffers:
+        buffer._data.fill(0.0)
+    return buffers
+
+
+def run_ring(buffers, chunks, buffer_size):
+    window_samples = buffer_size * CHUNK_SAMPLES
+    overlap_samples = (buffer_size // 4) * CHUNK_SAMPLES
+    windows = 0
+    for chunk in chunks:
+        for buffer in buffers:
+            buffer.append(chunk)
+            if len(buffer) >= window_samples:
+                window = buffer.view()
+                buffer.consume(len(buffer) - overlap_samples)
+                windows += window.shape[0] > 0
+    return windows
+
+
+def measure(name, setup, fn, chunks, buffer_size):
+    """Time one run, then track bytes allocated in a second, untimed run (buffers excluded)"""
+    buffers = setup()
+    start = time.perf_counter()
+    windows = fn(buffers, chunks, buffer_size)
+    elapsed = time.perf_counter() - start
+
+    buffers = setup()
+    tracemalloc.start()
+    fn(buffers, chunks, buffer_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return name, elapsed, windows, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=60.0, help="Audio per session")
+    parser.add_argument("--vad", type=int, default=3)
+    parser.add_argument("--ring-windows", type=int, default=3, help="RING_BUFFER_WINDOWS")
+    args = parser.parse_args()
+
+    buffer_size = 30 - (args.vad * 2)
+    n_chunks = int(args.seconds * SAMPLE_RATE / CHUNK_SAMPLES)
+    rng = np.random.default_rng(0)
+    # Frames as they come off the socket: a fresh array per chunk
+    chunks = [rng.standard_normal(CHUNK_SAMPLES).astype(np.float32) for _ in range(n_chunks)]
+    frames = n_chunks * args.sessions
+
+    print(f"{args.sessions} sessions x {n_chunks} chunks ({args.seconds:.0f} s audio each), buffer_size={buffer_size}")
+    results = [
+        measure("list + concatenate", lambda: setup_list(args.sessions, buffer_size),
+                run_list, chunks, buffer_size),
+        measure("AudioRingBuffer", lambda: setup_ring(args.sessions, buffer_size, args.ring_windows),
+                run_ring, chunks, buffer_size),
+    ]
+    resident = args.sessions * 2 * buffer_size * CHUNK_SAMPLES * args.ring_windows * 4
+    baseline = results[0][1]
+    for name, elapsed, windows, peak in results:
+        print(
+            f"{name:20s} {elapsed * 1000:8.1f} ms  {elapsed / frames * 1e6:6.2f} us/chunk  "
+            f"{windows} windows  peak alloc during run {peak / 1e6:6.2f} MB  x{baseline / elapsed:.2f}"
+        )
+    print(f"AudioRingBuffer preallocated {resident / 1e6:.1f} MB ({resident / args.sessions / 1e6:.2f} MB per session)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark: greedy decoding vs speculative decoding with a draft model.
+
+Cuts a Swedish recording into windows, decodes each one greedily with the
+target model, then again with SpeculativeDecoder, and reports decoder
+tokens/sec for both, the draft acceptance rate and whether every window
+came out token-for-token identical. Encoding is timed separately, it is
+the same for both. Models are loaded from ../models like the server does.
+
+    python benchmarks/bench_speculative.py --audio tal.wav --target large --draft tiny -k 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from speculative import SpeculativeDecoder, SpeculativeStats  # noqa: E402
+
+SAMPLE_RATE = 16000
+
+
+def load(size, cache_dir, threads):
+    return WhisperModel(
+        f"KBLab/kb-whisper-{size}",
+        device="cpu",
+        compute_type="int8",
+        cpu_threads=threads,
+        download_root=cache_dir
+    )
+
+
+def tokenizer_for(model):
+    return Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language="sv")
+
+
+def encode(model, audio):
+    return model.encode(pad_or_trim(model.feature_extractor(audio))[np.newaxis])
+
+
+def greedy(model, tokenizer, encoded, max_length):
+    """Plain greedy text-only decode, the reference the speculative decode must match"""
+    prompt = list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
+    result = model.model.generate(
+        encoded,
+        [prompt],
+        beam_size=1,
+        # The prompt counts towards CTranslate2's max_length
+        max_length=len(prompt) + max_length,
+        suppress_blank=True,
+        suppress_tokens=[-1]
+    )[0]
+    return [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", required=True, help="Swedish speech, any format ffmpeg reads")
+    parser.add_argument("--target", default="large")
+    parser.add_argument("--draft", default="tiny")
+    parser.add_argument("-k", type=int, default=4, help="Draft tokens per round")
+    parser.add_argument("--window", type=float, default=10.0, help="Window length in seconds")
+    parser.add_argument("--max-windows", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    cache_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "models"))
+    target = load(args.target, cache_dir, args.threads)
+    draft = load(args.draft, cache_dir, args.threads)
+    target_tokenizer = tokenizer_for(target)
+    decoder = SpeculativeDecoder(target, draft, target_tokenizer, tokenizer_for(draft), args.k)
+
+    audio = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    step = int(args.window * SAMPLE_RATE)
+    windows = [audio[i:i + step] for i in range(0, len(audio) - step // 2, step)][:args.max_windows]
+
+    encode_time = greedy_time = speculative_time = 0.0
+    greedy_tokens = 0
+    identical = 0
+    stats = SpeculativeStats()
+    for window in windows:
+        start = time.perf_counter()
+        target_encoded = encode(target, window)
+        draft_encoded = encode(draft, window)
+        encode_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = greedy(target, target_tokenizer, target_encoded, 224)
+        greedy_time += time.perf_counter() - start
+        greedy_tokens += len(reference)
+
+        start = time.perf_counter()
+        result = decoder.decode(target_encoded, draft_encoded, [])
+        speculative_time += time.perf_counter() - start
+        stats.add(result)
+        identical += result.tokens == reference
+
+    summary = stats.as_dict()
+    print(f"{len(windows)} windows of {args.window:.0f} s, target {args.target}, draft {args.draft}, k={args.k}")
+    print(f"encode (both models): {encode_time:8.2f} s")
+    print(f"greedy:               {greedy_time:8.2f} s  {greedy_tokens / greedy_time:7.1f} tokens/s")
+    print(f"speculative:          {speculative_time:8.2f} s  {stats.tokens / speculative_time:7.1f} tokens/s")
+    print(f"speedup:              {greedy_time / speculative_time:8.2f}x")
+    print(f"acceptance rate:      {summary['acceptance_rate']:8.3f}  "
+          f"({summary['tokens_per_target_call']} tokens per target call)")
+    print(f"identical to greedy:  {identical}/{len(windows)} windows")
+
+
+if __name__ == "__main__":
+    main()
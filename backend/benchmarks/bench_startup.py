@@ -0,0 +1,90 @@
+"""Benchmark: cold start of the server, time until live and until ready.
+
+Starts `uvicorn main:app` from the backend folder, the way the server is
+normally run, and polls /healthz (port bound, process serving) and /readyz
+(default model loaded and warmed up) until each answers 200. Repeats for
+--runs cold processes and reports each time and the median. Also times a
+plain `import main` in a fresh interpreter, which is what blocks the port.
+
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def wait_for(url, start, timeout):
+    while time.perf_counter() - start < timeout:
+        if status(url) == 200:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f} s")
+
+
+def cold_start(port, timeout):
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/healthz", start, timeout)
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", start, timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return live, ready
+
+
+def import_time():
+    """Seconds to import main in a fresh interpreter"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=BACKEND_DIR,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for readiness")
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.runs)]
+    print(f"import main:  median {statistics.median(imports):6.2f} s")
+
+    lives, readies = [], []
+    for run in range(args.runs):
+        live, ready = cold_start(args.port, args.timeout)
+        lives.append(live)
+        readies.append(ready)
+        print(f"run {run + 1}: live after {live:6.2f} s, ready after {ready:6.2f} s")
+    print(f"live (/healthz):  median {statistics.median(lives):6.2f} s")
+    print(f"ready (/readyz):  median {statistics.median(readies):6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from typing import Dict
+
+import numpy as np
+
+
+class StreamingLogMel:
+    """Per-session log-mel spectrogram, computed once as audio arrives.
+
+    Matches faster-whisper's FeatureExtractor (400-sample Hann window, hop
+    160, power spectrum, log10 mel) up to the per-window normalization, which
+    depends on the window's maximum and is left to the decoder. Frame k is
+    centered on sample k * hop of the stream, so every window cut from the
+    same audio reuses the same frames instead of running its own STFT.
+
+    Power spectra are kept in a mirrored ring like AudioRingBuffer, plus one
+    log-mel ring per registered filterbank (models differ in mel bins, e.g.
+    80 for tiny and 128 for large-v3). append() and add_filterbank() must
+    run on the same thread; span() can be called from any thread and its
+    result checked with contains() afterwards.
+    """
+
+    def __init__(self, capacity_frames: int, n_fft: int = 400, hop_length: int = 160):
+        if capacity_frames <= 0:
+            raise ValueError("Capacity must be positive")
+
+        self.capacity = capacity_frames
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        # Samples not yet covered by a full frame; the first frame is centered
+        # on sample 0, so the stream starts with half a window of zeros
+        self._pending = np.zeros(n_fft // 2, dtype=np.float32)
+        self._power = np.zeros((2 * capacity_frames, n_fft // 2 + 1), dtype=np.float32)
+        self._filters: Dict[int, np.ndarray] = {}
+        self._mel: Dict[int, np.ndarray] = {}
+        self._frames = 0  # Absolute index of the next frame to write
+
+    @property
+    def frames_written(self) -> int:
+        return self._frames
+
+    def add_filterbank(self, filters: np.ndarray):
+        """Start keeping log-mel frames for a (n_mels, n_fft // 2 + 1) filterbank"""
+        n_mels = filters.shape[0]
+        if n_mels in self._filters:
+            return
+
+        self._filters[n_mels] = filters.astype(np.float32)
+        self._mel[n_mels] = np.zeros((2 * self.capacity, n_mels), dtype=np.float32)
+        # Frames already in the ring get their mel values from the cached spectra
+        oldest = max(0, self._frames - self.capacity)
+        if oldest < self._frames:
+            power = self._rows(self._power, oldest, self._frames)
+            self._write(self._mel[n_mels], oldest, self._log_mel(power, self._filters[n_mels]))
+
+    def append(self, samples: np.ndarray):
+        """Compute the frames that the new samples complete"""
+        audio = np.concatenate([self._pending, samples.astype(np.float32, copy=False)])
+        n = (len(audio) - self.n_fft) // self.hop_length + 1 if len(audio) >= self.n_fft else 0
+        if n > 0:
+            starts = np.arange(n) * self.hop_length
+            frames = audio[starts[:, None] + np.arange(self.n_fft)] * self._window
+            power = (np.abs(np.fft.rfft(frames, axis=1)) ** 2).astype(np.float32)
+            if n > self.capacity:
+                power = power[-self.capacity:]
+                self._frames += n - self.capacity
+
+            self._write(self._power, self._frames, power)
+            for n_mels, filters in self._filters.items():
+                self._write(self._mel[n_mels], self._frames, self._log_mel(power, filters))
+            self._frames += len(power)
+
+        self._pending = audio[n * self.hop_length:]
+
+    def contains(self, frame: int) -> bool:
+        """Whether absolute frame index frame has not been overwritten yet"""
+        return frame >= self._frames - self.capacity
+
+    def span(self, n_mels: int, start_sample: int, end_sample: int):
+        """Log-mel frames for the stream samples [start_sample, end_sample).
+
+        Returns (first_frame, view of shape (n_mels, frames)). Like the
+        FeatureExtractor, a window of N samples has N // hop + 1 frames, but
+        frames still waiting for audio past the end of the stream are left
+        out, and the first frame is the first one centered inside the window.
+        """
+        first = -(-start_sample // self.hop_length)
+        last = min(self._frames, first + (end_sample - start_sample) // self.hop_length + 1)
+        if first < self._frames - self.capacity or last < first:
+            raise IndexError(f"Frames {first}:{last} are not in the buffer")
+
+        return first, self._rows(self._mel[n_mels], first, last).T
+
+    def _log_mel(self, power: np.ndarray, filters: np.ndarray) -> np.ndarray:
+        return np.log10(np.maximum(power @ filters.T, 1e-10))
+
+    def _rows(self, ring: np.ndarray, start: int, end: int) -> np.ndarray:
+        offset = start % self.capacity
+        return ring[offset:offset + (end - start)]
+
+    def _write(self, ring: np.ndarray, position: int, rows: np.ndarray):
+        cap = self.capacity
+        start = position % cap
+        end = start + len(rows)
+        if end <= cap:
+            ring[start:end] = rows
+            ring[start + cap:end + cap] = rows
+        else:
+            first = cap - start
+            ring[start:cap] = rows[:first]
+            ring[start + cap:] = rows[:first]
+            ring[:end - cap] = rows[first:]
+            ring[cap:end] = rows[first:]
+
+
+def normalize_log_mel(log_mel: np.ndarray) -> np.ndarray:
+    """Whisper's per-window normalization of log10 mel frames, as in FeatureExtractor"""
+    log_mel = np.maximum(log_mel, log_mel.max() - 8.0) if log_mel.size else log_mel
+    return (log_mel + 4.0) / 4.0
@@ -1,15 +1,49 @@
 import asyncio
 import json
 import os
-from typing import Optional, Dict, List
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Dict, List
 import numpy as np
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
-from faster_whisper import WhisperModel
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
 import threading
 import time
+import uuid
 import httpx
+from audio_buffer import AudioRingBuffer, TimeMap
+from features import StreamingLogMel, normalize_log_mel
+from main_real_progress import RealDownloadService, snapshot_complete
+from metrics import Metrics
+from model_cache import MODEL_MEMORY_MB, TOKENIZER_MEMORY_MB, ModelCache, ModelHandle, ReplicaPool
+from slo import LatencyController, quality_ladder, smaller_model
+from speculative import SpeculativeDecoder, SpeculativeStats
+from scheduler import InferenceScheduler, WindowDropped
+from streaming import (
+    CaptionTrack,
+    LocalAgreement,
+    PromptContext,
+    Word,
+    segment_trim_point,
+    segments_to_words
+)
+from tuning import load_profile
+from vad import Endpointer, EnergyVad, VadGate
+from workers import (
+    InferenceProcessPool,
+    RemoteModel,
+    RemoteWindow,
+    SharedAudioRingBuffer,
+    transcribe_array,
+    warmup_model
+)
+
+# faster_whisper pulls in CTranslate2, tokenizers and PyAV, which takes
+# seconds; it is imported on first use so the server binds its port at once
+if TYPE_CHECKING:
+    from faster_whisper import WhisperModel
+    from faster_whisper.tokenizer import Tokenizer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,16 +60,39 @@ app.add_middleware(
 
 class TranscriptionService:
     def __init__(self):
-        self.models: Dict[str, Optional[WhisperModel]] = {
-            "tiny": None,
-            "base": None,
-            "small": None,
-            "medium": None,
-            "large": None
-        }
+        # Loaded models under a RAM budget, idle ones are evicted least recently used first
+        self.models = ModelCache(
+            ("tiny", "base", "small", "medium", "large"),
+            int(os.environ.get("MODEL_CACHE_MB", 4096)),
+            on_evict=self._forget_model
+        )
         self.current_model = "small"
-        self.download_progress = None
-        self.is_downloading = False
+        # Every model is loaded with this many CTranslate2 replicas sharing its
+        # weights, so that many windows of one size decode in parallel. By
+        # default one per inference worker, with the cores split between them.
+        replicas = int(os.environ.get(
+            "MODEL_REPLICAS",
+            os.environ.get("INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+        ))
+        self.replicas = ReplicaPool(
+            replicas,
+            int(os.environ.get("MODEL_CPU_THREADS", max(1, (os.cpu_count() or 1) // max(1, replicas))))
+        )
+        self.tokenizers: Dict[str, "Tokenizer"] = {}
+        self.speculative_decoders: Dict[tuple, SpeculativeDecoder] = {}
+        self.speculative_stats = SpeculativeStats()
+        self.metrics = Metrics()
+        self._stats_lock = threading.Lock()
+        self.downloader = RealDownloadService()
+        # Per model size: several models can download at once (default and instant tier at startup)
+        self.download_progress: Dict[str, dict] = {}
+        self.downloading: set = set()
+        # Models running their warmup decode, not yet in self.models
+        self.warming: set = set()
+        # Set when the background load of the default model fails
+        self.startup_error: Optional[str] = None
+        self.warmup_seconds = float(os.environ.get("WARMUP_SECONDS", 2.0))
+        self._load_locks = {size: threading.Lock() for size in self.models}
         
         # Set environment variables to control model caching
         # This ensures models are stored in this project's folder
@@ -45,139 +102,961 @@ class TranscriptionService:
         os.environ['HF_DATASETS_CACHE'] = self.project_cache_dir
         logger.info(f"Model cache directory set to: {self.project_cache_dir}")
         
-        self.load_model("small")
+        # Set once worker processes decode the finals, see InferenceProcessPool
+        self.process_pool: Optional[InferenceProcessPool] = None
+        
+        # compute_type and threading per model measured on this host, see tuning.py
+        self.tuning_profile = load_profile(
+            os.environ.get("TUNING_PROFILE", os.path.join(self.project_cache_dir, "tuning_profile.json"))
+        )
+        if self.tuning_profile:
+            logger.info(f"Using tuned settings for models: {', '.join(self.tuning_profile)}")
+    
+    def load_default_model(self):
+        """Load the default model; run in the background at startup, see /readyz"""
+        start = time.perf_counter()
+        try:
+            self.load_model(self.current_model)
+        except Exception as e:
+            self.startup_error = str(e)
+            return
+        logger.info(f"Default model {self.current_model} ready {time.perf_counter() - start:.2f} s after startup")
+    
+    def is_ready(self) -> bool:
+        return self.current_model in self.models.loaded()
     
     def model_exists_locally(self, model_size: str):
         """Check if model files exist in this project's cache directory"""
-        # Check in this project's models folder (faster-whisper cache structure)
         model_path = os.path.join(self.project_cache_dir, f"models--KBLab--kb-whisper-{model_size}")
-        
-        if os.path.exists(model_path):
-            # Check if the model has actual model files
-            blobs_path = os.path.join(model_path, "blobs")
-            if os.path.exists(blobs_path) and os.listdir(blobs_path):
-                logger.info(f"Model {model_size} found in project cache: {model_path}")
-                return True
+        if self.local_snapshot(model_size) is not None:
+            logger.info(f"Model {model_size} found in project cache: {model_path}")
+            return True
         
         logger.info(f"Model {model_size} not found in project cache: {model_path}")
         return False
     
-    def update_download_progress(self, model_size: str):
-        """Simple status updates while downloading"""
-        size_estimates = {
-            "tiny": "80 MB",
-            "base": "150 MB",
-            "small": "500 MB",
-            "medium": "1.5 GB",
-            "large": "3 GB"
-        }
-        
-        model_size_str = size_estimates.get(model_size, "Unknown")
-        
-        # Simple status - no fake percentages
-        self.download_progress = {
-            "status": f"Laddar ner {model_size} modell ({model_size_str})...",
-            "is_downloading": True,
-            "model": model_size
-        }
-        
-        # Keep status updated while downloading
-        while self.is_downloading:
-            time.sleep(1)  # Just keep the status alive
+    def local_snapshot(self, model_size: str) -> Optional[str]:
+        """Folder of a complete download of the model (faster-whisper cache structure), if any"""
+        model_path = os.path.join(self.project_cache_dir, f"models--KBLab--kb-whisper-{model_size}")
+        snapshots_path = os.path.join(model_path, "snapshots")
+        if not os.path.exists(snapshots_path):
+            return None
         
-        # Download complete
-        self.download_progress = {
-            "status": f"{model_size} modell nedladdad och klar!",
-            "is_downloading": False,
-            "model": model_size
-        }
-        time.sleep(2)  # Show completion briefly
-        self.download_progress = None
+        # The revision the cache points at first, then any other. A download
+        # interrupted before its last file is not complete and is resumed
+        snapshots = sorted(os.listdir(snapshots_path))
+        try:
+            with open(os.path.join(model_path, "refs", "main")) as f:
+                snapshots.insert(0, f.read().strip())
+        except OSError:
+            pass
+        for snapshot in snapshots:
+            if snapshot_complete(os.path.join(snapshots_path, snapshot)):
+                return os.path.join(snapshots_path, snapshot)
+        return None
     
-    def load_model(self, model_size: str):
+    def load_model(self, model_size: str, make_current: bool = True, local: bool = False):
+        """Load a model into the shared registry.
+        
+        make_current also makes it the default model (the one /load-model
+        selects). Sessions decode with their own model handle, so this never
+        changes the model of a live session. With worker processes, models
+        are decoded there and this process keeps only a RemoteModel with
+        the tokenizer, unless `local` asks for the model here too.
+        """
         if model_size not in self.models:
             raise ValueError(f"Invalid model size: {model_size}")
         
-        if self.models[model_size] is not None:
-            self.current_model = model_size
-            logger.info(f"Model {model_size} already loaded in memory")
-            return
+        # One loader per size; a second caller waits and then finds it loaded
+        with self._load_locks[model_size]:
+            if self.models[model_size] is not None:
+                logger.info(f"Model {model_size} already loaded in memory")
+            else:
+                remote = self.process_pool is not None and not local
+                # Never evict the default model for a background load
+                self.models.reserve(
+                    model_size,
+                    keep=[self.current_model] if not make_current else [],
+                    memory_mb=self.remote_memory_mb(model_size) if remote else None
+                )
+                try:
+                    self._load(model_size, remote=remote)
+                except Exception:
+                    self.models.cancel(model_size)
+                    raise
         
+        if make_current:
+            self.current_model = model_size
+    
+    def _load(self, model_size: str, remote: bool = False):
         try:
             model_id = f"KBLab/kb-whisper-{model_size}"
             
-            # Check if downloading is needed
-            needs_download = not self.model_exists_locally(model_size)
+            model_path = self.local_snapshot(model_size)
             
-            if needs_download:
+            # Download with byte-level progress, see /download-progress
+            if model_path is None:
                 logger.info(f"Model {model_size} not found locally, downloading...")
-                self.is_downloading = True
                 
-                # Start progress updates in a separate thread
-                progress_thread = threading.Thread(
-                    target=self.update_download_progress, 
-                    args=(model_size,)
-                )
-                progress_thread.daemon = True
-                progress_thread.start()
+                def on_progress(progress: dict):
+                    self.download_progress[model_size] = progress
+                
+                self.downloading.add(model_size)
+                try:
+                    model_path = self.downloader.download(
+                        model_id,
+                        self.project_cache_dir,
+                        on_progress=on_progress,
+                        label=model_size
+                    )
+                finally:
+                    self.downloading.discard(model_size)
+            
+            if self.process_pool is not None:
+                # Workers load models only from snapshots this process downloaded
+                self.process_pool.register(model_size, model_path, self.worker_options(model_size))
+            
+            if remote:
+                # The worker processes hold the weights, prompts only need the tokenizer
+                remote_model = RemoteModel.load(model_path)
+                self.download_progress.pop(model_size, None)
+                self.warming.add(model_size)
+                # Every worker loads and warms it up; the first load starts them
+                self.process_pool.load(model_size)
+                self.models.put(model_size, remote_model)
+                self.warming.discard(model_size)
+                logger.info(f"Model {model_size} ready in the worker processes, tokenizer loaded from {model_path}")
+                return
+            
+            from faster_whisper import WhisperModel
             
             logger.info(f"Loading model: {model_id}")
             logger.info(f"Using cache directory: {self.project_cache_dir}")
             
-            # Load model (will download if needed to our project cache)
-            self.models[model_size] = WhisperModel(
-                model_id,
+            options = self.load_options(model_size)
+            model = WhisperModel(
+                model_path,
                 device="cpu",
-                compute_type="int8",
                 download_root=self.project_cache_dir,
-                local_files_only=False
+                local_files_only=False,
+                **options
             )
+            self.replicas.configure(model_size, options["num_workers"], options["cpu_threads"])
             
             # Log where the model was actually loaded from
             logger.info(f"Model {model_size} loaded successfully")
             
-            # Mark download as complete
-            self.is_downloading = False
-            
-            # Give progress thread time to show 100%
-            if needs_download:
-                time.sleep(2)
+            self.download_progress.pop(model_size, None)
             
-            self.current_model = model_size
-            self.download_progress = None
-            logger.info(f"Model {model_size} loaded successfully")
+            # Only a warmed-up model goes into the registry, so sessions
+            # waiting for it never pay for the first slow decode
+            self.warming.add(model_size)
+            self.warmup(model, model_size, options["num_workers"])
+            self.models.put(model_size, model)
+            self.warming.discard(model_size)
+            logger.info(f"Model {model_size} ready")
             
         except Exception as e:
-            self.is_downloading = False
-            self.download_progress = None
+            self.download_progress.pop(model_size, None)
+            self.warming.discard(model_size)
             logger.error(f"Failed to load model {model_size}: {e}")
             raise
     
-    def transcribe_audio(self, audio_data: np.ndarray, vad_sensitivity: int = 3):
-        if self.models[self.current_model] is None:
-            raise RuntimeError(f"Model {self.current_model} not loaded")
+    def load_options(self, model_size: str) -> dict:
+        """compute_type and threading for a model: tuned for this host, unless set explicitly"""
+        options = {
+            "compute_type": "int8",
+            "cpu_threads": self.replicas.cpu_threads,
+            "num_workers": self.replicas.replicas
+        }
+        tuned = self.tuning_profile.get(model_size, {})
+        options.update({key: tuned[key] for key in options if key in tuned})
+        if "MODEL_REPLICAS" in os.environ:
+            options["num_workers"] = self.replicas.replicas
+        if "MODEL_CPU_THREADS" in os.environ:
+            options["cpu_threads"] = self.replicas.cpu_threads
+        if tuned:
+            logger.info(f"Model {model_size} settings: {options}")
+        return options
+    
+    def worker_options(self, model_size: str) -> dict:
+        """load_options for the worker processes.
+        
+        The pool sets num_workers (its replicas per process) and splits the
+        cores between processes, unless cpu_threads is tuned or set.
+        """
+        options = self.load_options(model_size)
+        del options["num_workers"]
+        if "cpu_threads" not in self.tuning_profile.get(model_size, {}) and "MODEL_CPU_THREADS" not in os.environ:
+            del options["cpu_threads"]
+        return options
+    
+    def warmup(self, model: "WhisperModel", model_size: str, replicas: int = 1):
+        """Run throwaway decodes on every replica so none of them is cold (see warmup_model).
+        
+        The first decode of a new model is several times slower than the
+        rest; without this it lands on the first caption of a session.
+        """
+        if self.warmup_seconds <= 0:
+            return
+        
+        try:
+            seconds = warmup_model(model, self.warmup_seconds, replicas)
+        except Exception as e:
+            # A failed warmup only costs the first window its speed
+            logger.warning(f"Warmup of model {model_size} failed: {e}")
+            return
+        logger.info(f"Warmed up model {model_size} ({replicas} replicas) in {seconds:.2f} s")
+    
+    def transcribe_audio(
+        self,
+        audio_data: np.ndarray,
+        vad_sensitivity: int = 3,
+        beam_size: Optional[int] = None,
+        word_timestamps: bool = False,
+        prompt: Optional[str] = None,
+        vad_filter: bool = True,
+        model_size: Optional[str] = None
+    ):
+        model_size = model_size or self.current_model
+        if self.models[model_size] is None:
+            raise RuntimeError(f"Model {model_size} not loaded")
+        
+        if beam_size is None:
+            beam_size = 6 - vad_sensitivity
+        
+        with self.replicas.slot(model_size):
+            return transcribe_array(
+                self.models[model_size],
+                audio_data,
+                beam_size,
+                vad_filter,
+                word_timestamps,
+                self.prompt_tokens(model_size, prompt)
+            )
+
+    def load_pinned_model(self, model_size: str):
+        """Load a helper model (instant tier, speculative draft) that is never evicted"""
+        try:
+            self.load_model(model_size, make_current=False, local=True)
+        except Exception as e:
+            logger.error(f"Could not load helper model {model_size}: {e}")
+            return
+        self.models.acquire(model_size)
+    
+    def _forget_model(self, model_size: str):
+        """Drop everything holding on to an evicted model, so its memory is freed"""
+        self.tokenizers.pop(model_size, None)
+        for key in [key for key in self.speculative_decoders if model_size in key]:
+            del self.speculative_decoders[key]
+        if self.process_pool is not None:
+            self.process_pool.unload(model_size)
+    
+    def use_speculative(self, model_size: str) -> bool:
+        """Whether finals of this model get a speculative decode"""
+        # A model can't draft for itself: it would take two of its own replica
+        # slots at once, which never comes with a single replica
+        return (
+            bool(SPECULATIVE_DRAFT)
+            and model_size in SPECULATIVE_MODELS
+            and model_size != SPECULATIVE_DRAFT
+            and self.models.get(SPECULATIVE_DRAFT) is not None
+        )
+    
+    def instant_model(self, final_model: str) -> str:
+        """Model for instant windows: the draft model once it is loaded, else the session's final model"""
+        if INSTANT_MODEL and self.models.get(INSTANT_MODEL) is not None:
+            return INSTANT_MODEL
+        return final_model
+    
+    def remote_memory_mb(self, model_size: str) -> int:
+        """What a model decoded by the worker processes costs the node: a copy in each, and the tokenizer here"""
+        return MODEL_MEMORY_MB.get(model_size, 0) * self.process_pool.num_processes + TOKENIZER_MEMORY_MB
+    
+    def is_remote(self, model_size: str) -> bool:
+        """Whether a model is only loaded in the worker processes"""
+        return isinstance(self.models.get(model_size), RemoteModel)
+    
+    def get_tokenizer(self, model_size: str) -> "Tokenizer":
+        """Swedish transcription tokenizer for a loaded model"""
+        if model_size not in self.tokenizers:
+            from faster_whisper.tokenizer import Tokenizer
+            
+            model = self.models[model_size]
+            self.tokenizers[model_size] = Tokenizer(
+                model.hf_tokenizer,
+                model.is_multilingual if isinstance(model, RemoteModel) else model.model.is_multilingual,
+                task="transcribe",
+                language="sv"
+            )
+        return self.tokenizers[model_size]
+    
+    def prompt_tokens(self, model_size: str, prompt: Optional[str]) -> List[int]:
+        """Token ids of the last PROMPT_TOKENS tokens of a decoder prompt"""
+        if not prompt or PROMPT_TOKENS <= 0:
+            return []
+        tokens = self.get_tokenizer(model_size).encode(" " + prompt.strip())
+        return tokens[-PROMPT_TOKENS:]
+    
+    def transcribe_batch(
+        self,
+        audios: List[np.ndarray],
+        vad_sensitivity: int = 3,
+        beam_size: Optional[int] = None,
+        prompts: Optional[List[Optional[str]]] = None,
+        model_size: Optional[str] = None,
+        word_timestamps: bool = False,
+        vad_filter: bool = False
+    ):
+        """Transcribe several windows (typically from different sessions) in one batched decode.
+        
+        The windows are padded to 30 s mel features and go through a single
+        CTranslate2 encode + generate call, the same primitives that faster-whisper's
+        BatchedInferencePipeline uses. Returns one list of segments per window;
+        word timestamps come from one batched alignment, like in transcribe_features.
+        The batched decode has no VAD, so vad_filter only works for a single window.
+        """
+        if prompts is None:
+            prompts = [None] * len(audios)
+        
+        if len(audios) == 1:
+            return [self.transcribe_audio(
+                audios[0], vad_sensitivity, beam_size, word_timestamps, prompts[0], vad_filter, model_size
+            )]
+        if vad_filter:
+            raise ValueError("vad_filter needs a single window")
+        
+        from faster_whisper.audio import pad_or_trim
+        
+        model_size = model_size or self.current_model
+        model = self.models[model_size]
+        if model is None:
+            raise RuntimeError(f"Model {model_size} not loaded")
+        
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(audio))
+            for audio in audios
+        ])
+        durations = [len(audio) / 16000 for audio in audios]
+        return self._decode(
+            model_size, features, durations, vad_sensitivity, beam_size, prompts, word_timestamps
+        )
+    
+    def transcribe_speculative(
+        self,
+        audio: np.ndarray,
+        draft_size: str,
+        prompt: Optional[str] = None,
+        word_timestamps: bool = False,
+        model_size: Optional[str] = None
+    ):
+        """Greedy transcription of one window, sped up by a draft model (see SpeculativeDecoder).
+        
+        Text-only decode, so the window comes back as a single segment;
+        word timestamps come from the alignment like in transcribe_features.
+        The decode gives no average log probability, so the silence rule of
+        the other decodes (high no_speech_prob and low confidence) doesn't
+        apply; it is only used behind the server VAD gate, which keeps
+        silence out.
+        """
+        model_size = model_size or self.current_model
+        model = self.models[model_size]
+        draft = self.models[draft_size]
+        if model is None or draft is None:
+            raise RuntimeError(f"Model {model_size} or draft {draft_size} not loaded")
+        
+        key = (model_size, draft_size)
+        if key not in self.speculative_decoders:
+            self.speculative_decoders[key] = SpeculativeDecoder(
+                model, draft, self.get_tokenizer(model_size), self.get_tokenizer(draft_size), SPECULATIVE_K
+            )
+        decoder = self.speculative_decoders[key]
+        
+        from faster_whisper.audio import pad_or_trim
+        # Always the target's slot first, then the draft's, so two of these can't deadlock
+        with self.replicas.slot(model_size), self.replicas.slot(draft_size):
+            encoder_output = model.encode(pad_or_trim(model.feature_extractor(audio))[np.newaxis])
+            draft_output = draft.encode(pad_or_trim(draft.feature_extractor(audio))[np.newaxis])
+            result = decoder.decode(encoder_output, draft_output, self.prompt_tokens(model_size, prompt))
+        with self._stats_lock:
+            self.speculative_stats.add(result)
+        
+        tokenizer = self.get_tokenizer(model_size)
+        duration = len(audio) / 16000
+        text = tokenizer.decode(result.tokens).strip()
+        if not text:
+            return []
+        
+        transcriptions = [{"text": text, "start": 0.0, "end": duration}]
+        if word_timestamps:
+            with self.replicas.slot(model_size):
+                self._add_word_timestamps(
+                    model, tokenizer, encoder_output, [result.tokens], [duration], [transcriptions]
+                )
+        return transcriptions
+    
+    def mel_filters(self, model_size: Optional[str] = None) -> np.ndarray:
+        """Mel filterbank of a loaded model, for StreamingLogMel"""
+        model = self.models[model_size or self.current_model]
+        if model is None:
+            raise RuntimeError(f"Model {model_size or self.current_model} not loaded")
+        return model.feature_extractor.mel_filters
+    
+    def transcribe_features(
+        self,
+        log_mels: List[np.ndarray],
+        vad_sensitivity: int = 3,
+        beam_size: Optional[int] = None,
+        prompts: Optional[List[Optional[str]]] = None,
+        model_size: Optional[str] = None,
+        word_timestamps: bool = False
+    ):
+        """Transcribe windows given as cached log10 mel frames (see StreamingLogMel).
+        
+        Skips the STFT that transcribe_audio and transcribe_batch run on every
+        window. Same decode as transcribe_batch; word timestamps come from
+        CTranslate2's cross-attention alignment, like faster-whisper's.
+        """
+        model_size = model_size or self.current_model
+        model = self.models[model_size]
+        if model is None:
+            raise RuntimeError(f"Model {model_size} not loaded")
+        if prompts is None:
+            prompts = [None] * len(log_mels)
+        
+        from faster_whisper.audio import pad_or_trim
+        features = np.stack([
+            pad_or_trim(normalize_log_mel(log_mel))
+            for log_mel in log_mels
+        ])
+        durations = [log_mel.shape[1] * model.feature_extractor.time_per_frame for log_mel in log_mels]
+        return self._decode(
+            model_size, features, durations, vad_sensitivity, beam_size, prompts, word_timestamps
+        )
+    
+    def _decode(
+        self,
+        model_size: str,
+        features: np.ndarray,
+        durations: List[float],
+        vad_sensitivity: int,
+        beam_size: Optional[int],
+        prompts: List[Optional[str]],
+        word_timestamps: bool = False
+    ):
+        """One CTranslate2 encode + generate call for a batch of 30 s feature windows"""
+        with self.replicas.slot(model_size):
+            return self._decode_batch(
+                model_size, features, durations, vad_sensitivity, beam_size, prompts, word_timestamps
+            )
+    
+    def _decode_batch(
+        self,
+        model_size: str,
+        features: np.ndarray,
+        durations: List[float],
+        vad_sensitivity: int,
+        beam_size: Optional[int],
+        prompts: List[Optional[str]],
+        word_timestamps: bool
+    ):
+        model = self.models[model_size]
+        if beam_size is None:
+            beam_size = 6 - vad_sensitivity
         
-        beam_size = 6 - vad_sensitivity
+        tokenizer = self.get_tokenizer(model_size)
+        encoder_output = model.encode(features)
         
-        segments, info = self.models[self.current_model].transcribe(
-            audio_data,
-            language="sv",
+        # Previous text goes before the start of transcript, like initial_prompt does
+        decoder_prompts = []
+        for prompt in prompts:
+            previous = self.prompt_tokens(model_size, prompt)
+            prefix = [tokenizer.sot_prev] + previous if previous else []
+            decoder_prompts.append(prefix + list(tokenizer.sot_sequence))
+        
+        results = model.model.generate(
+            encoder_output,
+            decoder_prompts,
             beam_size=max(1, beam_size),
-            vad_filter=True
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            return_scores=True,
+            return_no_speech_prob=True
+        )
+        
+        transcriptions = []
+        for duration, result in zip(durations, results):
+            # Same silence rule as faster-whisper: high no-speech probability and low confidence
+            if result.no_speech_prob > 0.6 and result.scores[0] < -1.0:
+                transcriptions.append([])
+                continue
+            transcriptions.append(
+                self._split_segments(tokenizer, result.sequences_ids[0], duration)
+            )
+        
+        if word_timestamps:
+            text_tokens = [
+                [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+                if segments else []
+                for result, segments in zip(results, transcriptions)
+            ]
+            self._add_word_timestamps(model, tokenizer, encoder_output, text_tokens, durations, transcriptions)
+        
+        return transcriptions
+    
+    @staticmethod
+    def _add_word_timestamps(model, tokenizer, encoder_output, text_tokens, durations, transcriptions):
+        """Attach "words" to each segment from a batched cross-attention alignment"""
+        frames_per_second = 1 / model.feature_extractor.time_per_frame
+        # The encoder halves the mel frame rate
+        tokens_per_second = frames_per_second / 2
+        alignments = model.model.align(
+            encoder_output,
+            tokenizer.sot_sequence,
+            # Windows without text still need an entry to keep the batch aligned
+            [tokens or [tokenizer.eot] for tokens in text_tokens],
+            [min(int(duration * frames_per_second), model.feature_extractor.nb_max_frames) for duration in durations],
+            median_filter_width=7
         )
         
+        for tokens, alignment, duration, segments in zip(text_tokens, alignments, durations, transcriptions):
+            if not segments:
+                continue
+            for segment in segments:
+                segment["words"] = []
+            
+            words, word_tokens = tokenizer.split_to_word_tokens(tokens + [tokenizer.eot])
+            if len(word_tokens) <= 1:
+                continue
+            text_indices = np.array([pair[0] for pair in alignment.alignments])
+            time_indices = np.array([pair[1] for pair in alignment.alignments])
+            word_boundaries = np.pad(np.cumsum([len(t) for t in word_tokens[:-1]]), (1, 0))
+            # A new token starts wherever the text index moves on
+            jumps = np.pad(np.diff(text_indices), (1, 0), constant_values=1).astype(bool)
+            jump_times = time_indices[jumps] / tokens_per_second
+            start_times = jump_times[word_boundaries[:-1]]
+            end_times = jump_times[word_boundaries[1:]]
+            
+            # Each word goes to the segment it starts in
+            index = 0
+            for word, start, end in zip(words[:-1], start_times, end_times):
+                while index < len(segments) - 1 and start >= segments[index]["end"]:
+                    index += 1
+                segments[index]["words"].append({
+                    "word": word,
+                    "start": min(float(start), duration),
+                    "end": min(float(end), duration)
+                })
+    
+    @staticmethod
+    def _split_segments(tokenizer: "Tokenizer", tokens: List[int], duration: float):
+        """Turn a timestamped token sequence into segments like transcribe_audio returns"""
         transcriptions = []
-        for segment in segments:
+        text_tokens = []
+        segment_start = None
+        
+        for token in tokens:
+            if token < tokenizer.timestamp_begin:
+                if token < tokenizer.eot:
+                    text_tokens.append(token)
+                continue
+            
+            timestamp = (token - tokenizer.timestamp_begin) * 0.02
+            if segment_start is not None and text_tokens:
+                text = tokenizer.decode(text_tokens).strip()
+                if text:
+                    transcriptions.append({
+                        "text": text,
+                        "start": segment_start,
+                        "end": min(timestamp, duration)
+                    })
+                text_tokens = []
+                segment_start = None
+            else:
+                segment_start = timestamp
+        
+        # Text after the last timestamp runs to the end of the window
+        text = tokenizer.decode(text_tokens).strip() if text_tokens else ""
+        if text:
             transcriptions.append({
-                "text": segment.text.strip(),
-                "start": segment.start,
-                "end": segment.end
+                "text": text,
+                "start": segment_start or 0.0,
+                "end": duration
             })
         
         return transcriptions
 
 transcription_service = TranscriptionService()
 
+# Inference configuration
+# Samples per audio chunk sent by the frontend AudioWorklet (16 kHz mono float32)
+CHUNK_SAMPLES = 4096
+# Whisper decodes run on a dedicated worker pool (CTranslate2 releases the GIL)
+# so a slow decode never blocks the event loop serving other connections
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Max number of audio windows waiting for inference per WebSocket session
+SESSION_QUEUE_SIZE = int(os.environ.get("SESSION_QUEUE_SIZE", 4))
+# "round_robin" or "deadline", see InferenceScheduler
+SCHEDULER_POLICY = os.environ.get("SCHEDULER_POLICY", "round_robin")
+# Per-session audio ring size, in final windows
+RING_BUFFER_WINDOWS = int(os.environ.get("RING_BUFFER_WINDOWS", 3))
+# What to do when a session's inference falls behind real time, comma separated:
+#   skip_instant  stop sending instant windows and discard stale instant results
+#   fast          decode final windows with greedy search (beam size 1)
+# Audio that arrives while a final window is decoding is always merged into the next one.
+LAG_POLICY = {p.strip() for p in os.environ.get("LAG_POLICY", "skip_instant").split(",") if p.strip()}
+# Seconds of lag beyond one window before a session counts as behind
+LAG_THRESHOLD = float(os.environ.get("LAG_THRESHOLD", 2.0))
+# Streaming commit policy: text is committed once this many consecutive
+# hypotheses of the growing buffer agree on it (LocalAgreement-n)
+AGREEMENT_N = int(os.environ.get("AGREEMENT_N", 2))
+# Ask Whisper for word timings on final windows so the buffer is trimmed exactly
+# at the last committed word. Clients can override it with ?word_timestamps=
+WORD_TIMESTAMPS = os.environ.get("WORD_TIMESTAMPS", "1") == "1"
+# Committed text is fed back to the decoder as a prompt, clipped to this many
+# tokens (Whisper allows up to 223). 0 disables prompting.
+PROMPT_TOKENS = int(os.environ.get("PROMPT_TOKENS", 120))
+# Seconds without committed text after which the prompt is dropped
+PROMPT_RESET_SECONDS = float(os.environ.get("PROMPT_RESET_SECONDS", 10.0))
+# Server-side VAD run on every incoming chunk: "energy" (energy + zero-crossing
+# rate) keeps silence out of the transcription buffer entirely, "off" leaves
+# it to faster-whisper's vad_filter on every window
+SERVER_VAD = os.environ.get("SERVER_VAD", "energy")
+# Endpointing: an utterance is decoded and committed as soon as it is followed
+# by ENDPOINT_SILENCE_MS of silence, or after ENDPOINT_MAX_SECONDS of
+# uninterrupted speech, instead of waiting for the next fixed-size step.
+# ENDPOINTING=0 disables it.
+ENDPOINTING = os.environ.get("ENDPOINTING", "1") == "1"
+ENDPOINT_SILENCE_MS = int(os.environ.get("ENDPOINT_SILENCE_MS", 500))
+ENDPOINT_MAX_SECONDS = float(os.environ.get("ENDPOINT_MAX_SECONDS", 15.0))
+# Latency SLO controller: per session, finals slower than SLO_TARGET_LATENCY
+# seconds (from dispatch to result, queueing included) or decoded slower than
+# real time step the session down to a lower beam size, a smaller loaded
+# model and then wider windows; it steps back up once there is headroom.
+# SLO_CONTROLLER=0 disables it.
+SLO_CONTROLLER = os.environ.get("SLO_CONTROLLER", "1") == "1"
+SLO_TARGET_LATENCY = float(os.environ.get("SLO_TARGET_LATENCY", 2.0))
+# Longest uncommitted buffer, Whisper sees at most 30 s at once
+MAX_BUFFER_SECONDS = 30
+# Latency budget per window kind, used for deadline ordering
+INSTANT_LATENCY_BUDGET = 1.0
+# Windows from different sessions are decoded together, up to BATCH_MAX_SIZE
+# windows gathered within BATCH_TIMEOUT_MS. Set BATCH_MAX_SIZE=1 to disable.
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 8))
+BATCH_TIMEOUT_MS = int(os.environ.get("BATCH_TIMEOUT_MS", 50))
+# The batched audio decode has no temperature fallback, so a final would come
+# out differently depending on whether another session's window was queued
+# with it. Finals are batched only with BATCH_FINALS=1 (or FEATURE_CACHE=1,
+# which decodes every window that way).
+BATCH_FINALS = os.environ.get("BATCH_FINALS", "0") == "1"
+# Decode windows from per-session cached log-mel frames instead of running
+# the STFT again on every window. Uses the batched CTranslate2 decode for
+# every window (no temperature fallback). FEATURE_CACHE=1 enables it.
+FEATURE_CACHE = os.environ.get("FEATURE_CACHE", "0") == "1"
+# Speculative decoding: finals of the SPECULATIVE_MODELS are decoded greedily
+# by the selected model checking token runs proposed by SPECULATIVE_DRAFT,
+# SPECULATIVE_K at a time. Output equals plain greedy decoding. An empty
+# SPECULATIVE_DRAFT disables it.
+SPECULATIVE_DRAFT = os.environ.get("SPECULATIVE_DRAFT", "")
+SPECULATIVE_K = int(os.environ.get("SPECULATIVE_K", 4))
+SPECULATIVE_MODELS = ("medium", "large")
+if SPECULATIVE_DRAFT and SPECULATIVE_DRAFT not in transcription_service.models:
+    raise ValueError(f"Invalid SPECULATIVE_DRAFT: {SPECULATIVE_DRAFT}")
+if SPECULATIVE_DRAFT in SPECULATIVE_MODELS:
+    logger.warning(f"Sessions on model {SPECULATIVE_DRAFT} decode without speculation, it is the draft model")
+if SPECULATIVE_DRAFT and SERVER_VAD != "energy":
+    logger.warning("SPECULATIVE_DRAFT is ignored without SERVER_VAD=energy, speculative decodes can't tell silence")
+# Instant captions come from a small draft model on a worker pool of their
+# own, so they stay fast whatever model the finals use. An empty INSTANT_MODEL
+# runs instant windows on the final model and pool, as before.
+INSTANT_MODEL = os.environ.get("INSTANT_MODEL", "tiny")
+INSTANT_WORKERS = int(os.environ.get("INSTANT_WORKERS", 1))
+if INSTANT_MODEL and INSTANT_MODEL not in transcription_service.models:
+    raise ValueError(f"Invalid INSTANT_MODEL: {INSTANT_MODEL}")
+# Final windows are decoded by this many worker processes, each with its own
+# models, reading the audio straight from the session's shared-memory ring.
+# This process then loads only the tokenizer of those models. Instant
+# windows stay in this process, unless their model is only loaded in the
+# workers. 0 decodes everything in this process.
+# Worker processes use the plain audio path: no feature cache, no speculative
+# decoding and no cross-session batching for finals.
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", 0))
+# Windows each worker process decodes at once. CTranslate2 shares a model's
+# weights between these replicas, so memory grows with INFERENCE_PROCESSES
+# only: one process with many replicas holds each model once.
+PROCESS_REPLICAS = int(os.environ.get("PROCESS_REPLICAS", 1))
+
+if INFERENCE_PROCESSES > 0:
+    # Started by the first model load, once its snapshot is downloaded. This
+    # process counts the workers' copies against MODEL_CACHE_MB; each worker
+    # also holds at most its share of it, should it load a model on its own
+    process_pool = InferenceProcessPool(
+        INFERENCE_PROCESSES,
+        replicas=PROCESS_REPLICAS,
+        budget_mb=transcription_service.models.budget_mb // INFERENCE_PROCESSES,
+        warmup_seconds=transcription_service.warmup_seconds
+    )
+    transcription_service.process_pool = process_pool
+else:
+    process_pool = None
+
+inference_scheduler = InferenceScheduler(
+    # With worker processes a scheduler thread only waits for its window
+    num_workers=process_pool.slots if process_pool is not None else INFERENCE_WORKERS,
+    max_queue_per_session=SESSION_QUEUE_SIZE,
+    policy=SCHEDULER_POLICY,
+    max_batch_size=BATCH_MAX_SIZE,
+    batch_timeout=BATCH_TIMEOUT_MS / 1000
+)
+inference_scheduler.start()
+
+if INSTANT_MODEL:
+    instant_scheduler = InferenceScheduler(
+        num_workers=INSTANT_WORKERS,
+        max_queue_per_session=2,
+        policy=SCHEDULER_POLICY,
+        name="instant",
+        max_batch_size=BATCH_MAX_SIZE,
+        batch_timeout=BATCH_TIMEOUT_MS / 1000
+    )
+    instant_scheduler.start()
+    # Until the draft model is in memory, instant windows use the final model
+    threading.Thread(
+        target=transcription_service.load_pinned_model,
+        args=(INSTANT_MODEL,),
+        daemon=True
+    ).start()
+else:
+    instant_scheduler = inference_scheduler
+
+# Finals decoded by worker processes are never speculative, see enqueue_window
+if SPECULATIVE_DRAFT and SPECULATIVE_DRAFT != INSTANT_MODEL and process_pool is None:
+    threading.Thread(
+        target=transcription_service.load_pinned_model,
+        args=(SPECULATIVE_DRAFT,),
+        daemon=True
+    ).start()
+
+# The default model loads in the background too, so the port is bound and
+# /healthz answers right away; /readyz reports when it can transcribe
+threading.Thread(target=transcription_service.load_default_model, daemon=True).start()
+
+@dataclass
+class WindowRequest:
+    """A window of a session's ring buffer, samples [start, end), and how to decode it"""
+    buffer: AudioRingBuffer
+    start: int
+    end: int
+    vad: int
+    beam_size: Optional[int] = None
+    word_timestamps: bool = False
+    # Recently committed text, passed to the decoder as context
+    prompt: Optional[str] = None
+    # faster-whisper's own VAD, redundant when the server VAD gate already removed silence
+    vad_filter: bool = True
+    final: bool = False
+    # None decodes with the current final model
+    model_size: Optional[str] = None
+    # The session's cached log-mel frames; decoded from those instead of the raw audio
+    features: Optional[StreamingLogMel] = None
+    # Draft model for a speculative greedy decode, see SpeculativeDecoder
+    speculative: Optional[str] = None
+    # Decoded by a worker process; buffer is then a SharedAudioRingBuffer
+    remote: bool = False
+    # Set by the worker: wall time of the decode (of the whole batch, if batched)
+    decode_seconds: float = 0.0
+    batch_size: int = 1
+    
+    @property
+    def batch_key(self):
+        """Windows sharing this key can be decoded in one batch"""
+        return (
+            self.model_size, self.vad, self.beam_size, self.features is not None,
+            self.word_timestamps, self.vad_filter
+        )
+    
+    @property
+    def batchable(self) -> bool:
+        """Whether a batched decode gives the window the same result as decoding it alone.
+        
+        Feature windows take the batched decode either way. An audio window
+        alone goes through transcribe_audio, with the temperature fallback
+        and vad_filter the batched decode lacks.
+        """
+        if self.speculative is not None or self.remote:
+            return False
+        if self.features is not None:
+            return True
+        return not self.vad_filter and (BATCH_FINALS or not self.final)
+
+def window_log_mel(request: WindowRequest):
+    """Copy of a feature window's cached log-mel frames, and the time of its first frame.
+    
+    Raises WindowDropped if the frames were overwritten before or while copying.
+    """
+    n_mels = transcription_service.mel_filters(request.model_size).shape[0]
+    try:
+        first, log_mel = request.features.span(n_mels, request.start, request.end)
+    except IndexError:
+        raise WindowDropped("Window overwritten before decode")
+    log_mel = np.array(log_mel)
+    if not request.features.contains(first):
+        raise WindowDropped("Window overwritten before decode")
+    return log_mel, (first * request.features.hop_length - request.start) / 16000
+
+def shift_segments(transcriptions: List[dict], shift: float) -> List[dict]:
+    """Move segment (and word) times by shift seconds"""
+    for transcription in transcriptions:
+        transcription["start"] += shift
+        transcription["end"] += shift
+        for word in transcription.get("words", []):
+            word["start"] += shift
+            word["end"] += shift
+    return transcriptions
+
+def transcribe_window(request: WindowRequest):
+    """Scheduler entry point: transcribe one window of a session ring buffer.
+    
+    The window is a zero-copy view, so if the session wrote a full buffer of new
+    audio while it waited or decoded, it was overwritten and gets dropped.
+    """
+    started = time.monotonic()
+    try:
+        return _transcribe_window(request)
+    finally:
+        request.decode_seconds = time.monotonic() - started
+
+def _transcribe_window(request: WindowRequest):
+    if request.remote:
+        return transcribe_remote(request)
+    
+    if request.speculative is not None:
+        try:
+            audio = request.buffer.span(request.start, request.end)
+        except IndexError:
+            raise WindowDropped("Window overwritten before decode")
+        transcriptions = transcription_service.transcribe_speculative(
+            audio,
+            request.speculative,
+            request.prompt,
+            request.word_timestamps,
+            request.model_size
+        )
+        if not request.buffer.contains(request.start):
+            raise WindowDropped("Window overwritten during decode")
+        return transcriptions
+    
+    if request.features is not None:
+        log_mel, shift = window_log_mel(request)
+        transcriptions = transcription_service.transcribe_features(
+            [log_mel],
+            request.vad,
+            request.beam_size,
+            [request.prompt],
+            request.model_size,
+            request.word_timestamps
+        )[0]
+        return shift_segments(transcriptions, shift)
+    
+    try:
+        audio = request.buffer.span(request.start, request.end)
+    except IndexError:
+        raise WindowDropped("Window overwritten before decode")
+    
+    transcriptions = transcription_service.transcribe_audio(
+        audio,
+        request.vad,
+        request.beam_size,
+        request.word_timestamps,
+        request.prompt,
+        request.vad_filter,
+        request.model_size
+    )
+    if not request.buffer.contains(request.start):
+        raise WindowDropped("Window overwritten during decode")
+    return transcriptions
+
+def transcribe_remote(request: WindowRequest):
+    """Decode a window in a worker process, which maps the session ring itself"""
+    if not request.buffer.contains(request.start):
+        raise WindowDropped("Window overwritten before decode")
+    
+    transcriptions = process_pool.transcribe(RemoteWindow(
+        ring=request.buffer.name,
+        capacity=request.buffer.capacity,
+        start=request.start,
+        end=request.end,
+        model_size=request.model_size,
+        beam_size=request.beam_size if request.beam_size is not None else 6 - request.vad,
+        vad_filter=request.vad_filter,
+        word_timestamps=request.word_timestamps,
+        prompt_tokens=transcription_service.prompt_tokens(request.model_size, request.prompt)
+    ))
+    if not request.buffer.contains(request.start):
+        raise WindowDropped("Window overwritten during decode")
+    return transcriptions
+
+def transcribe_window_batch(jobs: List[tuple]):
+    """Batch entry point for the scheduler; jobs are (WindowRequest,) sharing a batch key"""
+    requests = [request for request, in jobs]
+    started = time.monotonic()
+    try:
+        return _transcribe_window_batch(requests)
+    finally:
+        for request in requests:
+            request.decode_seconds = time.monotonic() - started
+            request.batch_size = len(requests)
+
+def _transcribe_window_batch(requests: List[WindowRequest]):
+    results: List = [WindowDropped("Window overwritten before decode")] * len(requests)
+    
+    if requests[0].features is not None:
+        windows = []
+        for i, request in enumerate(requests):
+            try:
+                windows.append((i, *window_log_mel(request)))
+            except WindowDropped:
+                pass
+        if not windows:
+            return results
+        
+        batch = transcription_service.transcribe_features(
+            [log_mel for _, log_mel, _ in windows],
+            requests[0].vad,
+            requests[0].beam_size,
+            [requests[i].prompt for i, _, _ in windows],
+            requests[0].model_size,
+            requests[0].word_timestamps
+        )
+        for (i, _, shift), transcriptions in zip(windows, batch):
+            results[i] = shift_segments(transcriptions, shift)
+        return results
+    
+    live = [
+        (i, request.buffer.span(request.start, request.end))
+        for i, request in enumerate(requests)
+        if request.buffer.contains(request.start)
+    ]
+    if not live:
+        return results
+    
+    batch = transcription_service.transcribe_batch(
+        [audio for _, audio in live],
+        requests[0].vad,
+        requests[0].beam_size,
+        [requests[i].prompt for i, _ in live],
+        requests[0].model_size,
+        requests[0].word_timestamps,
+        requests[0].vad_filter
+    )
+    for (i, _), transcriptions in zip(live, batch):
+        if requests[i].buffer.contains(requests[i].start):
+            results[i] = transcriptions
+        else:
+            results[i] = WindowDropped("Window overwritten during decode")
+    return results
+
 # Ollama configuration
 OLLAMA_BASE_URL = "http://localhost:11434"
 
@@ -200,23 +1079,94 @@ async def check_model(model: str = Query(default="small")):
     return {"exists": exists, "model": model, "size": sizes.get(model, "Unknown")}
 
 @app.get("/download-progress")
-async def download_progress():
-    """Get current download progress"""
-    return transcription_service.download_progress or {}
+async def download_progress(model: str = Query(default="small")):
+    """Get the download progress of a model"""
+    return transcription_service.download_progress.get(model, {})
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the default model is loaded and warmed up, in the worker processes too"""
+    model = transcription_service.current_model
+    if transcription_service.is_ready() and (process_pool is None or process_pool.ready):
+        return {"status": "ready", "model": model}
+    if transcription_service.startup_error is not None:
+        status = {"status": "failed", "model": model, "error": transcription_service.startup_error}
+    elif model in transcription_service.warming:
+        status = {"status": "warming", "model": model}
+    elif transcription_service.is_ready():
+        # All worker processes are restarting
+        status = {"status": "starting_workers", "model": model}
+    else:
+        status = {"status": "loading", "model": model}
+    return JSONResponse(status, status_code=503)
 
 @app.get("/model-status")
 async def model_status(model: str = Query(default="small")):
     """Check if a specific model is loaded and ready"""
-    is_loaded = transcription_service.models.get(model) is not None
-    is_downloading = transcription_service.is_downloading and transcription_service.current_model == model
+    # A model is only in the registry once its warmup decode is done
+    is_loaded = model in transcription_service.models.loaded()
+    is_downloading = model in transcription_service.downloading
+    is_warming = model in transcription_service.warming
+    
+    if is_loaded:
+        state = "ready"
+    elif is_warming:
+        state = "warming"
+    elif is_downloading:
+        state = "downloading"
+    else:
+        state = "not_loaded"
     
     return {
         "model": model,
+        "state": state,
         "is_loaded": is_loaded,
         "is_downloading": is_downloading,
+        "is_warming": is_warming,
         "is_current": transcription_service.current_model == model
     }
 
+@app.get("/scheduler-stats")
+async def scheduler_stats():
+    """Per-session queue depth and wait time of the inference scheduler"""
+    return {
+        "final": inference_scheduler.stats(),
+        "instant": instant_scheduler.stats() if instant_scheduler is not inference_scheduler else None,
+        "speculative": transcription_service.speculative_stats.as_dict(),
+        "processes": process_pool.stats() if process_pool is not None else None
+    }
+
+def total_workers() -> int:
+    if instant_scheduler is inference_scheduler:
+        return inference_scheduler.num_workers
+    return inference_scheduler.num_workers + instant_scheduler.num_workers
+
+@app.get("/stats")
+async def stats():
+    """Audio in, decode time, queue wait and real-time factor per model and session"""
+    return {
+        **transcription_service.metrics.stats(total_workers()),
+        "model_cache": transcription_service.models.stats(),
+        "replicas": transcription_service.replicas.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """The same telemetry in Prometheus text format"""
+    return PlainTextResponse(
+        transcription_service.metrics.prometheus(
+            total_workers(),
+            transcription_service.models.stats(),
+            transcription_service.replicas.stats()
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.get("/ollama-models")
 async def get_ollama_models():
     """Get list of available Ollama models"""
@@ -327,111 +1277,426 @@ async def websocket_endpoint(
     websocket: WebSocket,
     model: str = Query(default="small"),
     vad: int = Query(default=3),
-    instant: bool = Query(default=False)
+    instant: bool = Query(default=False),
+    word_timestamps: bool = Query(default=WORD_TIMESTAMPS)
 ):
     await websocket.accept()
-    logger.info(f"WebSocket connection established with model={model}, vad={vad}, instant={instant}")
+    logger.info(
+        f"WebSocket connection established with model={model}, vad={vad}, "
+        f"instant={instant}, word_timestamps={word_timestamps}"
+    )
+    
+    loop = asyncio.get_running_loop()
+    session_id = uuid.uuid4().hex[:8]
+    # Futures of submitted windows, in the order they were captured. Instant
+    # windows have a queue of their own so they never wait behind a final decode.
+    pending_results: asyncio.Queue = asyncio.Queue()
+    instant_results: asyncio.Queue = asyncio.Queue()
+    worker_tasks = []
+    controller = None
+    default_beam = max(1, 6 - vad)
+    # The session's own model, independent of the server's default model
+    session_model: Optional[ModelHandle] = None
+    fallback_model: Optional[ModelHandle] = None
+    audio_buffer: Optional[AudioRingBuffer] = None
+    
+    # Lag tracking, in samples: audio received vs. end of the last transcribed final window
+    transcribed_until = 0
+    pending_finals = 0
+    behind = False
+    
+    def current_lag() -> float:
+        return (audio_buffer.write_position - transcribed_until) / 16000
+    
+    def session_time(buffer_seconds: float) -> float:
+        """Session time of a buffer time, counting the silence the VAD gate left out"""
+        return time_map.to_session(int(buffer_seconds * 16000)) / 16000
+    
+    def session_words(words: List[Word]) -> List[Word]:
+        return [Word(session_time(word.start), session_time(word.end), word.text) for word in words]
+    
+    async def send_captions(messages: List[dict], lag: float):
+        for message in messages:
+            message["lag"] = round(lag, 2)
+            await websocket.send_json(message)
+    
+    def enqueue_window(
+        mode: str,
+        start: int,
+        end: int,
+        beam_size: Optional[int] = None,
+        flush: bool = False
+    ):
+        """Hand samples [start, end) of the session buffer to the scheduler.
+        
+        A flushed final window commits its whole hypothesis without waiting for agreement.
+        """
+        nonlocal pending_finals
+        if mode == "instant":
+            model_size = transcription_service.instant_model(session_model.size)
+        else:
+            model_size = session_model.size
+        if mode == "final" and controller is not None:
+            level = controller.level
+            model_size = level.model_size or session_model.size
+            if beam_size is None and level.beam_size < default_beam:
+                beam_size = level.beam_size
+        request = WindowRequest(
+            buffer=audio_buffer,
+            start=start,
+            end=end,
+            vad=vad,
+            beam_size=beam_size,
+            word_timestamps=word_timestamps and mode == "final",
+            prompt=prompt_context.text(received_samples / 16000),
+            vad_filter=vad_gate is None,
+            final=mode == "final",
+            model_size=model_size,
+            features=feature_cache
+        )
+        if (
+            mode == "final"
+            and model_size == session_model.size
+            # Its silence handling is the server VAD gate, see transcribe_speculative
+            and not request.vad_filter
+            and transcription_service.use_speculative(model_size)
+        ):
+            request.speculative = SPECULATIVE_DRAFT
+            request.features = None
+        if process_pool is not None and (mode == "final" or transcription_service.is_remote(model_size)):
+            request.remote = True
+            request.speculative = None
+            request.features = None
+        if request.features is not None:
+            # The filterbank must be in the cache before the decode
+            feature_cache.add_filterbank(transcription_service.mel_filters(request.model_size))
+        latency_budget = INSTANT_LATENCY_BUDGET if mode == "instant" else (end - start) / 16000
+        scheduler = instant_scheduler if mode == "instant" else inference_scheduler
+        future = scheduler.submit(
+            session_id,
+            transcribe_window,
+            request,
+            kind=mode,
+            latency_budget=latency_budget,
+            batch_key=request.batch_key,
+            batch_fn=transcribe_window_batch if request.batchable else None
+        )
+        if mode == "final":
+            pending_finals += 1
+            pending_results.put_nowait((mode, request, flush, time.monotonic(), future))
+        else:
+            instant_results.put_nowait((mode, request, flush, time.monotonic(), future))
+    
+    async def update_lag_status():
+        """Tell the client when the session starts or stops falling behind"""
+        nonlocal behind
+        lag = current_lag()
+        is_behind = lag > window_samples / 16000 + LAG_THRESHOLD
+        if is_behind != behind:
+            behind = is_behind
+            if behind:
+                logger.warning(f"Session {session_id} is {lag:.1f} s behind real time")
+            await websocket.send_json({
+                "type": "status",
+                "behind": behind,
+                "lag": round(lag, 2),
+                "queue_depth": inference_scheduler.queue_depth(session_id)
+            })
+    
+    async def update_quality(latency: float, request: WindowRequest):
+        """Feed a final window's timing to the SLO controller and report level changes"""
+        if controller is None:
+            return
+        rtf = request.decode_seconds / max((request.end - request.start) / 16000, 0.1)
+        reason = controller.observe(latency, rtf)
+        if reason is None:
+            return
+        
+        level = controller.level
+        logger.info(f"Session {session_id} quality level {controller.index} ({reason}): {level.as_dict()}")
+        await websocket.send_json({
+            "type": "status",
+            "quality": {"level": controller.index, **level.as_dict()},
+            "reason": reason,
+            "latency": round(controller.latency, 2),
+            "rtf": round(controller.rtf, 2)
+        })
+    
+    async def process_windows(results: asyncio.Queue):
+        """Wait for scheduled windows in order and send the results"""
+        nonlocal transcribed_until, pending_finals
+        
+        while True:
+            mode, request, flush, submitted_at, future = await results.get()
+            start, end = request.start, request.end
+            
+            # Keep reporting lag while a slow decode is running
+            while not future.done():
+                await asyncio.wait({future}, timeout=1.0)
+                if not future.done():
+                    await update_lag_status()
+            
+            try:
+                transcriptions = future.result()
+            except WindowDropped:
+                transcription_service.metrics.record_dropped()
+                if mode == "final":
+                    # That audio is gone for good, it no longer counts as lag
+                    transcribed_until = max(transcribed_until, end)
+                continue
+            except Exception as e:
+                if mode == "instant":
+                    logger.error(f"Instant transcription error: {e}")
+                else:
+                    logger.error(f"Transcription error: {e}")
+                    await websocket.send_json({
+                        "type": "error",
+                        "message": str(e)
+                    })
+                continue
+            finally:
+                if mode == "final":
+                    pending_finals -= 1
+            
+            lag = current_lag()
+            offset = start / 16000
+            latency = time.monotonic() - submitted_at
+            transcription_service.metrics.record_window(
+                session_id,
+                request.model_size,
+                mode,
+                (end - start) / 16000,
+                request.decode_seconds,
+                max(0.0, latency - request.decode_seconds),
+                request.batch_size
+            )
+            
+            if mode == "final":
+                transcribed_until = max(transcribed_until, end)
+                await update_lag_status()
+                await update_quality(latency, request)
+                
+                words = segments_to_words(transcriptions, offset)
+                if flush or (end - audio_buffer.read_position) >= max_buffer_samples:
+                    # Speech is over, or nothing was stable for too long: take this hypothesis as it is
+                    committed = agreement.flush(words)
+                    trim_point = end / 16000
+                else:
+                    committed = agreement.insert(words)
+                    if word_timestamps:
+                        # Cut right after the last committed word
+                        trim_point = agreement.committed_until if committed else None
+                    else:
+                        trim_point = segment_trim_point(transcriptions, offset, agreement.committed_until)
+                
+                # Committed audio is never decoded again
+                if trim_point is not None:
+                    audio_buffer.consume(int(trim_point * 16000) - audio_buffer.read_position)
+                
+                committed = session_words(committed)
+                prompt_context.add(committed)
+                if committed:
+                    transcription_service.metrics.record_caption_delay(
+                        session_id, received_samples / 16000 - committed[-1].end
+                    )
+                # Instant words past this window are newer than its hypothesis, keep them
+                window_end = session_time(end / 16000)
+                newer = [word for word in captions.words if word.start >= window_end]
+                await send_captions(
+                    captions.commit(committed, session_words(agreement.unconfirmed()) + newer),
+                    lag
+                )
+                continue
+            
+            if "skip_instant" in LAG_POLICY and end <= transcribed_until:
+                # A final window already covers this audio
+                continue
+            
+            await update_lag_status()
+            
+            # The instant window overlaps committed text, and the start of the
+            # open segment may be older than the window
+            committed_until = session_time(agreement.committed_until)
+            window_start = session_time(offset)
+            words = [
+                word for word in session_words(segments_to_words(transcriptions, offset))
+                if word.start > committed_until - 0.1
+            ]
+            earlier = [word for word in captions.words if word.end <= window_start]
+            message = captions.tentative(earlier + words)
+            if message is not None:
+                await send_captions([message], lag)
     
     try:
         # Wait for model to be ready if it's downloading
         max_wait = 300  # 5 minutes max
         wait_time = 0
-        while transcription_service.is_downloading and wait_time < max_wait:
+        while model in transcription_service.downloading and wait_time < max_wait:
             await asyncio.sleep(1)
             wait_time += 1
             
-        if model != transcription_service.current_model:
+        if model not in transcription_service.models:
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Invalid model size: {model}"
+            })
+            await websocket.close()
+            return
+        
+        # Taken before loading, so no other session's load can evict it meanwhile
+        session_model = ModelHandle(transcription_service.models, model)
+        if not session_model.loaded:
             await websocket.send_json({
                 "type": "model_loading",
                 "model": model
             })
-            transcription_service.load_model(model)
+            # Load off the event loop so other sessions keep running meanwhile.
+            # The server's default model is left as it is.
+            await loop.run_in_executor(None, transcription_service.load_model, model, False)
             await websocket.send_json({
                 "type": "model_loaded",
                 "model": model
             })
         
+        if SLO_CONTROLLER:
+            fallback = smaller_model(model, transcription_service.models.loaded())
+            if fallback is not None:
+                # Picked among loaded models, so not a lookup of its own
+                fallback_model = ModelHandle(transcription_service.models, fallback, count_lookup=False)
+            controller = LatencyController(quality_ladder(default_beam, fallback), SLO_TARGET_LATENCY)
+        
+        inference_scheduler.register_session(session_id)
+        instant_scheduler.register_session(session_id)
+        worker_tasks = [
+            asyncio.create_task(process_windows(pending_results)),
+            asyncio.create_task(process_windows(instant_results))
+        ]
+        
+        # Window sizes are counted in client chunks of CHUNK_SAMPLES samples
         buffer_size = 30 - (vad * 2)
-        audio_buffer = []
-        instant_buffer = []  # For instant mode
+        window_samples = buffer_size * CHUNK_SAMPLES
         instant_buffer_size = 8  # Much smaller for instant transcription
+        instant_window_samples = instant_buffer_size * CHUNK_SAMPLES
+        instant_overlap_samples = (instant_buffer_size // 4) * CHUNK_SAMPLES  # Small overlap
+        next_instant_at = instant_window_samples
+        
+        # Windows are decoded straight from the ring; one that falls more than
+        # RING_BUFFER_WINDOWS windows behind is overwritten and dropped. The ring
+        # lives in shared memory when worker processes decode the finals.
+        if process_pool is not None:
+            audio_buffer = SharedAudioRingBuffer(window_samples * RING_BUFFER_WINDOWS)
+        else:
+            audio_buffer = AudioRingBuffer(window_samples * RING_BUFFER_WINDOWS)
+        # The uncommitted buffer must fit in the ring next to new audio
+        max_buffer_samples = min(
+            MAX_BUFFER_SECONDS * 16000,
+            audio_buffer.capacity - window_samples
+        )
+        # The growing buffer is decoded again every half window of new audio
+        step_samples = window_samples // 2
+        last_final_at = 0
+        last_final_received = 0
+        agreement = LocalAgreement(AGREEMENT_N)
+        prompt_context = PromptContext(PROMPT_RESET_SECONDS)
+        captions = CaptionTrack()
+        
+        # Silence is dropped before it reaches the buffer; the time map keeps
+        # caption times on the session timeline anyway
+        vad_gate = VadGate(EnergyVad(vad)) if SERVER_VAD == "energy" else None
+        time_map = TimeMap()
+        received_samples = 0
+        
+        # Uses the gate's frame decisions, or a detector of its own without a gate
+        endpointer = Endpointer(ENDPOINT_SILENCE_MS, ENDPOINT_MAX_SECONDS) if ENDPOINTING else None
+        endpoint_vad = EnergyVad(vad) if endpointer is not None and vad_gate is None else None
+        endpoint_pending = False
+        
+        # Log-mel frames of everything in the ring, computed once per chunk and
+        # shared by every window cut from it
+        feature_cache = StreamingLogMel(audio_buffer.capacity // 160 + 1) if FEATURE_CACHE else None
         
-        last_transcription_text = ""
-        last_transcription_time = 0
-        last_instant_text = ""
-        last_instant_time = 0
+        def append_audio(samples: np.ndarray):
+            audio_buffer.append(samples)
+            if feature_cache is not None:
+                feature_cache.append(samples)
         
         while True:
             data = await websocket.receive_bytes()
             
-            audio_array = np.frombuffer(data, dtype=np.float32)
-            audio_buffer.append(audio_array)
+            chunk = np.frombuffer(data, dtype=np.float32)
+            received_samples += len(chunk)
+            if vad_gate is None:
+                append_audio(chunk)
+            else:
+                for speech in vad_gate.process(chunk):
+                    append_audio(speech)
+                time_map.skip(audio_buffer.write_position, vad_gate.skipped_samples)
+                time_map.prune(audio_buffer.write_position - audio_buffer.capacity)
+            in_speech = vad_gate is None or vad_gate.is_speech
+            
+            if endpointer is not None:
+                frames = vad_gate.frames if vad_gate is not None else endpoint_vad.speech_frames(chunk)
+                reason = endpointer.update(frames, len(chunk))
+                if reason is not None:
+                    logger.debug(f"Session {session_id} utterance end ({reason})")
+                    # Held until the decode in flight is back
+                    endpoint_pending = True
             
             # Handle instant mode transcription
-            if instant:
-                instant_buffer.append(audio_array)
-                
-                if len(instant_buffer) >= instant_buffer_size:
-                    instant_audio = np.concatenate(instant_buffer)
-                    instant_buffer = instant_buffer[-(instant_buffer_size//4):]  # Small overlap
-                    
-                    try:
-                        instant_transcriptions = transcription_service.transcribe_audio(instant_audio, vad)
-                        
-                        if instant_transcriptions:
-                            for transcription in instant_transcriptions:
-                                current_time = time.time()
-                                text = transcription["text"].strip()
-                                
-                                # More lenient duplicate filtering for instant mode
-                                if text and (text != last_instant_text or 
-                                           current_time - last_instant_time > 1.0):
-                                    await websocket.send_json({
-                                        "type": "transcription",
-                                        "mode": "instant",
-                                        "data": transcription
-                                    })
-                                    last_instant_text = text
-                                    last_instant_time = current_time
-                    except Exception as e:
-                        logger.error(f"Instant transcription error: {e}")
-            
-            # Handle normal (final) transcription
-            if len(audio_buffer) >= buffer_size:
-                full_audio = np.concatenate(audio_buffer)
-                audio_buffer = audio_buffer[-(buffer_size//4):]
-                
-                try:
-                    transcriptions = transcription_service.transcribe_audio(full_audio, vad)
-                    
-                    if transcriptions:
-                        for transcription in transcriptions:
-                            # Filter out duplicates - ignore if same text within 2 seconds
-                            current_time = time.time()
-                            text = transcription["text"].strip()
-                            
-                            # Skip if it's the same text as last time (within 2 seconds)
-                            if text and (text != last_transcription_text or 
-                                       current_time - last_transcription_time > 2.0):
-                                await websocket.send_json({
-                                    "type": "transcription",
-                                    "mode": "final",
-                                    "data": transcription
-                                })
-                                last_transcription_text = text
-                                last_transcription_time = current_time
-                except Exception as e:
-                    logger.error(f"Transcription error: {e}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": str(e)
-                    })
+            if instant and audio_buffer.write_position >= next_instant_at:
+                end = audio_buffer.write_position
+                # Instant captions are pointless when finals are already late
+                if not (behind and "skip_instant" in LAG_POLICY):
+                    enqueue_window("instant", end - instant_window_samples, end)
+                next_instant_at += instant_window_samples - instant_overlap_samples
+            
+            # Handle normal (final) transcription: one decode of the whole
+            # uncommitted buffer at a time, new audio waits for the next one
+            new_samples = audio_buffer.write_position - last_final_at
+            # Once speech stops nothing new arrives, so decode what is left one
+            # last time and commit it rather than wait for the next sentence
+            settle = (
+                endpointer is None and not in_speech and len(audio_buffer) > 0
+                and (new_samples > 0 or agreement.unconfirmed())
+                and received_samples - last_final_received >= step_samples
+            )
+            if endpoint_pending and len(audio_buffer) == 0:
+                endpoint_pending = False
+            step = step_samples if controller is None else int(step_samples * controller.level.step_scale)
+            if pending_finals == 0 and (new_samples >= step or settle or endpoint_pending):
+                beam_size = 1 if behind and "fast" in LAG_POLICY else None
+                last_final_at = audio_buffer.write_position
+                last_final_received = received_samples
+                enqueue_window(
+                    "final",
+                    audio_buffer.read_position,
+                    audio_buffer.write_position,
+                    beam_size,
+                    flush=settle or endpoint_pending
+                )
+                endpoint_pending = False
+            
+            # Surface errors from the inference task instead of buffering forever
+            for task in worker_tasks:
+                if task.done():
+                    task.result()
     
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        for task in worker_tasks:
+            task.cancel()
+        inference_scheduler.unregister_session(session_id)
+        instant_scheduler.unregister_session(session_id)
+        transcription_service.metrics.end_session(session_id)
+        for handle in (session_model, fallback_model):
+            if handle is not None:
+                handle.close()
+        if isinstance(audio_buffer, SharedAudioRingBuffer):
+            audio_buffer.close()
 
 if __name__ == "__main__":
     import uvicorn
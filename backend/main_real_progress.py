@@ -1,78 +1,192 @@
-import os
-from typing import Optional, Dict
-import numpy as np
-from faster_whisper import WhisperModel
+import fnmatch
 import logging
-from huggingface_hub import snapshot_download
-from tqdm import tqdm
+import os
+import threading
+import time
+from typing import Callable, Optional
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The files faster-whisper needs, same patterns as its download_model()
+MODEL_FILES = ["config.json", "preprocessor_config.json", "model.bin", "tokenizer.json", "vocabulary.*"]
+
+
+def snapshot_complete(path: str) -> bool:
+    """Whether a snapshot folder has a file for every MODEL_FILES pattern.
+
+    huggingface_hub links a file into the snapshot only once its blob is
+    complete, so a pull interrupted halfway misses some of them.
+    """
+    try:
+        names = [name for name in os.listdir(path) if os.path.exists(os.path.join(path, name))]
+    except OSError:
+        return False
+    return all(any(fnmatch.fnmatch(name, pattern) for name in names) for pattern in MODEL_FILES)
+
+
 class RealProgressTracker:
-    def __init__(self):
-        self.total_bytes = 0
+    """Byte counts, throughput and ETA of one model download.
+
+    Fed the bytes on disk every tick: finished files plus the partial
+    `.incomplete` blobs huggingface_hub writes to, so a resumed download
+    starts from what is already there. Throughput is smoothed over ticks.
+    """
+
+    def __init__(self, model: str, total_bytes: int, smoothing: float = 0.3):
+        self.model = model
+        self.total_bytes = total_bytes
+        self.smoothing = smoothing
         self.downloaded_bytes = 0
-        self.download_progress = None
-        
-    def update_progress(self, block_num, block_size, total_size):
-        """Callback for tracking download progress"""
-        if total_size > 0:
-            self.total_bytes = total_size
-            self.downloaded_bytes = block_num * block_size
-            percentage = min(int((self.downloaded_bytes / total_size) * 100), 100)
-            
-            self.download_progress = {
-                "percentage": percentage,
-                "status": f"Laddar ner... {percentage}%",
-                "downloaded": self.format_bytes(self.downloaded_bytes),
-                "total": self.format_bytes(total_size)
-            }
-    
-    def format_bytes(self, bytes):
+        self.resumed_bytes: Optional[int] = None
+        self.bytes_per_second = 0.0
+        self.current_file: Optional[str] = None
+        self._last: Optional[tuple] = None
+
+    def update(self, downloaded_bytes: int, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if self.resumed_bytes is None:
+            self.resumed_bytes = downloaded_bytes
+        if self._last is not None and now > self._last[0]:
+            rate = max(0, downloaded_bytes - self._last[1]) / (now - self._last[0])
+            self.bytes_per_second += self.smoothing * (rate - self.bytes_per_second)
+        self._last = (now, downloaded_bytes)
+        self.downloaded_bytes = min(downloaded_bytes, self.total_bytes)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if self.bytes_per_second <= 0:
+            return None
+        return (self.total_bytes - self.downloaded_bytes) / self.bytes_per_second
+
+    def as_dict(self, done: bool = False) -> dict:
+        percentage = 100 if done else int(self.downloaded_bytes / self.total_bytes * 100) if self.total_bytes else 0
+        eta = self.eta_seconds
+        if done:
+            status = f"{self.model} modell nedladdad och klar!"
+        elif eta is not None:
+            status = (
+                f"Laddar ner {self.model} modell... {percentage}% "
+                f"({self.format_bytes(self.bytes_per_second)}/s, {self.format_duration(eta)} kvar)"
+            )
+        else:
+            status = f"Laddar ner {self.model} modell... {percentage}%"
+        return {
+            "model": self.model,
+            "is_downloading": not done,
+            "status": status,
+            "percentage": percentage,
+            "downloaded": self.format_bytes(self.downloaded_bytes),
+            "total": self.format_bytes(self.total_bytes),
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "resumed_bytes": self.resumed_bytes or 0,
+            "bytes_per_second": round(self.bytes_per_second),
+            "eta_seconds": round(eta) if eta is not None and not done else None,
+            "file": self.current_file
+        }
+
+    @staticmethod
+    def format_bytes(bytes):
         for unit in ['B', 'KB', 'MB', 'GB']:
             if bytes < 1024.0:
                 return f"{bytes:.1f} {unit}"
             bytes /= 1024.0
         return f"{bytes:.1f} TB"
 
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        seconds = int(seconds)
+        if seconds < 60:
+            return f"{seconds} s"
+        if seconds < 3600:
+            return f"{seconds // 60} min {seconds % 60} s"
+        return f"{seconds // 3600} h {seconds % 3600 // 60} min"
+
+
 class RealDownloadService:
-    def __init__(self):
-        self.progress_tracker = RealProgressTracker()
-    
-    def download_with_real_progress(self, model_id: str, local_dir: str):
-        """Download model with real progress tracking"""
-        
-        class ProgressCallback:
-            def __init__(self, tracker):
-                self.tracker = tracker
-                self.pbar = None
-                
-            def __call__(self, progress_info):
-                if isinstance(progress_info, tqdm):
-                    # Extract real progress from tqdm object
-                    if progress_info.total:
-                        percentage = int((progress_info.n / progress_info.total) * 100)
-                        self.tracker.download_progress = {
-                            "percentage": percentage,
-                            "status": f"Laddar ner... {percentage}%",
-                            "downloaded": self.tracker.format_bytes(progress_info.n),
-                            "total": self.tracker.format_bytes(progress_info.total)
-                        }
-        
-        # Download with progress callback
+    """Downloads a model into the Hugging Face cache, reporting real progress.
+
+    Lists the model's files with their sizes first, then fetches them one
+    by one with hf_hub_download into the same cache layout faster-whisper
+    uses (so WhisperModel finds them later). Partial files are resumed.
+    A monitor thread reads the bytes on disk every `interval` seconds
+    and passes RealProgressTracker.as_dict() to on_progress.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+
+    def download(
+        self,
+        model_id: str,
+        cache_dir: str,
+        on_progress: Callable[[dict], None],
+        label: Optional[str] = None
+    ) -> str:
+        """Fetch the model files; returns the local snapshot folder to load the model from"""
+        from huggingface_hub import HfApi, hf_hub_download, try_to_load_from_cache
+
+        info = HfApi().model_info(model_id, files_metadata=True)
+        files = [
+            (sibling.rfilename, sibling.size or 0)
+            for sibling in info.siblings
+            if any(fnmatch.fnmatch(sibling.rfilename, pattern) for pattern in MODEL_FILES)
+        ]
+        # The weights last, so a snapshot with model.bin has everything else too
+        files.sort(key=lambda file: file[0] == "model.bin")
+        tracker = RealProgressTracker(label or model_id, sum(size for _, size in files))
+        blobs_dir = os.path.join(cache_dir, "models--" + model_id.replace("/", "--"), "blobs")
+
+        finished = 0
+        cached = set()
+        for filename, size in files:
+            if isinstance(try_to_load_from_cache(model_id, filename, cache_dir=cache_dir, revision=info.sha), str):
+                cached.add(filename)
+                finished += size
+
+        def bytes_on_disk() -> int:
+            partial = 0
+            try:
+                for name in os.listdir(blobs_dir):
+                    if name.endswith(".incomplete"):
+                        partial += os.path.getsize(os.path.join(blobs_dir, name))
+            except OSError:
+                pass
+            return finished + partial
+
+        done = threading.Event()
+
+        def monitor():
+            while not done.is_set():
+                tracker.update(bytes_on_disk())
+                on_progress(tracker.as_dict())
+                done.wait(self.interval)
+
+        logger.info(
+            f"Downloading {model_id}: {len(files) - len(cached)} of {len(files)} files, "
+            f"{RealProgressTracker.format_bytes(tracker.total_bytes - finished)} to fetch"
+        )
+        monitor_thread = threading.Thread(target=monitor, name="download-progress", daemon=True)
+        monitor_thread.start()
+        started = time.monotonic()
+        snapshot_dir = None
         try:
-            snapshot_download(
-                repo_id=model_id,
-                local_dir=local_dir,
-                local_dir_use_symlinks=False,
-                resume_download=True,  # Resume if interrupted
-                tqdm_class=lambda *args, **kwargs: ProgressCallback(self.progress_tracker)
-            )
-        except Exception as e:
-            logger.error(f"Download failed: {e}")
-            raise
+            for filename, size in files:
+                tracker.current_file = filename
+                path = hf_hub_download(model_id, filename, revision=info.sha, cache_dir=cache_dir)
+                snapshot_dir = os.path.dirname(path)
+                if filename not in cached:
+                    finished += size
+        finally:
+            done.set()
+            monitor_thread.join()
 
-# Example usage:
-# service = RealDownloadService()
-# service.download_with_real_progress("KBLab/kb-whisper-medium", "./models/medium")
\ No newline at end of file
+        tracker.update(finished)
+        tracker.current_file = None
+        on_progress(tracker.as_dict(done=True))
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Downloaded {model_id} in {elapsed:.1f} s "
+            f"({RealProgressTracker.format_bytes((finished - (tracker.resumed_bytes or 0)) / max(elapsed, 1e-3))}/s)"
+        )
+        return snapshot_dir
@@ -0,0 +1,279 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, Prometheus style (+Inf is implied)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+DELAY_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (cumulative on export)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile q, a rough but cheap estimate.
+
+        None when it falls in the +Inf bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result = []
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            result.append((f"{bound:g}", seen))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class RollingSum:
+    """Sum of values over the last `buckets * bucket_seconds` seconds, in one-bucket steps"""
+
+    def __init__(self, buckets: int = 60, bucket_seconds: float = 1.0):
+        self.bucket_seconds = bucket_seconds
+        self._values = [0.0] * buckets
+        self._stamps = [-1] * buckets
+
+    def add(self, value: float, now: float):
+        slot = int(now // self.bucket_seconds)
+        i = slot % len(self._values)
+        if self._stamps[i] != slot:
+            self._stamps[i] = slot
+            self._values[i] = 0.0
+        self._values[i] += value
+
+    def total(self, now: float) -> float:
+        oldest = int(now // self.bucket_seconds) - len(self._values) + 1
+        return sum(value for value, stamp in zip(self._values, self._stamps) if stamp >= oldest)
+
+    @property
+    def seconds(self) -> float:
+        return len(self._values) * self.bucket_seconds
+
+
+class WindowStats:
+    """Totals and a rolling minute of decoded windows for one model or session"""
+
+    def __init__(self):
+        self.windows = 0
+        self.audio_seconds = 0.0
+        # Worker time, a batched window counts for its share of the batch
+        self.decode_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.recent_audio = RollingSum()
+        self.recent_decode = RollingSum()
+
+    def add(self, audio_seconds: float, worker_seconds: float, queue_wait: float, now: float):
+        self.windows += 1
+        self.audio_seconds += audio_seconds
+        self.decode_seconds += worker_seconds
+        self.queue_wait_seconds += queue_wait
+        self.recent_audio.add(audio_seconds, now)
+        self.recent_decode.add(worker_seconds, now)
+
+    def recent_rtf(self, now: float) -> float:
+        audio = self.recent_audio.total(now)
+        return self.recent_decode.total(now) / audio if audio else 0.0
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "windows": self.windows,
+            "audio_seconds": round(self.audio_seconds, 2),
+            "decode_seconds": round(self.decode_seconds, 2),
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / self.windows * 1000, 1) if self.windows else 0.0,
+            "rtf": round(self.decode_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0,
+            "recent_rtf": round(self.recent_rtf(now), 3),
+            "recent_decode_seconds": round(self.recent_decode.total(now), 2)
+        }
+
+
+class Metrics:
+    """Inference telemetry per model and per session.
+
+    Everything is recorded from the event loop (when a window's result
+    arrives), so no locking is needed; recording is a few additions and
+    one bucket search. Rolling figures cover the last minute.
+    """
+
+    def __init__(self):
+        self.models: Dict[Tuple[str, str], WindowStats] = {}
+        self.sessions: Dict[str, WindowStats] = {}
+        self.inference_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.caption_delay = Histogram(DELAY_BUCKETS)
+        self.session_delay: Dict[str, Histogram] = {}
+        self.dropped_windows = 0
+
+    def record_window(
+        self,
+        session_id: str,
+        model_size: str,
+        kind: str,
+        audio_seconds: float,
+        decode_seconds: float,
+        queue_wait: float,
+        batch_size: int = 1,
+        now: Optional[float] = None
+    ):
+        """Record a decoded window; decode_seconds is the wall time of its (batched) decode"""
+        now = time.monotonic() if now is None else now
+        key = (model_size, kind)
+        if key not in self.models:
+            self.models[key] = WindowStats()
+            self.inference_latency[key] = Histogram(LATENCY_BUCKETS)
+        worker_seconds = decode_seconds / max(1, batch_size)
+        self.models[key].add(audio_seconds, worker_seconds, queue_wait, now)
+        self.inference_latency[key].observe(decode_seconds)
+        self.sessions.setdefault(session_id, WindowStats()).add(audio_seconds, worker_seconds, queue_wait, now)
+
+    def record_caption_delay(self, session_id: str, delay: float):
+        """Time from the end of the spoken words to their committed caption"""
+        self.caption_delay.observe(delay)
+        self.session_delay.setdefault(session_id, Histogram(DELAY_BUCKETS)).observe(delay)
+
+    def record_dropped(self):
+        self.dropped_windows += 1
+
+    def end_session(self, session_id: str):
+        self.sessions.pop(session_id, None)
+        self.session_delay.pop(session_id, None)
+
+    def stats(self, workers: int) -> dict:
+        """JSON view; utilisation is decode time over worker time in the last minute"""
+        now = time.monotonic()
+        recent_decode = sum(stats.recent_decode.total(now) for stats in self.models.values())
+        window = RollingSum().seconds
+        return {
+            "utilisation": round(recent_decode / (window * max(1, workers)), 3),
+            "dropped_windows": self.dropped_windows,
+            "caption_delay": self._histogram_summary(self.caption_delay),
+            "models": {
+                f"{model}/{kind}": {
+                    **stats.as_dict(now),
+                    "latency": self._histogram_summary(self.inference_latency[(model, kind)])
+                }
+                for (model, kind), stats in self.models.items()
+            },
+            "sessions": {
+                session_id: {
+                    **stats.as_dict(now),
+                    "caption_delay": self._histogram_summary(self.session_delay.get(session_id))
+                }
+                for session_id, stats in self.sessions.items()
+            }
+        }
+
+    def prometheus(self, workers: int, model_cache: Optional[dict] = None, replicas: Optional[dict] = None) -> str:
+        """Prometheus text exposition format; model_cache is ModelCache.stats(), replicas ReplicaPool.stats()"""
+        now = time.monotonic()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP live_subtitles_{name} {help_text}")
+            lines.append(f"# TYPE live_subtitles_{name} {kind}")
+
+        def labels(**values) -> str:
+            return "{" + ",".join(f'{key}="{value}"' for key, value in values.items()) + "}"
+
+        metric("audio_seconds_total", "counter", "Seconds of audio decoded")
+        for (model, kind), stats in self.models.items():
+            lines.append(f"live_subtitles_audio_seconds_total{labels(model=model, kind=kind)} {stats.audio_seconds:.3f}")
+        metric("decode_seconds_total", "counter", "Worker time spent decoding")
+        for (model, kind), stats in self.models.items():
+            lines.append(f"live_subtitles_decode_seconds_total{labels(model=model, kind=kind)} {stats.decode_seconds:.3f}")
+        metric("queue_wait_seconds_total", "counter", "Time windows spent waiting for a worker")
+        for (model, kind), stats in self.models.items():
+            lines.append(f"live_subtitles_queue_wait_seconds_total{labels(model=model, kind=kind)} {stats.queue_wait_seconds:.3f}")
+        metric("windows_total", "counter", "Windows decoded")
+        for (model, kind), stats in self.models.items():
+            lines.append(f"live_subtitles_windows_total{labels(model=model, kind=kind)} {stats.windows}")
+        metric("dropped_windows_total", "counter", "Windows dropped before or during decode")
+        lines.append(f"live_subtitles_dropped_windows_total {self.dropped_windows}")
+
+        metric("rtf", "gauge", "Real-time factor over the last minute")
+        for (model, kind), stats in self.models.items():
+            lines.append(f"live_subtitles_rtf{labels(model=model, kind=kind)} {stats.recent_rtf(now):.4f}")
+        metric("session_rtf", "gauge", "Real-time factor per session over the last minute")
+        for session_id, stats in self.sessions.items():
+            lines.append(f"live_subtitles_session_rtf{labels(session=session_id)} {stats.recent_rtf(now):.4f}")
+        metric("active_sessions", "gauge", "Sessions with recorded windows")
+        lines.append(f"live_subtitles_active_sessions {len(self.sessions)}")
+        metric("utilisation", "gauge", "Decode time over worker time in the last minute")
+        lines.append(f"live_subtitles_utilisation {self.stats(workers)['utilisation']}")
+
+        if model_cache is not None:
+            metric("model_cache_hits_total", "counter", "Sessions whose model was already in memory")
+            lines.append(f"live_subtitles_model_cache_hits_total {model_cache['hits']}")
+            metric("model_cache_misses_total", "counter", "Sessions whose model had to be loaded first")
+            lines.append(f"live_subtitles_model_cache_misses_total {model_cache['misses']}")
+            metric("model_cache_evictions_total", "counter", "Models evicted to stay within the budget")
+            lines.append(f"live_subtitles_model_cache_evictions_total {model_cache['evictions']}")
+            metric("model_cache_used_megabytes", "gauge", "Estimated memory of loaded models")
+            lines.append(f"live_subtitles_model_cache_used_megabytes {model_cache['used_mb']}")
+            metric("model_cache_budget_megabytes", "gauge", "Memory budget for loaded models")
+            lines.append(f"live_subtitles_model_cache_budget_megabytes {model_cache['budget_mb']}")
+
+        if replicas is not None:
+            metric("model_replicas", "gauge", "CTranslate2 replicas per loaded model")
+            for model, stats in replicas["models"].items():
+                lines.append(f"live_subtitles_model_replicas{labels(model=model)} {stats['replicas']}")
+            metric("model_replicas_busy", "gauge", "Replicas decoding right now")
+            for model, stats in replicas["models"].items():
+                lines.append(f"live_subtitles_model_replicas_busy{labels(model=model)} {stats['busy']}")
+            metric("model_replicas_waiting", "gauge", "Decodes waiting for a free replica")
+            for model, stats in replicas["models"].items():
+                lines.append(f"live_subtitles_model_replicas_waiting{labels(model=model)} {stats['waiting']}")
+            metric("model_replica_utilisation", "gauge", "Busy replica time over replica time in the last minute")
+            for model, stats in replicas["models"].items():
+                lines.append(f"live_subtitles_model_replica_utilisation{labels(model=model)} {stats['utilisation']}")
+
+        metric("inference_seconds", "histogram", "Decode wall time per window")
+        for (model, kind), histogram in self.inference_latency.items():
+            self._histogram_lines(lines, "inference_seconds", histogram, model=model, kind=kind)
+        metric("caption_delay_seconds", "histogram", "Time from speech to committed caption")
+        self._histogram_lines(lines, "caption_delay_seconds", self.caption_delay)
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(lines: List[str], name: str, histogram: Histogram, **label_values):
+        base = ",".join(f'{key}="{value}"' for key, value in label_values.items())
+        for bound, count in histogram.cumulative():
+            bucket_labels = f'{base},le="{bound}"' if base else f'le="{bound}"'
+            lines.append(f"live_subtitles_{name}_bucket{{{bucket_labels}}} {count}")
+        suffix = f"{{{base}}}" if base else ""
+        lines.append(f"live_subtitles_{name}_sum{suffix} {histogram.sum:.4f}")
+        lines.append(f"live_subtitles_{name}_count{suffix} {histogram.count}")
+
+    @staticmethod
+    def _histogram_summary(histogram: Optional[Histogram]) -> dict:
+        if histogram is None or histogram.count == 0:
+            return {"count": 0}
+        return {
+            "count": histogram.count,
+            "avg": round(histogram.sum / histogram.count, 3),
+            "p50": histogram.quantile(0.5),
+            "p90": histogram.quantile(0.9),
+            "p99": histogram.quantile(0.99)
+        }
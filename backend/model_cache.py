@@ -0,0 +1,298 @@
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from metrics import RollingSum
+
+logger = logging.getLogger(__name__)
+
+# Approximate resident size of each model with int8 weights, in MB
+MODEL_MEMORY_MB = {
+    "tiny": 80,
+    "base": 150,
+    "small": 500,
+    "medium": 1500,
+    "large": 3000
+}
+# What a server keeps of a model the worker processes decode: its tokenizer
+TOKENIZER_MEMORY_MB = 10
+
+
+class ModelCache(Mapping):
+    """Loaded Whisper models under a RAM budget, evicted least recently used first.
+
+    Reads like the old models dict: every known size is a key, mapping to
+    the loaded model or None. Looking a model up counts as using it.
+    Sessions acquire() the models they decode with and release() them when
+    they end; a model with references, or one passed in `keep`, is never
+    evicted. When a new model doesn't fit even after evicting everything
+    evictable, reserve() refuses rather than risk running out of memory.
+    A reservation counts against the budget from reserve() until the
+    model is put() or the load is cancel()ed, so concurrent loads can't
+    overcommit it together. A model costs its MODEL_MEMORY_MB unless
+    reserve() is told otherwise, e.g. for copies held by other processes.
+    """
+
+    def __init__(
+        self,
+        sizes: Iterable[str],
+        budget_mb: int,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.budget_mb = budget_mb
+        self.on_evict = on_evict
+        self._models: Dict[str, Any] = {size: None for size in sizes}
+        self._refs: Dict[str, int] = {size: 0 for size in self._models}
+        self._last_used: Dict[str, float] = {size: 0.0 for size in self._models}
+        # Reserved for a load in progress
+        self._pending: set = set()
+        # Models reserved with a memory cost other than MODEL_MEMORY_MB
+        self._memory: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, size: str):
+        with self._lock:
+            model = self._models[size]
+            if model is not None:
+                self._last_used[size] = time.monotonic()
+            return model
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._models)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def loaded(self) -> List[str]:
+        """Sizes currently in memory, without counting as a use"""
+        with self._lock:
+            return [size for size, model in self._models.items() if model is not None]
+
+    def memory_mb(self, size: str) -> int:
+        return self._memory.get(size, MODEL_MEMORY_MB.get(size, 0))
+
+    @property
+    def used_mb(self) -> int:
+        """Loaded models plus reservations of models being loaded"""
+        return sum(
+            self.memory_mb(size) for size, model in self._models.items()
+            if model is not None or size in self._pending
+        )
+
+    def reserve(self, size: str, keep: Iterable[str] = (), memory_mb: Optional[int] = None):
+        """Evict idle models until `size` fits in the budget and hold its place until put() or cancel().
+
+        memory_mb overrides what the model costs. Raises MemoryError if it can't fit.
+        """
+        needed = MODEL_MEMORY_MB.get(size, 0) if memory_mb is None else memory_mb
+        keep = set(keep)
+        evicted = []
+        with self._lock:
+            if size in self._pending:
+                return
+            idle = sorted(
+                (
+                    candidate for candidate, model in self._models.items()
+                    if model is not None and self._refs[candidate] == 0 and candidate not in keep
+                ),
+                key=lambda candidate: self._last_used[candidate]
+            )
+            # Pick the victims first, so a model that can't fit evicts nothing
+            used = self.used_mb
+            while used + needed > self.budget_mb and idle:
+                oldest = idle.pop(0)
+                used -= self.memory_mb(oldest)
+                evicted.append(oldest)
+            if used + needed > self.budget_mb:
+                raise MemoryError(
+                    f"Model {size} ({needed} MB) does not fit in the {self.budget_mb} MB model budget, "
+                    f"{self.used_mb} MB is in use"
+                )
+            for oldest in evicted:
+                self._models[oldest] = None
+                self._memory.pop(oldest, None)
+                self.evictions += 1
+            self._pending.add(size)
+            if memory_mb is not None:
+                self._memory[size] = memory_mb
+
+        for oldest in evicted:
+            logger.info(f"Evicted model {oldest} to make room for {size}")
+            if self.on_evict is not None:
+                self.on_evict(oldest)
+
+    def put(self, size: str, model):
+        with self._lock:
+            self._pending.discard(size)
+            self._models[size] = model
+            self._last_used[size] = time.monotonic()
+
+    def discard(self, size: str):
+        """Forget a loaded model now, whoever uses it; decodes holding it finish with their reference"""
+        with self._lock:
+            self._models[size] = None
+            self._memory.pop(size, None)
+
+    def cancel(self, size: str):
+        """Give back the reservation of a load that failed"""
+        with self._lock:
+            self._pending.discard(size)
+            self._memory.pop(size, None)
+
+    def acquire(self, size: str, count_lookup: bool = False):
+        """Keep a model from being evicted until release().
+
+        count_lookup counts it as a hit if the model is in memory, else a miss.
+        """
+        with self._lock:
+            self._refs[size] += 1
+            self._last_used[size] = time.monotonic()
+            if count_lookup:
+                if self._models[size] is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+    def release(self, size: str):
+        with self._lock:
+            self._refs[size] = max(0, self._refs[size] - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "budget_mb": self.budget_mb,
+                "used_mb": self.used_mb,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loading": sorted(self._pending),
+                "models": {
+                    size: {"references": self._refs[size], "memory_mb": self.memory_mb(size)}
+                    for size, model in self._models.items()
+                    if model is not None
+                }
+            }
+
+
+class ModelHandle:
+    """A session's reference to one model size in a ModelCache.
+
+    Holds a reference from creation until close(), so the model can be
+    loaded after the handle exists and is never evicted while the session
+    decodes with it. Several sessions share the same loaded instance.
+    Creating a handle is what counts as a cache hit or miss.
+    """
+
+    def __init__(self, cache: ModelCache, size: str, count_lookup: bool = True):
+        if size not in cache:
+            raise ValueError(f"Invalid model size: {size}")
+        cache.acquire(size, count_lookup)
+        self.cache = cache
+        self.size = size
+        self._closed = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.size in self.cache.loaded()
+
+    @property
+    def model(self):
+        model = self.cache[self.size]
+        if model is None:
+            raise RuntimeError(f"Model {self.size} not loaded")
+        return model
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.cache.release(self.size)
+
+
+class ReplicaPool:
+    """Decode slots per model size, one per CTranslate2 replica.
+
+    Models are loaded with num_workers=replicas: that many replicas share
+    one copy of the weights and run concurrent calls in parallel, each
+    with cpu_threads threads. replicas and cpu_threads are the defaults,
+    configure() records what a model was actually loaded with. Calls beyond that queue inside CTranslate2,
+    out of sight, so every decode takes a slot here first. That keeps
+    waiting visible and gives per-model utilisation (busy slot time over
+    slot time, last minute).
+    """
+
+    def __init__(self, replicas: int, cpu_threads: int):
+        self.replicas = max(1, replicas)
+        self.cpu_threads = max(1, cpu_threads)
+        self._lock = threading.Lock()
+        self._config: Dict[str, tuple] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._busy: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._decodes: Dict[str, int] = {}
+        self._busy_time: Dict[str, RollingSum] = {}
+
+    def configure(self, size: str, replicas: int, cpu_threads: int):
+        """A model was (re)loaded with this many replicas; decodes already running keep their slots"""
+        with self._lock:
+            self._config[size] = (max(1, replicas), cpu_threads)
+            self._slots[size] = threading.BoundedSemaphore(max(1, replicas))
+            self._busy.setdefault(size, 0)
+            self._waiting.setdefault(size, 0)
+            self._decodes.setdefault(size, 0)
+            self._busy_time.setdefault(size, RollingSum())
+
+    @contextmanager
+    def slot(self, size: str):
+        """Hold one replica of a model for the duration of a decode"""
+        with self._lock:
+            if size not in self._slots:
+                self._config[size] = (self.replicas, self.cpu_threads)
+                self._slots[size] = threading.BoundedSemaphore(self.replicas)
+                self._busy[size] = 0
+                self._waiting[size] = 0
+                self._decodes[size] = 0
+                self._busy_time[size] = RollingSum()
+            self._waiting[size] += 1
+            slots = self._slots[size]
+
+        slots.acquire()
+        start = time.monotonic()
+        with self._lock:
+            self._waiting[size] -= 1
+            self._busy[size] += 1
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                self._busy[size] -= 1
+                self._decodes[size] += 1
+                self._busy_time[size].add(now - start, now)
+            slots.release()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": self.replicas,
+                "cpu_threads": self.cpu_threads,
+                "models": {
+                    size: {
+                        "replicas": self._config[size][0],
+                        "cpu_threads": self._config[size][1],
+                        "busy": self._busy[size],
+                        "waiting": self._waiting[size],
+                        "decodes": self._decodes[size],
+                        "utilisation": round(
+                            self._busy_time[size].total(now) / (self._busy_time[size].seconds * self._config[size][0]), 3
+                        )
+                    }
+                    for size in self._slots
+                }
+            }
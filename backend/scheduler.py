@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WindowDropped(Exception):
+    """Raised on a job's future when it was dropped from a full session queue"""
+
+
+@dataclass
+class InferenceJob:
+    session_id: str
+    kind: str
+    fn: Callable[..., Any]
+    args: tuple
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    enqueued_at: float
+    deadline: float
+    # Jobs sharing a batch key can run together through batch_fn
+    batch_key: Optional[Hashable] = None
+    batch_fn: Optional[Callable[[List[tuple]], List[Any]]] = None
+
+
+@dataclass
+class SessionQueue:
+    max_size: int
+    jobs: Deque[InferenceJob] = field(default_factory=deque)
+    in_flight: int = 0
+    submitted: int = 0
+    completed: int = 0
+    dropped: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    last_wait: float = 0.0
+
+    def record_wait(self, wait: float):
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.last_wait = wait
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.in_flight
+        return {
+            "queue_depth": len(self.jobs),
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(self.total_wait / started * 1000, 1) if started else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "last_wait_ms": round(self.last_wait * 1000, 1)
+        }
+
+
+class InferenceScheduler:
+    """Central scheduler running inference jobs from all sessions on a fixed worker pool.
+
+    Every session gets its own bounded queue. Workers pick the next job either
+    round-robin over sessions with pending work, or by earliest deadline, so a
+    session that sends audio fast can't starve the others.
+
+    With max_batch_size > 1, a worker that picks a batchable job waits up to
+    batch_timeout seconds for jobs with the same batch key from other sessions
+    and runs them all in one batch_fn call.
+    """
+
+    POLICIES = ("round_robin", "deadline")
+
+    def __init__(
+        self,
+        num_workers: int,
+        max_queue_per_session: int = 4,
+        policy: str = "round_robin",
+        name: str = "inference",
+        max_batch_size: int = 1,
+        batch_timeout: float = 0.05
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Invalid scheduler policy: {policy}")
+
+        self.num_workers = max(1, num_workers)
+        self.max_queue_per_session = max(1, max_queue_per_session)
+        self.policy = policy
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_timeout = batch_timeout
+
+        self._sessions: Dict[str, SessionQueue] = {}
+        # Sessions with pending jobs, in round-robin order
+        self._ready: Deque[str] = deque()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running = False
+        self._batches = 0
+        self._batched_jobs = 0
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        for i in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"{self.name}-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        logger.info(f"Scheduler '{self.name}' started with {self.num_workers} workers ({self.policy})")
+
+    def shutdown(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+    def register_session(self, session_id: str):
+        with self._condition:
+            self._sessions.setdefault(session_id, SessionQueue(self.max_queue_per_session))
+
+    def unregister_session(self, session_id: str):
+        """Forget a session and drop whatever it still had queued"""
+        with self._condition:
+            queue = self._sessions.pop(session_id, None)
+            if queue is None:
+                return
+            if session_id in self._ready:
+                self._ready.remove(session_id)
+            pending = list(queue.jobs)
+            queue.jobs.clear()
+
+        # Nobody is waiting for these anymore
+        for job in pending:
+            job.loop.call_soon_threadsafe(job.future.cancel)
+
+    def submit(
+        self,
+        session_id: str,
+        fn: Callable[..., Any],
+        *args,
+        kind: str = "final",
+        latency_budget: float = 2.0,
+        batch_key: Optional[Hashable] = None,
+        batch_fn: Optional[Callable[[List[tuple]], List[Any]]] = None
+    ) -> asyncio.Future:
+        """Queue fn(*args) for a session and return a future for its result.
+
+        Must be called from the event loop. If the session queue is full the
+        oldest queued job is dropped and its future fails with WindowDropped.
+        batch_fn receives the args of every job in a batch and returns one
+        result per job, in order; an Exception in place of a result fails
+        just that job.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        job = InferenceJob(
+            session_id=session_id,
+            kind=kind,
+            fn=fn,
+            args=args,
+            future=loop.create_future(),
+            loop=loop,
+            enqueued_at=now,
+            deadline=now + latency_budget,
+            batch_key=batch_key if batch_fn is not None else None,
+            batch_fn=batch_fn
+        )
+
+        dropped = None
+        with self._condition:
+            queue = self._sessions.get(session_id)
+            if queue is None:
+                raise RuntimeError(f"Session {session_id} is not registered")
+
+            if len(queue.jobs) >= queue.max_size:
+                dropped = queue.jobs.popleft()
+                queue.dropped += 1
+
+            queue.jobs.append(job)
+            queue.submitted += 1
+            if session_id not in self._ready:
+                self._ready.append(session_id)
+            # Wake everyone, a worker gathering a batch may want this job
+            self._condition.notify_all()
+
+        if dropped is not None:
+            logger.warning(f"Session {session_id} queue full, dropping oldest {dropped.kind} window")
+            self._resolve(dropped, exception=WindowDropped("Session queue full"))
+
+        return job.future
+
+    def queue_depth(self, session_id: str) -> int:
+        with self._condition:
+            queue = self._sessions.get(session_id)
+            return len(queue.jobs) if queue else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            sessions = {
+                session_id: queue.stats()
+                for session_id, queue in self._sessions.items()
+            }
+        return {
+            "policy": self.policy,
+            "workers": self.num_workers,
+            "queued": sum(s["queue_depth"] for s in sessions.values()),
+            "in_flight": sum(s["in_flight"] for s in sessions.values()),
+            "batches": self._batches,
+            "avg_batch_size": round(self._batched_jobs / self._batches, 2) if self._batches else 0.0,
+            "sessions": sessions
+        }
+
+    def _next_job(self) -> Optional[InferenceJob]:
+        """Pick the next job according to the policy. Caller holds the lock."""
+        if not self._ready:
+            return None
+
+        if self.policy == "deadline":
+            session_id = min(
+                self._ready,
+                key=lambda sid: self._sessions[sid].jobs[0].deadline
+            )
+        else:
+            session_id = self._ready[0]
+
+        return self._pop_job(session_id)
+
+    def _pop_job(self, session_id: str) -> InferenceJob:
+        """Take the oldest job of a ready session. Caller holds the lock."""
+        self._ready.remove(session_id)
+        queue = self._sessions[session_id]
+        job = queue.jobs.popleft()
+        if queue.jobs:
+            # Back of the line, other sessions go first
+            self._ready.append(session_id)
+
+        queue.in_flight += 1
+        queue.record_wait(time.monotonic() - job.enqueued_at)
+        return job
+
+    def _gather_batch(self, first: InferenceJob) -> List[InferenceJob]:
+        """Collect jobs sharing first's batch key, one per session. Caller holds the lock."""
+        batch = [first]
+        sessions = {first.session_id}
+        deadline = time.monotonic() + self.batch_timeout
+
+        while len(batch) < self.max_batch_size:
+            for session_id in list(self._ready):
+                if len(batch) >= self.max_batch_size:
+                    break
+                head = self._sessions[session_id].jobs[0]
+                if session_id not in sessions and head.batch_key == first.batch_key:
+                    batch.append(self._pop_job(session_id))
+                    sessions.add(session_id)
+
+            remaining = deadline - time.monotonic()
+            # Stop once the budget is spent or no other session could contribute
+            if (len(batch) >= self.max_batch_size or remaining <= 0
+                    or len(self._sessions) <= len(sessions) or not self._running):
+                break
+            self._condition.wait(remaining)
+
+        return batch
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if not self._running:
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+
+                if job.batch_fn is not None and self.max_batch_size > 1:
+                    batch = self._gather_batch(job)
+                else:
+                    batch = [job]
+
+            if len(batch) == 1:
+                self._run_single(job)
+            else:
+                self._run_batch(batch)
+
+    def _run_single(self, job: InferenceJob):
+        try:
+            result = job.fn(*job.args)
+        except Exception as e:
+            self._finish(job)
+            self._resolve(job, exception=e)
+        else:
+            self._finish(job)
+            self._resolve(job, result=result)
+
+    def _run_batch(self, batch: List[InferenceJob]):
+        with self._condition:
+            self._batches += 1
+            self._batched_jobs += len(batch)
+
+        try:
+            results = batch[0].batch_fn([job.args for job in batch])
+        except Exception as e:
+            for job in batch:
+                self._finish(job)
+                self._resolve(job, exception=e)
+        else:
+            for job, result in zip(batch, results):
+                self._finish(job)
+                if isinstance(result, Exception):
+                    self._resolve(job, exception=result)
+                else:
+                    self._resolve(job, result=result)
+
+    def _finish(self, job: InferenceJob):
+        with self._condition:
+            queue = self._sessions.get(job.session_id)
+            if queue is not None:
+                queue.in_flight -= 1
+                queue.completed += 1
+
+    @staticmethod
+    def _resolve(job: InferenceJob, result: Any = None, exception: Optional[BaseException] = None):
+        """Complete a job's future from any thread"""
+        def set_outcome():
+            if job.future.done():
+                return
+            if exception is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(result)
+
+        try:
+            job.loop.call_soon_threadsafe(set_outcome)
+        except RuntimeError:
+            # Event loop already closed, nobody is waiting for this result
+            pass
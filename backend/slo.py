@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Model sizes from largest to smallest
+MODEL_LADDER = ("large", "medium", "small", "base", "tiny")
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    beam_size: int
+    model_size: Optional[str] = None  # None keeps the session's selected model
+    step_scale: float = 1.0  # Multiplier on the final window step, > 1 decodes less often
+
+    def as_dict(self) -> dict:
+        return {
+            "beam_size": self.beam_size,
+            "model": self.model_size,
+            "step_scale": self.step_scale
+        }
+
+
+def quality_ladder(beam_size: int, fallback_model: Optional[str], max_step_scale: float = 2.0) -> List[QualityLevel]:
+    """Levels from best to cheapest: lower beam sizes, then a smaller model, then wider windows"""
+    levels = [QualityLevel(beam) for beam in range(max(1, beam_size), 0, -1)]
+    if fallback_model is not None:
+        levels.append(QualityLevel(1, fallback_model))
+
+    scale = 1.5
+    while scale <= max_step_scale:
+        levels.append(QualityLevel(1, fallback_model, scale))
+        scale += 0.5
+    return levels
+
+
+def smaller_model(model_size: str, loaded: List[str]) -> Optional[str]:
+    """Largest loaded model smaller than model_size, if any"""
+    if model_size not in MODEL_LADDER:
+        return None
+    for candidate in MODEL_LADDER[MODEL_LADDER.index(model_size) + 1:]:
+        if candidate in loaded:
+            return candidate
+    return None
+
+
+class LatencyController:
+    """Keeps a session's caption latency under a target by trading quality for speed.
+
+    Fed the latency (enqueue to result, so queue delay included) and the
+    real-time factor (decode time over audio duration) of every final
+    window. Both are smoothed; when latency exceeds the target or decoding
+    can't keep up with real time, the session steps down one level. It
+    steps back up only after `recover_after` windows in a row with clear
+    headroom, so it does not flap around the limit.
+    """
+
+    def __init__(
+        self,
+        levels: List[QualityLevel],
+        target_latency: float,
+        smoothing: float = 0.3,
+        cooldown: int = 2,
+        recover_after: int = 5,
+        headroom: float = 0.5
+    ):
+        if not levels:
+            raise ValueError("LatencyController needs at least one level")
+
+        self.levels = levels
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.recover_after = recover_after
+        self.headroom = headroom
+
+        self.index = 0
+        self.latency = 0.0
+        self.rtf = 0.0
+        self._observations = 0
+        self._since_change = 0
+        self._good_streak = 0
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.index]
+
+    def observe(self, latency: float, rtf: float) -> Optional[str]:
+        """Record a finished window; returns the reason if the level changed"""
+        if self._observations == 0:
+            self.latency, self.rtf = latency, rtf
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+            self.rtf += self.smoothing * (rtf - self.rtf)
+        self._observations += 1
+        self._since_change += 1
+
+        too_slow = self.latency > self.target_latency or self.rtf > 0.9
+        if too_slow:
+            self._good_streak = 0
+            if self._since_change >= self.cooldown and self.index < len(self.levels) - 1:
+                return self._move(1, f"latency {self.latency:.2f} s, rtf {self.rtf:.2f}")
+            return None
+
+        if self.latency < self.headroom * self.target_latency and self.rtf < self.headroom * 0.9:
+            self._good_streak += 1
+        else:
+            self._good_streak = 0
+
+        if self._good_streak >= self.recover_after and self.index > 0:
+            return self._move(-1, f"headroom: latency {self.latency:.2f} s, rtf {self.rtf:.2f}")
+        return None
+
+    def _move(self, direction: int, reason: str) -> str:
+        self.index += direction
+        self._since_change = 0
+        self._good_streak = 0
+        return reason
@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List
+
+import numpy as np
+
+# Imported on first decode, so importing this module stays cheap at startup
+if TYPE_CHECKING:
+    import ctranslate2
+    from faster_whisper import WhisperModel
+    from faster_whisper.tokenizer import Tokenizer
+
+
+@dataclass
+class SpeculativeResult:
+    tokens: List[int]  # Target vocabulary, text tokens only, without eot
+    no_speech_prob: float
+    drafted: int = 0  # Draft tokens proposed
+    accepted: int = 0  # Draft tokens the target agreed with
+    target_calls: int = 0  # Batched target verification calls
+
+
+@dataclass
+class SpeculativeStats:
+    """Running totals over all speculative decodes"""
+    windows: int = 0
+    tokens: int = 0
+    drafted: int = 0
+    accepted: int = 0
+    target_calls: int = 0
+
+    def add(self, result: SpeculativeResult):
+        self.windows += 1
+        self.tokens += len(result.tokens)
+        self.drafted += result.drafted
+        self.accepted += result.accepted
+        self.target_calls += result.target_calls
+
+    def as_dict(self) -> dict:
+        stats = {
+            "windows": self.windows,
+            "tokens": self.tokens,
+            "drafted": self.drafted,
+            "accepted": self.accepted,
+            "target_calls": self.target_calls
+        }
+        stats["acceptance_rate"] = round(self.accepted / self.drafted, 3) if self.drafted else 0.0
+        stats["tokens_per_target_call"] = round(self.tokens / self.target_calls, 2) if self.target_calls else 0.0
+        return stats
+
+
+class SpeculativeDecoder:
+    """Greedy Whisper decoding with a small draft model proposing token runs.
+
+    Each round the draft model greedily proposes up to k tokens after the
+    current prefix. The target model then checks every proposal in one
+    batched CTranslate2 call: the k + 1 prompts prefix + draft[:i] each get
+    one greedy step, which gives the target's own next token after every
+    draft position. The longest agreeing run is kept, plus the target's
+    token where they first differ, so the output is exactly the target's
+    greedy decode (up to floating-point ties), whatever the draft proposes.
+
+    CTranslate2 keeps no decoder state between calls, so every call runs
+    the prefix again; the gain comes from the target doing up to k + 1
+    tokens per call instead of one. CTranslate2 counts the prompt towards
+    max_length, so every call allows the prompt's length plus the tokens
+    it should add. Decoding is text-only (no timestamp
+    tokens), since timestamp rules depend on tokens generated in the same
+    call. Draft and target must share text tokens, which all KB-Whisper
+    sizes do; their special tokens may differ (large-v3 has one more
+    language), so only text tokens are exchanged.
+
+    There is no log probability of the result: CTranslate2 scores a
+    sequence by its average log probability, and the shorter candidates
+    run on past the token that is kept, so their scores don't add up to
+    the log probability of the decoded tokens.
+    """
+
+    def __init__(
+        self,
+        target: "WhisperModel",
+        draft: "WhisperModel",
+        target_tokenizer: "Tokenizer",
+        draft_tokenizer: "Tokenizer",
+        k: int = 4
+    ):
+        self.target = target
+        self.draft = draft
+        self.target_tokenizer = target_tokenizer
+        self.draft_tokenizer = draft_tokenizer
+        self.k = max(1, k)
+
+    def decode(
+        self,
+        target_encoded: "ctranslate2.StorageView",
+        draft_encoded: "ctranslate2.StorageView",
+        previous_tokens: List[int],
+        max_length: int = 224
+    ) -> SpeculativeResult:
+        """Decode one window from each model's encoder output (batch of 1).
+
+        previous_tokens are text tokens of earlier text, used as the
+        decoder prompt like initial_prompt.
+        """
+        import ctranslate2
+
+        target_prompt = self._prompt(self.target_tokenizer, previous_tokens)
+        draft_prompt = self._prompt(self.draft_tokenizer, previous_tokens)
+        eot = self.target_tokenizer.eot
+
+        # The first token comes from a plain call: blank suppression only
+        # applies at the start of a decode, and this also gives no_speech_prob
+        first = self.target.model.generate(
+            target_encoded,
+            [target_prompt],
+            beam_size=1,
+            max_length=len(target_prompt) + 1,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            return_no_speech_prob=True
+        )[0]
+        result = SpeculativeResult(
+            tokens=[],
+            no_speech_prob=first.no_speech_prob,
+            target_calls=1
+        )
+        token = first.sequences_ids[0][0] if first.sequences_ids[0] else eot
+        if token >= eot:
+            return result
+        result.tokens.append(token)
+
+        # Each candidate prompt needs the encoder output once
+        encoded = np.array(target_encoded)
+        batched_encoded = {}
+
+        while len(result.tokens) < max_length:
+            proposal = self._draft(draft_encoded, draft_prompt + result.tokens)
+            candidates = [target_prompt + result.tokens + proposal[:i] for i in range(len(proposal) + 1)]
+            size = len(candidates)
+            if size not in batched_encoded:
+                batched_encoded[size] = ctranslate2.StorageView.from_array(
+                    np.ascontiguousarray(np.repeat(encoded, size, axis=0))
+                )
+
+            # One step for the longest candidate; shorter ones may run on,
+            # only their first token is used
+            steps = self.target.model.generate(
+                batched_encoded[size],
+                candidates,
+                beam_size=1,
+                max_length=len(candidates[-1]) + 1,
+                suppress_blank=False,
+                suppress_tokens=[-1]
+            )
+            result.target_calls += 1
+            result.drafted += len(proposal)
+
+            # Target's greedy token after prefix + proposal[:i], for every i
+            targets = [step.sequences_ids[0][0] if step.sequences_ids[0] else eot for step in steps]
+            accepted = 0
+            while accepted < len(proposal) and targets[accepted] == proposal[accepted]:
+                accepted += 1
+            result.accepted += accepted
+
+            new_tokens = proposal[:accepted] + [targets[accepted]]
+            for token in new_tokens:
+                if token >= eot or len(result.tokens) >= max_length:
+                    return result
+                result.tokens.append(token)
+
+        return result
+
+    def _draft(self, draft_encoded, prompt: List[int]) -> List[int]:
+        """Up to k greedy draft tokens after prompt, stopping before any non-text token"""
+        draft = self.draft.model.generate(
+            draft_encoded,
+            [prompt],
+            beam_size=1,
+            max_length=len(prompt) + self.k,
+            suppress_blank=False,
+            suppress_tokens=[-1]
+        )[0].sequences_ids[0]
+        proposal = []
+        for token in draft:
+            if token >= self.draft_tokenizer.eot:
+                break
+            proposal.append(token)
+        return proposal
+
+    @staticmethod
+    def _prompt(tokenizer: "Tokenizer", previous_tokens: List[int]) -> List[int]:
+        prefix = [tokenizer.sot_prev] + previous_tokens if previous_tokens else []
+        return prefix + list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
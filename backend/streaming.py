@@ -0,0 +1,248 @@
+import string
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+# Characters ignored when comparing words between hypotheses
+_STRIP_CHARS = string.punctuation + "«»–—…"
+
+
+@dataclass
+class Word:
+    start: float  # Absolute session time in seconds
+    end: float
+    text: str
+
+    @property
+    def key(self) -> str:
+        """Normalized form used to decide whether two hypotheses agree"""
+        return self.text.strip().strip(_STRIP_CHARS).lower()
+
+
+def segments_to_words(segments: List[dict], offset: float) -> List[Word]:
+    """Split transcribe_audio segments into words with absolute times.
+
+    Uses the word timestamps when the segment has them. Otherwise each word
+    gets a share of its segment's duration proportional to its length.
+    """
+    words = []
+    for segment in segments:
+        if "words" in segment:
+            words.extend(
+                Word(offset + word["start"], offset + word["end"], word["word"].strip())
+                for word in segment["words"]
+                if word["word"].strip()
+            )
+            continue
+
+        parts = segment["text"].split()
+        if not parts:
+            continue
+
+        start = offset + segment["start"]
+        duration = max(0.0, segment["end"] - segment["start"])
+        total_chars = sum(len(part) for part in parts)
+        for part in parts:
+            end = start + duration * len(part) / total_chars
+            words.append(Word(start, end, part))
+            start = end
+
+    return words
+
+
+def join_words(words: List[Word]) -> str:
+    return " ".join(word.text.strip() for word in words)
+
+
+class LocalAgreement:
+    """LocalAgreement-n commit policy, as in whisper_streaming.
+
+    The same growing audio buffer is decoded repeatedly. A word is committed
+    once the last n hypotheses agree on it (their longest common prefix), so
+    text is emitted once, and the audio it covers can be trimmed from the
+    buffer and is not decoded again.
+    """
+
+    def __init__(self, n: int = 2):
+        if n < 2:
+            raise ValueError("LocalAgreement needs at least 2 hypotheses")
+
+        self.n = n
+        self.committed_until = 0.0  # End time of the last committed word
+        # Uncommitted tails of the previous n - 1 hypotheses
+        self._hypotheses: Deque[List[Word]] = deque(maxlen=n - 1)
+        # Last committed words, to spot words decoded again at the start of a new buffer
+        self._committed_tail: Deque[Word] = deque(maxlen=5)
+
+    def insert(self, words: List[Word]) -> List[Word]:
+        """Add a new hypothesis and return the words that became committed"""
+        words = self._drop_committed(words)
+
+        if len(self._hypotheses) < self.n - 1:
+            self._hypotheses.append(words)
+            return []
+
+        agreed = len(words)
+        for previous in self._hypotheses:
+            common = 0
+            for new_word, old_word in zip(words, previous):
+                if new_word.key != old_word.key:
+                    break
+                common += 1
+            agreed = min(agreed, common)
+
+        committed = words[:agreed]
+        # Everyone agreed on the committed prefix, so it can go from all of them
+        for i in range(len(self._hypotheses)):
+            self._hypotheses[i] = self._hypotheses[i][agreed:]
+        self._hypotheses.append(words[agreed:])
+
+        self._commit(committed)
+        return committed
+
+    def flush(self, words: Optional[List[Word]] = None) -> List[Word]:
+        """Commit the given hypothesis (or the latest one) without waiting for agreement"""
+        if words is None:
+            words = self._hypotheses[-1] if self._hypotheses else []
+        else:
+            words = self._drop_committed(words)
+
+        self._hypotheses.clear()
+        self._commit(words)
+        return words
+
+    def unconfirmed(self) -> List[Word]:
+        """Words of the latest hypothesis that are not committed yet"""
+        return list(self._hypotheses[-1]) if self._hypotheses else []
+
+    def reset(self):
+        """Forget pending hypotheses, e.g. after the buffer was cut without committing"""
+        self._hypotheses.clear()
+
+    def _commit(self, words: List[Word]):
+        if words:
+            self.committed_until = max(self.committed_until, words[-1].end)
+            self._committed_tail.extend(words)
+
+    def _drop_committed(self, words: List[Word]) -> List[Word]:
+        """Remove words covering audio that was already committed"""
+        # Small tolerance, timestamps of the same word jitter between decodes
+        words = [word for word in words if word.start > self.committed_until - 0.1]
+
+        # The first words of a trimmed buffer are often the last committed ones again
+        if words and abs(words[0].start - self.committed_until) < 1.0:
+            tail = list(self._committed_tail)
+            for size in range(min(len(tail), len(words), 5), 0, -1):
+                if [w.key for w in tail[-size:]] == [w.key for w in words[:size]]:
+                    return words[size:]
+
+        return words
+
+
+class PromptContext:
+    """Rolling tail of committed words, used as the decoder prompt for the next window.
+
+    Whisper relearns names and terms in every window otherwise. After a long
+    stretch without committed speech the context is dropped, since the topic
+    has likely changed. Token budgeting is left to the caller, who has the
+    tokenizer; max_words only bounds memory.
+    """
+
+    def __init__(self, reset_after: float = 10.0, max_words: int = 200):
+        self.reset_after = reset_after
+        self._words: Deque[Word] = deque(maxlen=max_words)
+
+    def add(self, words: List[Word]):
+        if words and self._words and words[0].start - self._words[-1].end > self.reset_after:
+            self._words.clear()
+        self._words.extend(words)
+
+    def text(self, now: float) -> Optional[str]:
+        """Prompt for a window ending at session time now, or None"""
+        if self._words and now - self._words[-1].end > self.reset_after:
+            self._words.clear()
+        return join_words(list(self._words)) if self._words else None
+
+
+def segment_trim_point(segments: List[dict], offset: float, committed_until: float) -> Optional[float]:
+    """End time of the last segment whose words are all committed, if any.
+
+    Trimming on a segment boundary keeps the next window starting at a
+    natural pause rather than mid-word.
+    """
+    trim_point = None
+    for segment in segments:
+        end = offset + segment["end"]
+        if end <= committed_until + 0.05:
+            trim_point = end
+    return trim_point
+
+
+class CaptionTrack:
+    """Turns committed and tentative words into caption revision messages.
+
+    Captions are segments with a stable id. One segment is open at a time:
+    "partial" opens it with tentative text, "replace" revises that text
+    (empty text withdraws the segment), and "commit" fixes its final text,
+    after which the id never changes again. Times are session seconds.
+    """
+
+    def __init__(self):
+        self._next_id = 0
+        self._open: Optional[str] = None
+        self._revision = 0
+        self._text = ""
+        self.words: List[Word] = []  # Tentative words of the open segment
+
+    def tentative(self, words: List[Word]) -> Optional[dict]:
+        """New tentative words for the open segment; a message if its text changed"""
+        text = join_words(words)
+        if self._open is None:
+            if not text:
+                return None
+            self._open_segment()
+            op = "partial"
+        elif text == self._text:
+            return None
+        else:
+            op = "replace"
+
+        message = self._message(op, words, text)
+        self.words = list(words)
+        if not text:
+            self._open = None
+        return message
+
+    def commit(self, words: List[Word], tentative: List[Word]) -> List[dict]:
+        """Commit words as the open segment, then open the next one with the tentative rest"""
+        messages = []
+        if words:
+            if self._open is None:
+                self._open_segment()
+            messages.append(self._message("commit", words, join_words(words)))
+            self._open = None
+            self.words = []
+
+        message = self.tentative(tentative)
+        if message is not None:
+            messages.append(message)
+        return messages
+
+    def _open_segment(self):
+        self._open = f"seg-{self._next_id}"
+        self._next_id += 1
+        self._revision = 0
+        self._text = ""
+
+    def _message(self, op: str, words: List[Word], text: str) -> dict:
+        self._revision += 1
+        self._text = text
+        return {
+            "type": "caption",
+            "op": op,
+            "id": self._open,
+            "revision": self._revision,
+            "text": text,
+            "start": words[0].start if words else None,
+            "end": words[-1].end if words else None
+        }
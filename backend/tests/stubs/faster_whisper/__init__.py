@@ -0,0 +1,32 @@
+"""Stand-in for faster_whisper, put on PYTHONPATH of the worker processes the tests start.
+
+A decode reports the snapshot it was loaded from, the process that ran it
+and the samples it saw, so tests can tell where and what a window was
+decoded. STUB_LOAD_SECONDS and STUB_DECODE_SECONDS slow it down.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class Segment:
+    text: str
+    start: float
+    end: float
+    words: List = field(default_factory=list)
+
+
+class WhisperModel:
+    def __init__(self, model_size_or_path: str, **kwargs):
+        if not os.path.isdir(model_size_or_path):
+            raise FileNotFoundError(f"No snapshot at {model_size_or_path}")
+        time.sleep(float(os.environ.get("STUB_LOAD_SECONDS", "0")))
+        self.path = model_size_or_path
+        self.options = kwargs
+
+    def transcribe(self, audio, **kwargs):
+        time.sleep(float(os.environ.get("STUB_DECODE_SECONDS", "0")))
+        text = f"{os.path.basename(self.path)} pid={os.getpid()} samples={len(audio)} sum={float(audio.sum()):.0f}"
+        return iter([Segment(text, 0.0, len(audio) / 16000)]), None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from audio_buffer import AudioRingBuffer
+
+
+def ramp(start, end):
+    return np.arange(start, end, dtype=np.float32)
+
+
+def test_views_stay_contiguous_across_the_wrap():
+    buffer = AudioRingBuffer(8)
+    buffer.append(ramp(0, 6))
+    buffer.consume(4)
+    buffer.append(ramp(6, 12))
+
+    # Samples 8..11 wrapped to the start of the storage
+    view = buffer.view()
+    assert view.tolist() == ramp(4, 12).tolist()
+    assert np.shares_memory(view, buffer._data)
+    assert buffer.latest(3).tolist() == [9, 10, 11]
+
+
+def test_overwriting_unread_samples_advances_the_read_pointer():
+    buffer = AudioRingBuffer(8)
+    buffer.append(ramp(0, 6))
+    buffer.append(ramp(6, 11))
+
+    assert (buffer.read_position, len(buffer), buffer.dropped_samples) == (3, 8, 3)
+    assert not buffer.contains(2) and buffer.contains(3)
+    with pytest.raises(IndexError):
+        buffer.span(2, 5)
+
+
+def test_append_longer_than_capacity_keeps_the_newest_samples():
+    buffer = AudioRingBuffer(4)
+    buffer.append(ramp(0, 10))
+
+    assert buffer.write_position == 10
+    assert buffer.view().tolist() == [6, 7, 8, 9]
+
+
+def test_consume_keeps_an_overlap_readable():
+    buffer = AudioRingBuffer(8)
+    buffer.append(ramp(0, 6))
+    buffer.consume(4)
+
+    assert buffer.view().tolist() == [4, 5]
+    assert buffer.span(2, 6).tolist() == [2, 3, 4, 5]
+    buffer.consume(100)
+    assert len(buffer) == 0
+
+
+def test_shared_buffer_backs_the_samples():
+    storage = bytearray(2 * 4 * 4)
+    buffer = AudioRingBuffer(4, buffer=storage)
+    buffer.append(ramp(1, 3))
+
+    assert np.frombuffer(storage, dtype=np.float32)[:2].tolist() == [1, 2]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from features import StreamingLogMel, normalize_log_mel
+
+N_FFT = 400
+HOP = 160
+
+
+def filterbank(n_mels, seed=0):
+    return np.random.default_rng(seed).uniform(0.0, 1.0, (n_mels, N_FFT // 2 + 1)).astype(np.float32)
+
+
+def reference_log_mel(audio, filters):
+    """One STFT over the whole stream, frames centered on k * hop with zeros before sample 0"""
+    padded = np.concatenate([np.zeros(N_FFT // 2, dtype=np.float32), audio])
+    n = (len(padded) - N_FFT) // HOP + 1
+    window = np.hanning(N_FFT + 1)[:-1]
+    frames = np.stack([padded[k * HOP:k * HOP + N_FFT] for k in range(n)]) * window
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    return np.log10(np.maximum(power @ filters.T, 1e-10)).T
+
+
+def stream(audio, mel, chunks=(1000, 37, 4000, 1)):
+    """Feed audio in uneven chunks"""
+    position = 0
+    sizes = iter(chunks * (len(audio) // sum(chunks) + 1))
+    while position < len(audio):
+        size = next(sizes)
+        mel.append(audio[position:position + size])
+        position += size
+
+
+@pytest.fixture
+def audio():
+    return np.random.default_rng(1).standard_normal(16000).astype(np.float32) * 0.1
+
+
+def test_streamed_frames_match_one_stft(audio):
+    filters = filterbank(80)
+    mel = StreamingLogMel(capacity_frames=200)
+    mel.add_filterbank(filters)
+    stream(audio, mel)
+
+    expected = reference_log_mel(audio, filters)
+    assert mel.frames_written == expected.shape[1]
+    first, frames = mel.span(80, 0, len(audio))
+    assert first == 0
+    np.testing.assert_allclose(frames, expected[:, :frames.shape[1]], atol=1e-4)
+
+
+def test_window_reuses_frames_on_the_stream_grid(audio):
+    filters = filterbank(80)
+    mel = StreamingLogMel(capacity_frames=200)
+    mel.add_filterbank(filters)
+    mel.append(audio)
+
+    first, frames = mel.span(80, 3250, 3250 + 1600)
+    expected = reference_log_mel(audio, filters)
+    # The first frame centered inside the window, 1600 // hop + 1 frames
+    assert first == 21
+    np.testing.assert_allclose(frames, expected[:, 21:32], atol=1e-4)
+
+
+def test_filterbank_added_later_backfills_cached_frames(audio):
+    mel = StreamingLogMel(capacity_frames=200)
+    mel.add_filterbank(filterbank(80))
+    mel.append(audio[:8000])
+    large = filterbank(128, seed=2)
+    mel.add_filterbank(large)
+    mel.append(audio[8000:])
+
+    _, frames = mel.span(128, 0, len(audio))
+    expected = reference_log_mel(audio, large)
+    np.testing.assert_allclose(frames, expected[:, :frames.shape[1]], atol=1e-4)
+
+
+def test_overwritten_frames_are_refused(audio):
+    mel = StreamingLogMel(capacity_frames=20)
+    mel.add_filterbank(filterbank(80))
+    stream(audio, mel)
+
+    oldest = mel.frames_written - 20
+    assert mel.contains(oldest) and not mel.contains(oldest - 1)
+    with pytest.raises(IndexError):
+        mel.span(80, 0, 1600)
+    first, frames = mel.span(80, oldest * HOP, mel.frames_written * HOP)
+    expected = reference_log_mel(audio, filterbank(80))
+    np.testing.assert_allclose(frames, expected[:, first:first + frames.shape[1]], atol=1e-4)
+
+
+def test_normalize_clamps_to_eight_below_the_max():
+    log_mel = np.array([[-12.0, -2.0, 1.0]])
+
+    assert normalize_log_mel(log_mel).tolist() == [[(-7.0 + 4) / 4, (-2.0 + 4) / 4, (1.0 + 4) / 4]]
@@ -0,0 +1,78 @@
+from metrics import Histogram, Metrics, RollingSum
+
+
+def test_histogram_buckets_are_cumulative_on_export():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [("0.1", 2), ("1", 3), ("+Inf", 4)]
+    assert histogram.sum == 3.65
+
+
+def test_histogram_quantile_is_a_bucket_bound():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.25) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) is None
+    assert Histogram((1.0,)).quantile(0.5) == 0.0
+
+
+def test_rolling_sum_forgets_old_buckets():
+    rolling = RollingSum(buckets=3, bucket_seconds=1.0)
+    rolling.add(1.0, now=10.2)
+    rolling.add(2.0, now=11.5)
+    rolling.add(4.0, now=12.9)
+
+    assert rolling.total(now=12.9) == 7.0
+    assert rolling.total(now=13.0) == 6.0
+    # Reusing a slot resets it
+    rolling.add(8.0, now=13.1)
+    assert rolling.total(now=13.1) == 14.0
+
+
+def test_batched_windows_count_their_share_of_the_decode():
+    metrics = Metrics()
+    metrics.record_window("s1", "small", "final", audio_seconds=2.0, decode_seconds=1.0, queue_wait=0.1, batch_size=2, now=100.0)
+    metrics.record_window("s2", "small", "final", audio_seconds=2.0, decode_seconds=1.0, queue_wait=0.3, batch_size=2, now=100.0)
+
+    stats = metrics.models[("small", "final")].as_dict(now=100.0)
+    assert (stats["windows"], stats["decode_seconds"], stats["rtf"], stats["avg_queue_wait_ms"]) == (2, 1.0, 0.25, 200.0)
+    # Latency is the wall time of the batch, not the share
+    assert metrics.inference_latency[("small", "final")].sum == 2.0
+
+
+def test_prometheus_output():
+    metrics = Metrics()
+    metrics.record_window("s1", "small", "final", audio_seconds=2.0, decode_seconds=0.4, queue_wait=0.0)
+    metrics.record_caption_delay("s1", 1.5)
+    metrics.record_dropped()
+    cache = {"hits": 3, "misses": 1, "evictions": 0, "used_mb": 500, "budget_mb": 4096}
+
+    lines = metrics.prometheus(workers=2, model_cache=cache).splitlines()
+
+    assert 'live_subtitles_audio_seconds_total{model="small",kind="final"} 2.000' in lines
+    assert "live_subtitles_dropped_windows_total 1" in lines
+    assert "live_subtitles_model_cache_hits_total 3" in lines
+    assert 'live_subtitles_inference_seconds_bucket{model="small",kind="final",le="0.25"} 0' in lines
+    assert 'live_subtitles_inference_seconds_bucket{model="small",kind="final",le="0.5"} 1' in lines
+    assert 'live_subtitles_inference_seconds_count{model="small",kind="final"} 1' in lines
+    assert 'live_subtitles_caption_delay_seconds_bucket{le="+Inf"} 1' in lines
+    assert "# TYPE live_subtitles_rtf gauge" in lines
+    # Every sample follows a HELP and TYPE line for its metric
+    names = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    samples = {line.split("{")[0].split()[0] for line in lines if not line.startswith("#")}
+    assert all(any(sample.startswith(name) for name in names) for sample in samples)
+
+
+def test_end_session_drops_its_stats():
+    metrics = Metrics()
+    metrics.record_window("s1", "small", "final", 2.0, 0.4, 0.0)
+    metrics.record_caption_delay("s1", 1.0)
+    metrics.end_session("s1")
+
+    assert metrics.stats(workers=1)["sessions"] == {}
+    assert metrics.stats(workers=1)["caption_delay"]["count"] == 1
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from model_cache import ModelCache, ModelHandle, ReplicaPool
+
+SIZES = ("tiny", "base", "small", "medium", "large")
+
+
+def cache(budget_mb=4096, **kwargs):
+    return ModelCache(SIZES, budget_mb, **kwargs)
+
+
+def test_reservations_count_against_the_budget():
+    models = cache()
+    models.reserve("medium")
+
+    # medium is still loading, so large can't fit next to it
+    with pytest.raises(MemoryError):
+        models.reserve("large")
+
+    models.put("medium", object())
+    assert models.used_mb == 1500
+    assert models.stats()["loading"] == []
+
+
+def test_cancel_gives_back_the_reservation():
+    models = cache()
+    models.reserve("large")
+    assert models.used_mb == 3000
+
+    models.cancel("large")
+    assert models.used_mb == 0
+    models.reserve("medium")
+    models.reserve("small")
+    assert models.stats()["loading"] == ["medium", "small"]
+
+
+def test_evicts_least_recently_used_idle_model():
+    evicted = []
+    models = cache(2000, on_evict=evicted.append)
+    for size in ("tiny", "base", "small"):
+        models.reserve(size)
+        models.put(size, object())
+    models["tiny"]
+
+    models.reserve("medium")
+
+    assert evicted == ["base", "small"]
+    assert models.loaded() == ["tiny"]
+
+
+def test_referenced_and_kept_models_are_not_evicted():
+    models = cache(2000)
+    models.reserve("small")
+    models.put("small", object())
+    models.reserve("base")
+    models.put("base", object())
+    handle = ModelHandle(models, "small")
+
+    with pytest.raises(MemoryError):
+        models.reserve("medium", keep=["base"])
+
+    handle.close()
+    models.reserve("medium", keep=["base"])
+    assert models.loaded() == ["base"]
+
+
+def test_reserve_that_cannot_fit_evicts_nothing():
+    evicted = []
+    models = cache(2000, on_evict=evicted.append)
+    for size in ("small", "medium"):
+        models.reserve(size)
+        models.put(size, object())
+    handle = ModelHandle(models, "medium")
+
+    # Evicting small alone would not make room for large
+    with pytest.raises(MemoryError):
+        models.reserve("large")
+
+    assert evicted == [] and models.evictions == 0
+    assert models.loaded() == ["small", "medium"]
+    handle.close()
+
+
+def test_handles_count_hits_and_misses():
+    models = cache()
+    cold = ModelHandle(models, "small")
+    models.reserve("small")
+    models.put("small", object())
+    warm = ModelHandle(models, "small")
+    ModelHandle(models, "small", count_lookup=False)
+
+    assert (models.hits, models.misses) == (1, 1)
+    assert warm.loaded and cold.loaded
+
+
+def test_replica_pool_queues_decodes_beyond_its_replicas():
+    pool = ReplicaPool(replicas=1, cpu_threads=2)
+    pool.configure("small", replicas=2, cpu_threads=4)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def decode():
+        with pool.slot("small"):
+            entered.set()
+            release.wait()
+
+    threads = [threading.Thread(target=decode) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    entered.wait()
+    while pool.stats()["models"]["small"]["busy"] + pool.stats()["models"]["small"]["waiting"] < 3:
+        time.sleep(0.01)
+
+    stats = pool.stats()["models"]["small"]
+    assert (stats["replicas"], stats["cpu_threads"], stats["busy"], stats["waiting"]) == (2, 4, 2, 1)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()["models"]["small"]["decodes"] == 3
+
+
+
+def test_reserve_with_a_memory_cost_of_its_own():
+    evicted = []
+    models = cache(4096, on_evict=evicted.append)
+    # Decoded by two worker processes: a copy in each and the tokenizer here
+    models.reserve("medium", memory_mb=3010)
+    models.put("medium", object())
+    assert models.used_mb == 3010
+    assert models.stats()["models"]["medium"]["memory_mb"] == 3010
+
+    models.reserve("large")
+    assert evicted == ["medium"]
+    assert models.used_mb == 3000
+
+    models.cancel("large")
+    models.reserve("medium")
+    assert models.used_mb == 1500
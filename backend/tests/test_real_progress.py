@@ -0,0 +1,115 @@
+import os
+import sys
+import types
+
+import pytest
+
+from main_real_progress import RealDownloadService, RealProgressTracker, snapshot_complete
+
+FILES = {
+    "config.json": 10,
+    "model.bin": 1000,
+    "preprocessor_config.json": 10,
+    "tokenizer.json": 100,
+    "vocabulary.json": 50,
+    "README.md": 5
+}
+
+
+def test_tracker_smooths_throughput_and_estimates_eta():
+    tracker = RealProgressTracker("small", total_bytes=1000, smoothing=0.5)
+    tracker.update(200, now=0.0)
+    tracker.update(400, now=1.0)
+
+    assert tracker.resumed_bytes == 200
+    assert tracker.bytes_per_second == 100.0
+    assert tracker.eta_seconds == 6.0
+    progress = tracker.as_dict()
+    assert (progress["percentage"], progress["is_downloading"], progress["eta_seconds"]) == (40, True, 6)
+    assert progress["status"] == "Laddar ner small modell... 40% (100.0 B/s, 6 s kvar)"
+
+
+def test_tracker_done():
+    tracker = RealProgressTracker("small", total_bytes=1000)
+    tracker.update(1200, now=0.0)
+
+    progress = tracker.as_dict(done=True)
+    assert (progress["percentage"], progress["downloaded_bytes"], progress["eta_seconds"]) == (100, 1000, None)
+    assert progress["status"] == "small modell nedladdad och klar!"
+
+
+def test_formatting():
+    assert RealProgressTracker.format_bytes(1536) == "1.5 KB"
+    assert RealProgressTracker.format_duration(3725) == "1 h 2 min"
+    assert RealProgressTracker.format_duration(75) == "1 min 15 s"
+
+
+def test_snapshot_needs_every_model_file(tmp_path):
+    for name in FILES:
+        (tmp_path / name).write_text("x")
+    assert snapshot_complete(str(tmp_path))
+
+    os.remove(tmp_path / "tokenizer.json")
+    assert not snapshot_complete(str(tmp_path))
+    # A link to a blob that is not there yet
+    os.symlink(tmp_path / "missing", tmp_path / "tokenizer.json")
+    assert not snapshot_complete(str(tmp_path))
+    assert not snapshot_complete(str(tmp_path / "nowhere"))
+
+
+@pytest.fixture
+def hub(monkeypatch, tmp_path):
+    """huggingface_hub as RealDownloadService uses it, writing files into a snapshot folder"""
+    fetched = []
+    snapshot = tmp_path / "models--KBLab--kb-whisper-small" / "snapshots" / "abc"
+    fail_on = set()
+
+    def hf_hub_download(model_id, filename, revision, cache_dir):
+        if filename in fail_on:
+            raise ConnectionError("connection reset")
+        fetched.append(filename)
+        snapshot.mkdir(parents=True, exist_ok=True)
+        (snapshot / filename).write_text("x")
+        return str(snapshot / filename)
+
+    class HfApi:
+        def model_info(self, model_id, files_metadata):
+            siblings = [types.SimpleNamespace(rfilename=name, size=size) for name, size in sorted(FILES.items())]
+            return types.SimpleNamespace(siblings=siblings, sha="abc")
+
+    module = types.SimpleNamespace(
+        HfApi=HfApi,
+        hf_hub_download=hf_hub_download,
+        try_to_load_from_cache=lambda model_id, filename, cache_dir, revision: (
+            str(snapshot / filename) if (snapshot / filename).exists() else None
+        )
+    )
+    monkeypatch.setitem(sys.modules, "huggingface_hub", module)
+    return types.SimpleNamespace(fetched=fetched, snapshot=snapshot, fail_on=fail_on)
+
+
+def test_download_fetches_the_weights_last(hub, tmp_path):
+    progress = []
+    path = RealDownloadService(interval=0.01).download(
+        "KBLab/kb-whisper-small", str(tmp_path), progress.append, label="small"
+    )
+
+    assert path == str(hub.snapshot)
+    assert hub.fetched[-1] == "model.bin"
+    assert "README.md" not in hub.fetched
+    assert progress[-1]["percentage"] == 100 and progress[-1]["total_bytes"] == 1170
+
+
+def test_interrupted_download_is_incomplete_and_resumed(hub, tmp_path):
+    hub.fail_on.add("vocabulary.json")
+    with pytest.raises(ConnectionError):
+        RealDownloadService(interval=0.01).download("KBLab/kb-whisper-small", str(tmp_path), lambda progress: None)
+    assert "model.bin" not in hub.fetched
+    assert not snapshot_complete(str(hub.snapshot))
+
+    hub.fail_on.clear()
+    progress = []
+    RealDownloadService(interval=0.01).download("KBLab/kb-whisper-small", str(tmp_path), progress.append)
+    assert snapshot_complete(str(hub.snapshot))
+    # Files already on disk count as resumed
+    assert progress[0]["resumed_bytes"] == 120
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+
+from scheduler import InferenceScheduler, WindowDropped
+
+
+def run(scheduler, submit):
+    """Queue jobs with submit(scheduler) before any worker runs, then start and gather the results"""
+    async def main():
+        futures = submit(scheduler)
+        scheduler.start()
+        try:
+            return await asyncio.gather(*futures, return_exceptions=True)
+        finally:
+            scheduler.shutdown()
+
+    return asyncio.run(main())
+
+
+def make(*sessions, **kwargs):
+    scheduler = InferenceScheduler(1, **kwargs)
+    for session_id in sessions:
+        scheduler.register_session(session_id)
+    return scheduler
+
+
+def test_round_robin_alternates_between_sessions():
+    order = []
+
+    def submit(scheduler):
+        jobs = [("a", 1), ("a", 2), ("a", 3), ("b", 1)]
+        return [scheduler.submit(session, order.append, f"{session}{n}") for session, n in jobs]
+
+    run(make("a", "b"), submit)
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_deadline_policy_runs_the_earliest_deadline_first():
+    order = []
+
+    def submit(scheduler):
+        return [
+            scheduler.submit("slow", order.append, "slow", latency_budget=5.0),
+            scheduler.submit("fast", order.append, "fast", latency_budget=0.5)
+        ]
+
+    run(make("slow", "fast", policy="deadline"), submit)
+    assert order == ["fast", "slow"]
+
+
+def test_full_queue_drops_the_oldest_window():
+    scheduler = make("a", max_queue_per_session=2)
+
+    def submit(scheduler):
+        return [scheduler.submit("a", lambda n: n, n) for n in range(3)]
+
+    results = run(scheduler, submit)
+    assert isinstance(results[0], WindowDropped)
+    assert results[1:] == [1, 2]
+    assert scheduler.stats()["sessions"]["a"]["dropped"] == 1
+
+
+def test_errors_fail_only_their_job():
+    def fail():
+        raise ValueError("bad window")
+
+    results = run(make("a"), lambda scheduler: [
+        scheduler.submit("a", fail),
+        scheduler.submit("a", lambda: "ok")
+    ])
+    assert isinstance(results[0], ValueError)
+    assert results[1] == "ok"
+
+
+def test_jobs_with_the_same_batch_key_run_as_one_batch():
+    calls = []
+
+    def batch_fn(args):
+        calls.append(args)
+        return [ValueError("dropped") if arg == ("b",) else arg[0].upper() for arg in args]
+
+    def submit(scheduler):
+        return [
+            scheduler.submit(session, str.upper, session, batch_key="small", batch_fn=batch_fn)
+            for session in ("a", "b", "c")
+        ] + [scheduler.submit("d", str.upper, "d", batch_key="large", batch_fn=batch_fn)]
+
+    scheduler = make("a", "b", "c", "d", max_batch_size=4, batch_timeout=0.01)
+    results = run(scheduler, submit)
+
+    assert calls[0] == [("a",), ("b",), ("c",)]
+    assert results[0] == "A" and isinstance(results[1], ValueError) and results[2:] == ["C", "D"]
+    assert scheduler.stats()["batches"] == 1
+
+
+def test_unregister_cancels_queued_jobs():
+    release = threading.Event()
+
+    async def main():
+        scheduler = make("a")
+        scheduler.start()
+        running = scheduler.submit("a", release.wait)
+        queued = scheduler.submit("a", lambda: "never")
+        await asyncio.sleep(0.05)
+
+        scheduler.unregister_session("a")
+        release.set()
+        await running
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        scheduler.shutdown()
+
+        with pytest.raises(RuntimeError):
+            scheduler.submit("a", lambda: None)
+
+    asyncio.run(main())
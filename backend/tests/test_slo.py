@@ -0,0 +1,73 @@
+from slo import LatencyController, QualityLevel, quality_ladder, smaller_model
+
+
+def controller(**kwargs):
+    levels = quality_ladder(3, "small", max_step_scale=2.0)
+    return LatencyController(levels, target_latency=2.0, **kwargs)
+
+
+def test_quality_ladder_goes_beam_then_model_then_step():
+    levels = quality_ladder(3, "small", max_step_scale=2.0)
+
+    assert levels == [
+        QualityLevel(3), QualityLevel(2), QualityLevel(1),
+        QualityLevel(1, "small"), QualityLevel(1, "small", 1.5), QualityLevel(1, "small", 2.0)
+    ]
+    assert quality_ladder(1, None, max_step_scale=1.0) == [QualityLevel(1)]
+
+
+def test_smaller_model_is_the_largest_loaded_below():
+    assert smaller_model("large", ["tiny", "small"]) == "small"
+    assert smaller_model("tiny", ["tiny", "small"]) is None
+    assert smaller_model("custom", ["small"]) is None
+
+
+def test_steps_down_when_too_slow_with_a_cooldown():
+    slo = controller(cooldown=2)
+
+    reasons = [slo.observe(latency=4.0, rtf=0.5) for _ in range(5)]
+    # The first window can't step down yet, then one step every cooldown windows
+    assert [reason is not None for reason in reasons] == [False, True, False, True, False]
+    assert slo.level == QualityLevel(1)
+
+
+def test_real_time_factor_alone_steps_down():
+    slo = controller(cooldown=1)
+
+    assert slo.observe(latency=0.5, rtf=1.2) is not None
+    assert slo.index == 1
+
+
+def test_stops_at_the_cheapest_level():
+    slo = controller(cooldown=1)
+    for _ in range(20):
+        slo.observe(latency=10.0, rtf=2.0)
+
+    assert slo.index == len(slo.levels) - 1
+
+
+def test_recovers_only_after_a_streak_with_headroom():
+    slo = controller(cooldown=1, recover_after=3, smoothing=1.0)
+    slo.observe(latency=4.0, rtf=0.5)
+    assert slo.index == 1
+
+    # Under target but without headroom: no recovery
+    for _ in range(5):
+        assert slo.observe(latency=1.5, rtf=0.3) is None
+
+    assert slo.observe(latency=0.5, rtf=0.3) is None
+    assert slo.observe(latency=0.5, rtf=0.3) is None
+    assert slo.observe(latency=1.5, rtf=0.3) is None
+    reasons = [slo.observe(latency=0.5, rtf=0.3) for _ in range(3)]
+    assert reasons[:2] == [None, None] and reasons[2].startswith("headroom")
+    assert slo.index == 0
+
+
+def test_latency_is_smoothed():
+    slo = controller(smoothing=0.5)
+    slo.observe(latency=1.0, rtf=0.2)
+    slo.observe(latency=3.0, rtf=0.2)
+
+    # A single slow window doesn't exceed the 2 s target on its own
+    assert slo.latency == 2.0
+    assert slo.index == 0
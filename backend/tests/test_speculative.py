@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ctranslate2")
+
+from speculative import SpeculativeDecoder  # noqa: E402
+
+EOT = 100
+SOT_PREV = 101
+SOT_SEQUENCE = (102, 103, 104)
+NO_TIMESTAMPS = 105
+
+
+class FakeGenerator:
+    """Greedy decoder with CTranslate2's max_length rule: the prompt counts.
+
+    Its greedy continuation is `text` followed by eot, whatever audio;
+    `mistakes` maps positions to wrong tokens, to act as a draft model.
+    """
+
+    def __init__(self, text, mistakes=None):
+        self.text = list(text)
+        self.mistakes = mistakes or {}
+        self.calls = []
+
+    def next_token(self, position):
+        if position in self.mistakes:
+            return self.mistakes[position]
+        return self.text[position] if position < len(self.text) else EOT
+
+    def generate(self, encoded, prompts, max_length, **kwargs):
+        self.calls.append(max_length)
+        results = []
+        for prompt in prompts:
+            generated = [token for token in prompt[prompt.index(NO_TIMESTAMPS) + 1:]]
+            sequence = []
+            while len(prompt) + len(sequence) < max_length:
+                token = self.next_token(len(generated) + len(sequence))
+                sequence.append(token)
+                if token == EOT:
+                    break
+            results.append(SimpleNamespace(sequences_ids=[sequence], scores=[-0.1], no_speech_prob=0.01))
+        return results
+
+
+def tokenizer():
+    return SimpleNamespace(eot=EOT, sot_prev=SOT_PREV, sot_sequence=SOT_SEQUENCE, no_timestamps=NO_TIMESTAMPS)
+
+
+def decoder(target, draft, k=4):
+    return SpeculativeDecoder(
+        SimpleNamespace(model=target), SimpleNamespace(model=draft), tokenizer(), tokenizer(), k
+    )
+
+
+def encoded():
+    return np.zeros((1, 4, 8), dtype=np.float32)
+
+
+def test_output_equals_target_greedy_decode():
+    text = list(range(10, 40))
+    target = FakeGenerator(text)
+    draft = FakeGenerator(text, mistakes={3: 7, 11: 8, 12: 9})
+
+    result = decoder(target, draft).decode(encoded(), encoded(), [])
+
+    assert result.tokens == text
+    assert result.accepted < result.drafted
+    # Fewer target calls than tokens is the point of it
+    assert result.target_calls < len(text)
+
+
+def test_prompt_counts_towards_max_length():
+    text = list(range(10, 20))
+    target = FakeGenerator(text)
+    draft = FakeGenerator(text)
+
+    result = decoder(target, draft, k=3).decode(encoded(), encoded(), previous_tokens=[50, 51, 52])
+
+    assert result.tokens == text
+    prompt_length = 1 + 3 + len(SOT_SEQUENCE) + 1
+    assert target.calls[0] == prompt_length + 1
+    assert draft.calls[0] == prompt_length + 1 + 3
+
+
+def test_stops_at_max_length():
+    text = list(range(10, 40))
+    result = decoder(FakeGenerator(text), FakeGenerator(text)).decode(encoded(), encoded(), [], max_length=6)
+
+    assert result.tokens == text[:6]
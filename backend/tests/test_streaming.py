@@ -0,0 +1,123 @@
+import pytest
+
+from streaming import CaptionTrack, LocalAgreement, PromptContext, Word, segment_trim_point, segments_to_words
+
+
+def words(text, start=0.0, step=0.5):
+    return [Word(start + i * step, start + (i + 1) * step, part) for i, part in enumerate(text.split())]
+
+
+def texts(committed):
+    return " ".join(word.text for word in committed)
+
+
+def test_segments_to_words_splits_by_length_without_word_timestamps():
+    result = segments_to_words([{"text": "ab abcd", "start": 0.0, "end": 3.0}], offset=10.0)
+
+    assert [(word.text, word.start, word.end) for word in result] == [("ab", 10.0, 11.0), ("abcd", 11.0, 13.0)]
+
+
+def test_segments_to_words_uses_word_timestamps():
+    segment = {"text": "hej", "start": 0.0, "end": 1.0, "words": [
+        {"word": " hej", "start": 0.2, "end": 0.6},
+        {"word": " ", "start": 0.6, "end": 0.7}
+    ]}
+
+    assert segments_to_words([segment], offset=5.0) == [Word(5.2, 5.6, "hej")]
+
+
+def test_local_agreement_commits_the_common_prefix():
+    agreement = LocalAgreement(2)
+
+    assert agreement.insert(words("det var en")) == []
+    committed = agreement.insert(words("det var ett"))
+
+    assert texts(committed) == "det var"
+    assert agreement.committed_until == 1.0
+    assert texts(agreement.unconfirmed()) == "ett"
+
+
+def test_local_agreement_ignores_case_and_punctuation():
+    agreement = LocalAgreement(2)
+    agreement.insert(words("Hej, där"))
+
+    assert texts(agreement.insert(words("hej där!"))) == "hej där!"
+
+
+def test_local_agreement_needs_all_n_hypotheses():
+    agreement = LocalAgreement(3)
+    agreement.insert(words("a b c"))
+    agreement.insert(words("a b d"))
+
+    assert texts(agreement.insert(words("a x d"))) == "a"
+
+
+def test_local_agreement_skips_committed_words_decoded_again():
+    agreement = LocalAgreement(2)
+    agreement.insert(words("i dag är"))
+    agreement.insert(words("i dag är det"))
+
+    # The buffer was trimmed after "är"; its last words come back, timed just past the cut
+    assert texts(agreement.insert(words("dag är det fint", start=1.45))) == "det"
+    assert texts(agreement.insert(words("fint väder", start=2.95))) == "fint"
+
+
+def test_local_agreement_flush_commits_without_agreement():
+    agreement = LocalAgreement(2)
+    agreement.insert(words("ett två"))
+
+    assert texts(agreement.flush()) == "ett två"
+    assert agreement.unconfirmed() == []
+    assert agreement.flush() == []
+
+
+def test_local_agreement_needs_two_hypotheses():
+    with pytest.raises(ValueError):
+        LocalAgreement(1)
+
+
+def test_prompt_context_resets_after_silence():
+    context = PromptContext(reset_after=10.0)
+    context.add(words("Anna Lindh", start=0.0))
+
+    assert context.text(now=5.0) == "Anna Lindh"
+    assert context.text(now=20.0) is None
+
+
+def test_segment_trim_point_is_last_fully_committed_segment():
+    segments = [{"start": 0.0, "end": 2.0}, {"start": 2.0, "end": 4.0}, {"start": 4.0, "end": 6.0}]
+
+    assert segment_trim_point(segments, offset=1.0, committed_until=5.0) == 5.0
+    assert segment_trim_point(segments, offset=1.0, committed_until=2.0) is None
+
+
+def test_caption_track_revises_then_commits_a_segment():
+    track = CaptionTrack()
+
+    partial = track.tentative(words("det var"))
+    assert track.tentative(words("det var")) is None
+    replace = track.tentative(words("det var en"))
+    commit, next_partial = track.commit(words("det var ett"), words("hus", start=1.5))
+
+    assert [partial["op"], replace["op"], commit["op"], next_partial["op"]] == ["partial", "replace", "commit", "partial"]
+    assert partial["id"] == replace["id"] == commit["id"] == "seg-0"
+    assert [partial["revision"], replace["revision"], commit["revision"]] == [1, 2, 3]
+    assert (commit["text"], commit["start"], commit["end"]) == ("det var ett", 0.0, 1.5)
+    assert (next_partial["id"], next_partial["revision"]) == ("seg-1", 1)
+
+
+def test_caption_track_withdraws_empty_segment():
+    track = CaptionTrack()
+    track.tentative(words("öh"))
+
+    withdrawn = track.tentative([])
+    assert (withdrawn["op"], withdrawn["text"], withdrawn["start"]) == ("replace", "", None)
+    assert track.tentative([]) is None
+    assert track.tentative(words("nu"))["id"] == "seg-1"
+
+
+def test_caption_track_commit_without_open_segment():
+    track = CaptionTrack()
+
+    messages = track.commit(words("klart"), [])
+    assert [(message["op"], message["id"]) for message in messages] == [("commit", "seg-0")]
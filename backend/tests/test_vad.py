@@ -0,0 +1,107 @@
+import numpy as np
+
+from audio_buffer import TimeMap
+from vad import SAMPLE_RATE, EnergyVad, Endpointer, VadGate
+
+CHUNK = 1600  # 100 ms, five 20 ms frames
+
+
+def tone(samples=CHUNK, amplitude=0.1):
+    t = np.arange(samples, dtype=np.float32) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(samples=CHUNK):
+    return np.zeros(samples, dtype=np.float32)
+
+
+def test_energy_vad_marks_speech_frames():
+    vad = EnergyVad()
+    frames = vad.speech_frames(np.concatenate([silence(960), tone(640)]))
+
+    assert frames.tolist() == [False, False, False, True, True]
+
+
+def test_energy_vad_noise_floor_only_creeps_up():
+    vad = EnergyVad()
+    vad.speech_frames(tone(amplitude=0.01))
+    floor = vad.noise_floor_db
+
+    # A long stretch of loud speech is not learned as the background
+    vad.speech_frames(tone(amplitude=0.3))
+    assert vad.noise_floor_db - floor <= vad.floor_rise_db
+    assert vad.speech_frames(tone(amplitude=0.3)).all()
+
+
+def test_energy_vad_ignores_partial_frames():
+    assert len(EnergyVad().speech_frames(tone(300))) == 0
+
+
+def test_gate_releases_preroll_and_holds_open_for_the_hangover():
+    gate = VadGate(EnergyVad(), hangover_chunks=1, preroll_chunks=1)
+    first, second, speech = silence(), silence(), tone()
+
+    assert gate.process(first) == []
+    assert gate.process(second) == []
+    # Only the last silent chunk is kept as preroll
+    assert gate.skipped_samples == CHUNK
+
+    kept = gate.process(speech)
+    assert [chunk is original for chunk, original in zip(kept, (second, speech))] == [True, True]
+    assert gate.is_speech
+
+    assert len(gate.process(silence())) == 1
+    assert gate.process(silence()) == []
+    assert not gate.is_speech
+
+
+def test_time_map_reports_session_positions_after_skips():
+    time_map = TimeMap()
+    time_map.skip(100, 50)
+    time_map.skip(100, 10)
+    time_map.skip(300, 40)
+
+    assert [time_map.to_session(position) for position in (0, 99, 100, 299, 300)] == [0, 99, 160, 359, 400]
+    assert time_map.skipped == 100
+
+
+def test_time_map_prune_keeps_lookups_after_oldest():
+    time_map = TimeMap()
+    time_map.skip(100, 50)
+    time_map.skip(300, 40)
+    time_map.prune(200)
+
+    assert time_map._positions == [100, 300]
+    assert (time_map.to_session(200), time_map.to_session(300)) == (250, 390)
+
+
+def frames(speech: bool, count=5):
+    return np.full(count, speech)
+
+
+def test_endpointer_ends_an_utterance_after_silence():
+    endpointer = Endpointer(silence_ms=200, frame_samples=320)
+
+    # Silence before any speech ends nothing
+    assert endpointer.update(frames(False), CHUNK) is None
+    assert endpointer.update(frames(True), CHUNK) is None
+    # 100 ms of silence after the last speech frame, then 200 ms
+    assert endpointer.update(frames(False), CHUNK) is None
+    assert endpointer.update(frames(False), CHUNK) == "silence"
+    assert endpointer.update(frames(False), CHUNK) is None
+
+
+def test_endpointer_counts_silence_after_the_last_speech_frame():
+    endpointer = Endpointer(silence_ms=200, frame_samples=320)
+
+    # Speech in the first frame only: 80 ms of trailing silence already
+    assert endpointer.update(np.array([True, False, False, False, False]), CHUNK) is None
+    assert endpointer.update(frames(False), CHUNK) is None
+    assert endpointer.update(np.array([False, False]), 640) == "silence"
+
+
+def test_endpointer_cuts_long_utterances():
+    endpointer = Endpointer(silence_ms=500, max_utterance=0.3)
+
+    results = [endpointer.update(frames(True), CHUNK) for _ in range(6)]
+    assert results == [None, None, "max_length", None, None, "max_length"]
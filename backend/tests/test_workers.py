@@ -0,0 +1,190 @@
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from scheduler import WindowDropped
+from workers import InferenceProcessPool, RemoteWindow, RingCache, SharedAudioRingBuffer, WorkerExited
+
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    """Snapshot directories per size, as the server would have downloaded them"""
+    paths = {}
+    for size in ("tiny", "small"):
+        paths[size] = str(tmp_path / size)
+        os.mkdir(paths[size])
+    return paths
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    # Worker processes inherit the environment, so they import the stub model
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [STUBS, os.environ.get("PYTHONPATH")])))
+    pools = []
+
+    def make(num_processes=1, replicas=1, **kwargs):
+        pool = InferenceProcessPool(num_processes, cpu_threads=1, replicas=replicas, warmup_seconds=0, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+@pytest.fixture
+def make_ring():
+    rings = []
+
+    def make(value=1.0, samples=8000):
+        ring = SharedAudioRingBuffer(16000)
+        ring.append(np.full(samples, value, dtype=np.float32))
+        rings.append(ring)
+        return ring
+
+    yield make
+    for ring in rings:
+        if ring._data is not None:
+            ring.close()
+
+
+def window(ring, size="small", samples=8000):
+    return RemoteWindow(ring.name, ring.capacity, 0, samples, size, 1)
+
+
+def decoded(segments):
+    """Fields of the stub's segment text"""
+    model, *fields = segments[0]["text"].split()
+    return {"model": model, **dict(field.split("=") for field in fields)}
+
+
+def wait_until(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_windows_decode_concurrently_over_processes_and_replicas(make_pool, make_ring, snapshots, monkeypatch):
+    monkeypatch.setenv("STUB_DECODE_SECONDS", "0.5")
+    pool = make_pool(2, replicas=2)
+    pool.register("small", snapshots["small"])
+    pool.load("small")
+    rings = [make_ring(value=i + 1) for i in range(4)]
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=pool.slots) as executor:
+        results = list(executor.map(lambda ring: decoded(pool.transcribe(window(ring))), rings))
+    elapsed = time.monotonic() - start
+
+    # Four slots: all windows at once, not one after another
+    assert elapsed < 1.5
+    assert [result["sum"] for result in results] == ["8000", "16000", "24000", "32000"]
+    assert len({result["pid"] for result in results}) == 2
+    assert pool.stats()["busy"] == 0
+
+
+def test_window_waits_for_a_worker_to_get_ready(make_pool, make_ring, snapshots, monkeypatch):
+    monkeypatch.setenv("STUB_LOAD_SECONDS", "1")
+    pool = make_pool()
+    pool.register("small", snapshots["small"])
+    pool.start()
+    assert not pool.ready
+
+    # Loads the registered model on first use
+    assert decoded(pool.transcribe(window(make_ring())))["model"] == "small"
+    assert pool.ready
+
+
+def test_load_reaches_every_process_and_fails_without_snapshot(make_pool, make_ring, snapshots, tmp_path):
+    pool = make_pool(2)
+    pool.register("small", snapshots["small"])
+    pool.register("tiny", str(tmp_path / "missing"))
+
+    pool.load("small")
+    with pytest.raises(RuntimeError, match="could not load model tiny"):
+        pool.load("tiny")
+
+    assert pool.stats()["models"] == ["small"]
+    assert all(worker["ready"] for worker in pool.stats()["workers"])
+    with pytest.raises(RuntimeError, match="No snapshot"):
+        pool.transcribe(window(make_ring(), size="tiny"))
+
+
+def test_worker_keeps_models_within_its_budget(make_pool, make_ring, snapshots):
+    pool = make_pool(budget_mb=400)
+    pool.register("small", snapshots["small"])
+    pool.register("tiny", snapshots["tiny"])
+
+    # 500 MB for small does not fit in 400
+    with pytest.raises(RuntimeError, match="MemoryError"):
+        pool.load("small")
+    pool.load("tiny")
+    assert decoded(pool.transcribe(window(make_ring(), size="tiny")))["model"] == "tiny"
+
+
+def test_killed_worker_fails_its_window_and_restarts(make_pool, make_ring, snapshots, monkeypatch):
+    monkeypatch.setenv("STUB_DECODE_SECONDS", "1")
+    pool = make_pool()
+    pool.register("small", snapshots["small"])
+    pool.load("small")
+    ring = make_ring()
+    pid = pool.stats()["workers"][0]["pid"]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(pool.transcribe, window(ring))
+        wait_until(lambda: pool.stats()["busy"] == 1)
+        os.kill(pid, signal.SIGKILL)
+        with pytest.raises(WorkerExited):
+            future.result(timeout=10)
+
+    wait_until(lambda: pool.ready and pool.stats()["workers"][0]["restarts"] == 1)
+    # Started again with its model preloaded
+    assert pool.stats()["models"] == ["small"]
+    result = decoded(pool.transcribe(window(ring)))
+    assert result["pid"] != str(pid)
+
+
+def test_ring_closed_mid_session(make_pool, make_ring, snapshots):
+    pool = make_pool()
+    pool.register("small", snapshots["small"])
+    pool.load("small")
+
+    mapped = make_ring()
+    pool.transcribe(window(mapped))
+    mapped.close()
+    # The worker keeps its mapping; the server's contains() check decides what the result is worth
+    assert decoded(pool.transcribe(window(mapped)))["sum"] == "8000"
+
+    gone = make_ring()
+    gone.close()
+    with pytest.raises(WindowDropped):
+        pool.transcribe(window(gone))
+
+    assert decoded(pool.transcribe(window(make_ring(value=2))))["sum"] == "16000"
+    assert pool.stats()["workers"][0]["restarts"] == 0
+
+
+def test_ring_cache_keeps_rings_in_use_mapped(make_ring):
+    rings = RingCache(limit=1)
+    first, second = make_ring(), make_ring(value=2)
+
+    assert rings.acquire(window(first))[:8000].sum() == 8000
+    rings.acquire(window(second))
+    # Over the limit, but first is still being read
+    assert len(rings._rings) == 2
+
+    rings.release(window(first))
+    assert list(rings._rings) == [second.name]
+    rings.release(window(second))
+    rings.close()
+    # attach_ring() took the rings off this process's resource tracker, which created them
+    for ring in (first, second):
+        resource_tracker.register(ring._shm._name, "shared_memory")
@@ -0,0 +1,218 @@
+"""Auto-tuner: finds the fastest CTranslate2 settings for each model on this host.
+
+Benchmarks every model size over a grid of compute_type, cpu_threads and
+num_workers (replicas), decoding windows of a Swedish recording from as
+many threads as there are replicas, like concurrent sessions do. The
+best setting per model is the one with the highest throughput whose
+windows still decode at least twice as fast as real time (--max-rtf);
+if none does, the one with the lowest latency. Results are stored per
+host in a JSON profile, which TranscriptionService reads at startup to
+load each model with its tuned settings.
+
+    python tuning.py --audio tal.wav --models small medium
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "tuning_profile.json")
+
+
+def cpu_model() -> str:
+    """CPU model name, e.g. "AMD EPYC 7B13", or the processor string where /proc/cpuinfo is missing"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def host_key() -> str:
+    """Identifies the hardware a profile was measured on.
+
+    Not the hostname: containers get a new one on every start, the same
+    tuned settings apply to any machine with this CPU and core count.
+    """
+    return f"{platform.machine()}/{cpu_model()}/{os.cpu_count()}"
+
+
+def load_profile(path: str) -> Dict[str, dict]:
+    """Tuned settings per model size for this host, empty if there are none"""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable tuning profile {path}: {e}")
+        return {}
+    return profile.get("hosts", {}).get(host_key(), {}).get("models", {})
+
+
+def save_profile(path: str, models: Dict[str, dict]):
+    """Merge this host's results into the profile, keeping other hosts and models"""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        profile = {}
+
+    host = profile.setdefault("hosts", {}).setdefault(host_key(), {"models": {}})
+    host["models"].update(models)
+    host["cores"] = os.cpu_count()
+    host["tuned_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def grid(cores: int, threads: Optional[List[int]], workers: Optional[List[int]]) -> List[tuple]:
+    """(cpu_threads, num_workers) pairs that don't use more threads than there are cores"""
+    powers = [n for n in (1, 2, 4, 8, 16, 32) if n <= cores]
+    return [
+        (cpu_threads, num_workers)
+        for cpu_threads in (threads or powers)
+        for num_workers in (workers or powers)
+        if cpu_threads * num_workers <= cores
+    ]
+
+
+def measure(model, windows: List[np.ndarray], concurrency: int, beam_size: int) -> dict:
+    """Decode all windows from `concurrency` threads; throughput and per-window latency"""
+    latencies = []
+    lock = threading.Lock()
+    next_window = iter(windows)
+
+    def decode_windows():
+        while True:
+            with lock:
+                window = next(next_window, None)
+            if window is None:
+                return
+            start = time.perf_counter()
+            segments, _ = model.transcribe(window, language="sv", beam_size=beam_size, vad_filter=False)
+            list(segments)
+            with lock:
+                latencies.append((time.perf_counter() - start) / (len(window) / SAMPLE_RATE))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=decode_windows) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    audio_seconds = sum(len(window) for window in windows) / SAMPLE_RATE
+    return {
+        "throughput": round(audio_seconds / wall, 2),
+        "rtf": round(statistics.mean(latencies), 3),
+        "rtf_p90": round(sorted(latencies)[int(0.9 * (len(latencies) - 1))], 3)
+    }
+
+
+def tune_model(size: str, windows: List[np.ndarray], args) -> Optional[dict]:
+    from faster_whisper import WhisperModel
+
+    results = []
+    for compute_type in args.compute_types:
+        for cpu_threads, num_workers in grid(os.cpu_count() or 1, args.threads, args.workers):
+            try:
+                model = WhisperModel(
+                    f"KBLab/kb-whisper-{size}",
+                    device="cpu",
+                    compute_type=compute_type,
+                    cpu_threads=cpu_threads,
+                    num_workers=num_workers,
+                    download_root=args.cache_dir
+                )
+            except ValueError as e:
+                # compute_type not supported on this CPU
+                print(f"{size} {compute_type}: skipped ({e})")
+                break
+
+            # The first decode allocates buffers, keep it out of the numbers
+            measure(model, windows[:num_workers], num_workers, args.beam_size)
+            result = {
+                "compute_type": compute_type,
+                "cpu_threads": cpu_threads,
+                "num_workers": num_workers,
+                **measure(model, windows, num_workers, args.beam_size)
+            }
+            results.append(result)
+            print(
+                f"{size:6} {compute_type:12} threads={cpu_threads:<2} workers={num_workers:<2} "
+                f"{result['throughput']:6.2f} audio s/s  rtf {result['rtf']:.3f} (p90 {result['rtf_p90']:.3f})"
+            )
+            del model
+
+    fast_enough = [result for result in results if result["rtf_p90"] <= args.max_rtf]
+    if fast_enough:
+        return max(fast_enough, key=lambda result: result["throughput"])
+    if results:
+        return min(results, key=lambda result: result["rtf"])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", required=True, help="Swedish speech, any format ffmpeg reads")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small", "medium", "large"])
+    parser.add_argument("--compute-types", nargs="+", default=list(COMPUTE_TYPES))
+    parser.add_argument("--threads", type=int, nargs="+", help="cpu_threads values, default powers of two")
+    parser.add_argument("--workers", type=int, nargs="+", help="num_workers values, default powers of two")
+    parser.add_argument("--window", type=float, default=10.0, help="Window length in seconds")
+    parser.add_argument("--windows", type=int, default=16, help="Windows decoded per setting")
+    parser.add_argument("--beam-size", type=int, default=3)
+    parser.add_argument("--max-rtf", type=float, default=0.5, help="Slowest acceptable p90 real-time factor")
+    parser.add_argument("--profile", default=os.environ.get("TUNING_PROFILE", DEFAULT_PROFILE))
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+    )
+    args = parser.parse_args()
+
+    from faster_whisper import decode_audio
+
+    audio = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    step = int(args.window * SAMPLE_RATE)
+    windows = [audio[i:i + step] for i in range(0, len(audio) - step // 2, step)]
+    if not windows:
+        parser.error("The recording is shorter than half a window")
+    # Cycle through the recording if it is shorter than --windows windows
+    windows = [windows[i % len(windows)] for i in range(args.windows)]
+
+    best = {}
+    for size in args.models:
+        result = tune_model(size, windows, args)
+        if result is None:
+            continue
+        best[size] = result
+        print(
+            f"best for {size}: {result['compute_type']}, cpu_threads={result['cpu_threads']}, "
+            f"num_workers={result['num_workers']}"
+        )
+
+    save_profile(args.profile, best)
+    print(f"Saved profile for {host_key()} to {os.path.abspath(args.profile)}")
+
+
+if __name__ == "__main__":
+    main()
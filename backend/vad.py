@@ -0,0 +1,152 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class EnergyVad:
+    """Streaming speech detector on frame energy and zero-crossing rate.
+
+    Works on 20 ms frames, vectorized over each incoming chunk. A frame is
+    speech when its energy is well above an adaptive noise floor, or a bit
+    above it with a high zero-crossing rate (unvoiced consonants like s, f).
+    `sensitivity` follows the frontend VAD slider: 1 lets more through,
+    5 is strictest.
+    """
+
+    def __init__(
+        self,
+        sensitivity: int = 3,
+        frame_samples: int = 320,
+        min_energy_db: float = -55.0
+    ):
+        self.frame_samples = frame_samples
+        self.margin_db = 4.0 + 2.0 * sensitivity
+        self.min_energy_db = min_energy_db
+        self.noise_floor_db = -50.0
+        # The floor drops to quieter levels at once but only creeps up,
+        # so a long sentence isn't learned as background noise
+        self.floor_rise_db = 0.5
+
+    def speech_frames(self, audio: np.ndarray) -> np.ndarray:
+        """Boolean speech decision per frame of audio"""
+        n_frames = len(audio) // self.frame_samples
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = audio[:n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+
+        threshold = self.noise_floor_db + self.margin_db
+        speech = (energy_db > threshold) | ((energy_db > threshold - self.margin_db / 2) & (zcr > 0.3))
+        speech &= energy_db > self.min_energy_db
+
+        level = float(np.percentile(energy_db, 10))
+        if level < self.noise_floor_db:
+            self.noise_floor_db = level
+        else:
+            self.noise_floor_db += min(level - self.noise_floor_db, self.floor_rise_db)
+        self.noise_floor_db = min(max(self.noise_floor_db, -80.0), -20.0)
+
+        return speech
+
+
+class VadGate:
+    """Decides per incoming chunk whether audio goes on to the transcription buffer.
+
+    A chunk passes when enough of its frames are speech. The gate stays open
+    for `hangover_chunks` after speech so word endings and short pauses are
+    kept, and the last `preroll_chunks` silent chunks are held back and
+    released in front of the next speech so onsets aren't clipped.
+    """
+
+    def __init__(
+        self,
+        vad: EnergyVad,
+        hangover_chunks: int = 3,
+        preroll_chunks: int = 1,
+        min_speech_ratio: float = 0.1
+    ):
+        self.vad = vad
+        self.hangover_chunks = hangover_chunks
+        self.min_speech_ratio = min_speech_ratio
+        self._preroll: Deque[np.ndarray] = deque()
+        self._preroll_chunks = preroll_chunks
+        self._hangover = 0
+        self.is_speech = False
+        self.skipped_samples = 0  # Samples dropped by the last process() call
+        self.frames = np.zeros(0, dtype=bool)  # Frame decisions of the last process() call
+
+    def process(self, chunk: np.ndarray) -> List[np.ndarray]:
+        """Feed one chunk and return the audio to keep, in order"""
+        self.skipped_samples = 0
+        frames = self.frames = self.vad.speech_frames(chunk)
+        speech = len(frames) > 0 and frames.mean() >= self.min_speech_ratio
+
+        if speech:
+            self._hangover = self.hangover_chunks
+            self.is_speech = True
+            kept = list(self._preroll) + [chunk]
+            self._preroll.clear()
+            return kept
+
+        if self._hangover > 0:
+            self._hangover -= 1
+            return [chunk]
+
+        self.is_speech = False
+        self._preroll.append(chunk)
+        while len(self._preroll) > self._preroll_chunks:
+            self.skipped_samples += len(self._preroll.popleft())
+        return []
+
+
+class Endpointer:
+    """Finds utterance ends in a stream of per-frame speech decisions.
+
+    An utterance ends once `silence_ms` of non-speech follows speech, or is
+    cut when it has run for `max_utterance` seconds without such a pause.
+    """
+
+    def __init__(
+        self,
+        silence_ms: int = 500,
+        max_utterance: float = 15.0,
+        frame_samples: int = 320
+    ):
+        self.silence_samples = silence_ms * SAMPLE_RATE // 1000
+        self.max_utterance_samples = int(max_utterance * SAMPLE_RATE)
+        self.frame_samples = frame_samples
+        self._in_utterance = False
+        self._utterance_samples = 0
+        self._trailing_silence = 0
+
+    def update(self, frames: np.ndarray, samples: int) -> Optional[str]:
+        """Feed the frame decisions of one chunk of `samples` samples.
+
+        Returns "silence" or "max_length" when an utterance ended in this
+        chunk, otherwise None.
+        """
+        speech = np.flatnonzero(frames)
+        if len(speech):
+            self._in_utterance = True
+            self._trailing_silence = samples - (speech[-1] + 1) * self.frame_samples
+        else:
+            self._trailing_silence += samples
+
+        if not self._in_utterance:
+            return None
+
+        self._utterance_samples += samples
+        if self._trailing_silence >= self.silence_samples:
+            self._in_utterance = False
+            self._utterance_samples = 0
+            return "silence"
+        if self._utterance_samples >= self.max_utterance_samples:
+            # Still talking, the next utterance starts right here
+            self._utterance_samples = 0
+            return "max_length"
+        return None
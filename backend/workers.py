@@ -0,0 +1,727 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer
+from model_cache import MODEL_MEMORY_MB, ModelCache
+from scheduler import WindowDropped
+
+logger = logging.getLogger(__name__)
+
+# Shared-memory rings a worker keeps mapped while idle
+ATTACHED_RINGS = 16
+# Seconds a window waits for a worker process to get ready before it fails
+READY_TIMEOUT = 60.0
+
+
+class SharedAudioRingBuffer(AudioRingBuffer):
+    """AudioRingBuffer in shared memory, so worker processes read windows in place.
+
+    Only the samples are shared. Read and write positions stay in the
+    server process, which checks contains() after a decode exactly like
+    for an in-process one.
+    """
+
+    def __init__(self, capacity: int):
+        self._shm = shared_memory.SharedMemory(create=True, size=2 * capacity * 4)
+        super().__init__(capacity, buffer=self._shm.buf)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self):
+        """Free the shared memory; workers that still map it keep their mapping until they drop it"""
+        self._data = None
+        self._shm.unlink()
+        try:
+            self._shm.close()
+        except BufferError:
+            # A decode thread still holds a view, the mapping goes when it does
+            pass
+
+
+@dataclass
+class RemoteWindow:
+    """Samples [start, end) of a shared ring, and how to decode them"""
+    ring: str
+    capacity: int
+    start: int
+    end: int
+    model_size: str
+    beam_size: int
+    vad_filter: bool = True
+    word_timestamps: bool = False
+    prompt_tokens: Optional[List[int]] = None
+
+
+@dataclass
+class RemoteModel:
+    """Stands in for a model that only the worker processes load.
+
+    The server still encodes decoder prompts for those models, which only
+    takes the tokenizer, so it reads tokenizer.json from the downloaded
+    snapshot instead of loading the weights a second time.
+    """
+    path: str
+    hf_tokenizer: Any
+    is_multilingual: bool
+
+    @classmethod
+    def load(cls, path: str) -> "RemoteModel":
+        import tokenizers
+
+        with open(os.path.join(path, "config.json")) as f:
+            config = json.load(f)
+        return cls(
+            path,
+            tokenizers.Tokenizer.from_file(os.path.join(path, "tokenizer.json")),
+            # Like CTranslate2: English-only models have no language tokens
+            bool(config.get("lang_ids"))
+        )
+
+
+def transcribe_array(
+    model,
+    audio: np.ndarray,
+    beam_size: int,
+    vad_filter: bool = True,
+    word_timestamps: bool = False,
+    prompt_tokens: Optional[List[int]] = None
+) -> List[dict]:
+    """Decode one window with WhisperModel.transcribe, as segment dicts"""
+    segments, _ = model.transcribe(
+        audio,
+        language="sv",
+        beam_size=max(1, beam_size),
+        vad_filter=vad_filter,
+        word_timestamps=word_timestamps,
+        initial_prompt=prompt_tokens or None
+    )
+
+    transcriptions = []
+    for segment in segments:
+        transcription = {
+            "text": segment.text.strip(),
+            "start": segment.start,
+            "end": segment.end
+        }
+        if word_timestamps:
+            transcription["words"] = [
+                {"word": word.word, "start": word.start, "end": word.end}
+                for word in segment.words
+            ]
+        transcriptions.append(transcription)
+    return transcriptions
+
+
+def warmup_model(model, seconds: float, replicas: int = 1) -> float:
+    """Throwaway decodes so CTranslate2 allocates its buffers and caches now; returns the time taken.
+
+    The first decode on each replica is several times slower than the
+    rest. A model loaded with num_workers=replicas gets that many decodes
+    at once, which CTranslate2 hands to its idle replicas, so every one
+    of them is warm. Raises the first decode's error, if any.
+    """
+    # A tone under noise: not silence, so the decoder actually runs
+    samples = int(seconds * 16000)
+    t = np.arange(samples, dtype=np.float32) / 16000
+    rng = np.random.default_rng(0)
+    audio = (0.1 * np.sin(2 * np.pi * 220 * t) + 0.02 * rng.standard_normal(samples)).astype(np.float32)
+    errors = []
+
+    def decode():
+        try:
+            segments, _ = model.transcribe(
+                audio,
+                language="sv",
+                beam_size=5,
+                vad_filter=False,
+                condition_on_previous_text=False
+            )
+            list(segments)
+        except Exception as e:
+            errors.append(e)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=decode) for _ in range(max(1, replicas))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+
+def attach_ring(name: str) -> shared_memory.SharedMemory:
+    """Map a ring the server created.
+
+    Attaching registers the segment with this process's resource tracker,
+    which would unlink it when the worker exits, under the server's feet.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class RingCache:
+    """Shared-memory rings a worker has mapped, unmapped least recently used first.
+
+    A ring is only unmapped once no decode is reading from it.
+    """
+
+    def __init__(self, limit: int = ATTACHED_RINGS):
+        self.limit = limit
+        self._rings: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+        self._users: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, window: RemoteWindow) -> np.ndarray:
+        """Samples of the window's ring; raises FileNotFoundError once the session freed it"""
+        with self._lock:
+            if window.ring not in self._rings:
+                self._rings[window.ring] = attach_ring(window.ring)
+                self._users[window.ring] = 0
+            self._rings.move_to_end(window.ring)
+            self._users[window.ring] += 1
+            shm = self._rings[window.ring]
+            self._evict()
+        return np.ndarray((2 * window.capacity,), dtype=np.float32, buffer=shm.buf)
+
+    def release(self, window: RemoteWindow):
+        with self._lock:
+            self._users[window.ring] -= 1
+            self._evict()
+
+    def close(self):
+        with self._lock:
+            for shm in self._rings.values():
+                shm.close()
+            self._rings.clear()
+
+    def _evict(self):
+        idle = [name for name in self._rings if self._users[name] == 0]
+        while len(self._rings) > self.limit and idle:
+            name = idle.pop(0)
+            self._rings.pop(name).close()
+            del self._users[name]
+
+
+def worker_main(
+    index: int,
+    conn: Connection,
+    replicas: int,
+    specs: Dict[str, dict],
+    preload: Sequence[str],
+    budget_mb: int,
+    warmup_seconds: float
+):
+    """Worker process: load models on first use and decode windows until the server goes away.
+
+    Models come from the snapshots the server downloaded (specs: size to
+    path and load options), never from the network. Each is loaded once
+    with num_workers CTranslate2 replicas, which share its weights, warmed
+    up on every replica and kept in a ModelCache under budget_mb, so a
+    worker holds no more than the server allows. Up to `replicas` windows
+    are decoded at a time.
+    """
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    from faster_whisper import WhisperModel
+
+    specs = dict(specs)
+    models = ModelCache(MODEL_MEMORY_MB, budget_mb)
+    locks_lock = threading.Lock()
+    # One per size: loading takes seconds, decodes of other models go on meanwhile
+    load_locks: Dict[str, threading.Lock] = {}
+    send_lock = threading.Lock()
+    rings = RingCache()
+
+    def model_for(size: str) -> WhisperModel:
+        model = models[size]
+        if model is not None:
+            return model
+        with locks_lock:
+            load_lock = load_locks.setdefault(size, threading.Lock())
+
+        with load_lock:
+            model = models[size]
+            if model is not None:
+                return model
+            if size not in specs:
+                raise RuntimeError(f"Model {size} has not been downloaded by the server")
+            spec = specs[size]
+            # Evicts idle models, or refuses rather than run out of memory
+            models.reserve(size)
+            try:
+                start = time.perf_counter()
+                model = WhisperModel(
+                    spec["path"],
+                    device="cpu",
+                    compute_type=spec["compute_type"],
+                    cpu_threads=spec["cpu_threads"],
+                    num_workers=spec["num_workers"],
+                    local_files_only=True
+                )
+                logger.info(
+                    f"Worker {index} loaded model {size} with {spec['num_workers']} replicas "
+                    f"in {time.perf_counter() - start:.2f} s"
+                )
+                if warmup_seconds > 0:
+                    try:
+                        seconds = warmup_model(model, warmup_seconds, spec["num_workers"])
+                        logger.info(f"Worker {index} warmed up model {size} in {seconds:.2f} s")
+                    except Exception as e:
+                        logger.warning(f"Worker {index} warmup of model {size} failed: {e}")
+            except BaseException:
+                models.cancel(size)
+                raise
+            models.put(size, model)
+            return model
+
+    def send(message: tuple):
+        with send_lock:
+            conn.send(message)
+
+    def decode(job_id: int, window: RemoteWindow):
+        try:
+            data = rings.acquire(window)
+        except FileNotFoundError:
+            # The session ended and freed its ring
+            send((job_id, "dropped", "Session ring buffer is gone"))
+            return
+
+        # Not evicted while this window decodes with it
+        models.acquire(window.model_size)
+        try:
+            offset = window.start % window.capacity
+            transcriptions = transcribe_array(
+                model_for(window.model_size),
+                data[offset:offset + window.end - window.start],
+                window.beam_size,
+                window.vad_filter,
+                window.word_timestamps,
+                window.prompt_tokens
+            )
+        except Exception as e:
+            send((job_id, "error", f"{type(e).__name__}: {e}"))
+        else:
+            send((job_id, "ok", transcriptions))
+        finally:
+            models.release(window.model_size)
+            del data
+            rings.release(window)
+
+    def load(job_id: int, size: str):
+        try:
+            model_for(size)
+        except Exception as e:
+            send((job_id, "error", f"{type(e).__name__}: {e}"))
+        else:
+            send((job_id, "ok", None))
+
+    for size in preload:
+        try:
+            model_for(size)
+        except Exception as e:
+            logger.error(f"Worker {index} could not load model {size}: {e}")
+    send((None, "ready", None))
+
+    # The server never sends more than `replicas` windows at once
+    with ThreadPoolExecutor(max_workers=replicas, thread_name_prefix=f"worker-{index}") as executor:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                # The server exited
+                break
+            if message is None:
+                break
+            kind, *args = message
+            if kind == "decode":
+                executor.submit(decode, *args)
+            elif kind == "register":
+                size, spec = args
+                specs[size] = spec
+            elif kind == "load":
+                # Off the decode threads, which keep serving loaded models
+                threading.Thread(target=load, args=args, daemon=True).start()
+            elif kind == "unload":
+                models.discard(args[0])
+
+    rings.close()
+
+
+class WorkerExited(RuntimeError):
+    """The worker process died before it answered"""
+
+
+@dataclass
+class _Worker:
+    index: int
+    process: subprocess.Popen
+    conn: Connection
+    # Windows sent to the process and not answered yet
+    jobs: Set[int] = field(default_factory=set)
+    # Model loads sent to the process and not answered yet
+    loads: Set[int] = field(default_factory=set)
+    completed: int = 0
+    restarts: int = 0
+    ready: bool = False
+    # Set while the process is down: when to start it again
+    respawn_at: Optional[float] = None
+
+
+class InferenceProcessPool:
+    """Worker processes that decode windows of shared-memory audio rings.
+
+    Each process holds its own WhisperModel instances, so decodes run on
+    all cores without sharing the server's GIL. A window travels as a
+    RemoteWindow naming a SharedAudioRingBuffer and a sample range, never
+    as a pickled array; only the segment dicts come back. Every process
+    has one socket pair to the server, read by a single collector thread.
+
+    The server downloads the models: register() tells the workers where a
+    model's snapshot is and how to load it, load() has every worker load
+    and warm it up before it returns, unload() drops it again. Registered
+    models that are not loaded (an SLO fallback, say) are loaded on first
+    use. Workers keep their models in a ModelCache under budget_mb.
+
+    Model weights are the memory cost of a process, not of a decode slot:
+    a process loads each model once with `replicas` CTranslate2 workers
+    sharing the weights, and decodes that many windows at a time. RAM
+    grows with num_processes, CPU use with num_processes * replicas.
+
+    Workers are started as `python workers.py`, not with multiprocessing's
+    spawn, which would import the server's main module again in every
+    worker. start() is left to the first load, so no worker starts before
+    the server has a snapshot on disk. transcribe() blocks the calling
+    thread until a process has decoded the window, so it is meant for
+    scheduler worker threads, one per slot. A process that dies fails its
+    windows and is started again with the loaded models, after a growing
+    delay if it never got ready.
+    """
+
+    def __init__(
+        self,
+        num_processes: int,
+        cpu_threads: int = 0,
+        replicas: int = 1,
+        budget_mb: int = 4096,
+        warmup_seconds: float = 2.0
+    ):
+        self.num_processes = max(1, num_processes)
+        self.replicas = max(1, replicas)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.slots)
+        self.budget_mb = budget_mb
+        self.warmup_seconds = warmup_seconds
+
+        self._workers: List[_Worker] = []
+        self._pending: Dict[int, Future] = {}
+        self._job_ids = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        # Snapshot path and load options per size, and the sizes every worker loads up front
+        self._specs: Dict[str, dict] = {}
+        self._preload: List[str] = []
+
+    @property
+    def slots(self) -> int:
+        """Windows decoded at once over all processes"""
+        return self.num_processes * self.replicas
+
+    @property
+    def started(self) -> bool:
+        return self._running
+
+    @property
+    def ready(self) -> bool:
+        """At least one process is running and done loading its models"""
+        with self._condition:
+            return any(worker.ready and worker.respawn_at is None for worker in self._workers)
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            for index in range(self.num_processes):
+                self._workers.append(self._spawn(index))
+        threading.Thread(target=self._collect_results, name="process-pool-results", daemon=True).start()
+        logger.info(
+            f"Started {self.num_processes} inference processes with {self.replicas} replicas "
+            f"of {self.cpu_threads} threads each"
+        )
+
+    def shutdown(self):
+        self._running = False
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+
+    def register(self, size: str, path: str, options: Optional[dict] = None):
+        """Where a model's downloaded snapshot is, and how to load it (compute_type, cpu_threads)"""
+        spec = {"compute_type": "int8", "cpu_threads": self.cpu_threads, **(options or {})}
+        # A process is sent at most `replicas` windows at once
+        spec.update(path=path, num_workers=self.replicas)
+        with self._condition:
+            self._specs[size] = spec
+            workers = [worker for worker in self._workers if worker.respawn_at is None]
+        for worker in workers:
+            try:
+                worker.conn.send(("register", size, spec))
+            except OSError:
+                # Gets all specs when it is started again
+                pass
+
+    def load(self, size: str):
+        """Have every process load and warm up a registered model; raises if one of them can't"""
+        if size not in self._specs:
+            raise ValueError(f"Model {size} is not registered")
+        self.start()
+        with self._condition:
+            if size not in self._preload:
+                self._preload.append(size)
+            sent = [
+                self._send(worker, worker.loads, lambda job_id: ("load", job_id, size))
+                for worker in self._workers
+                if worker.respawn_at is None
+            ]
+
+        errors = []
+        for _, future in sent:
+            if future is None:
+                continue
+            try:
+                future.result()
+            except WorkerExited:
+                # Started again with this model in its preload list
+                pass
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            self.unload(size)
+            raise RuntimeError(f"Worker processes could not load model {size}: {errors[0]}")
+
+    def unload(self, size: str):
+        """Drop a model in every process, e.g. because the server evicted it"""
+        with self._condition:
+            if size in self._preload:
+                self._preload.remove(size)
+            workers = [worker for worker in self._workers if worker.respawn_at is None]
+        for worker in workers:
+            try:
+                worker.conn.send(("unload", size))
+            except OSError:
+                pass
+
+    def transcribe(self, window: RemoteWindow) -> List[dict]:
+        """Decode a window on the least busy process; raises WindowDropped if its ring is gone"""
+        with self._condition:
+            worker = self._take_worker()
+            job_id, future = self._send(worker, worker.jobs, lambda job_id: ("decode", job_id, window))
+            if future is None:
+                raise RuntimeError(f"Inference process {worker.index} is not running")
+
+        try:
+            return future.result()
+        finally:
+            with self._condition:
+                worker.jobs.discard(job_id)
+                self._condition.notify()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "processes": self.num_processes,
+                "replicas": self.replicas,
+                "cpu_threads": self.cpu_threads,
+                "models": list(self._preload),
+                "busy": sum(len(worker.jobs) for worker in self._workers),
+                "workers": [
+                    {
+                        "pid": worker.process.pid,
+                        "alive": worker.respawn_at is None,
+                        "ready": worker.ready,
+                        "in_flight": len(worker.jobs),
+                        "completed": worker.completed,
+                        "restarts": worker.restarts
+                    }
+                    for worker in self._workers
+                ]
+            }
+
+    def _send(self, worker: _Worker, jobs: Set[int], message) -> Tuple[int, Optional[Future]]:
+        """Send message(job_id) to a process and track its answer in `jobs`.
+
+        The future is None if the process died. Caller holds the lock.
+        """
+        future: Future = Future()
+        job_id = next(self._job_ids)
+        jobs.add(job_id)
+        self._pending[job_id] = future
+        try:
+            worker.conn.send(message(job_id))
+        except OSError:
+            # Died since it was picked, the collector starts it again
+            jobs.discard(job_id)
+            self._pending.pop(job_id, None)
+            self._condition.notify()
+            return job_id, None
+        return job_id, future
+
+    def _take_worker(self) -> _Worker:
+        """Wait for a ready process with a free slot, the least busy one. Caller holds the lock.
+
+        Processes still starting or loading their models get no windows.
+        Raises RuntimeError if none gets ready within READY_TIMEOUT.
+        """
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            ready = [worker for worker in self._workers if worker.ready and worker.respawn_at is None]
+            free = [worker for worker in ready if len(worker.jobs) < self.replicas]
+            if free:
+                return min(free, key=lambda worker: len(worker.jobs))
+            if ready:
+                self._condition.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("No inference process is ready")
+            self._condition.wait(remaining)
+
+    def _spawn(self, index: int) -> _Worker:
+        server_end, worker_end = socket.socketpair()
+        process = subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__),
+                "--index", str(index),
+                "--fd", str(worker_end.fileno()),
+                "--replicas", str(self.replicas),
+                "--models", json.dumps(self._specs),
+                "--preload", ",".join(self._preload),
+                "--budget-mb", str(self.budget_mb),
+                "--warmup-seconds", str(self.warmup_seconds)
+            ],
+            pass_fds=(worker_end.fileno(),)
+        )
+        worker_end.close()
+        return _Worker(index, process, Connection(server_end.detach()))
+
+    def _collect_results(self):
+        while self._running:
+            now = time.monotonic()
+            with self._condition:
+                due = [w for w in self._workers if w.respawn_at is not None and w.respawn_at <= now]
+                conns = {w.conn: w for w in self._workers if w.respawn_at is None}
+            for worker in due:
+                self._respawn(worker)
+            if not conns:
+                time.sleep(1.0)
+                continue
+
+            for conn in wait(list(conns), timeout=1.0):
+                worker = conns[conn]
+                try:
+                    job_id, status, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._on_exit(worker)
+                    continue
+                self._deliver(worker, job_id, status, payload)
+
+    def _deliver(self, worker: _Worker, job_id: Optional[int], status: str, payload):
+        with self._condition:
+            if job_id is None:
+                # Finished loading its preloaded models
+                worker.ready = True
+                self._condition.notify_all()
+                return
+            if job_id in worker.loads:
+                worker.loads.discard(job_id)
+            else:
+                worker.completed += 1
+            future = self._pending.pop(job_id, None)
+        if future is None:
+            return
+
+        if status == "ok":
+            future.set_result(payload)
+        elif status == "dropped":
+            future.set_exception(WindowDropped(payload))
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _on_exit(self, worker: _Worker):
+        if not self._running:
+            return
+        try:
+            exit_code = worker.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            worker.process.kill()
+            exit_code = worker.process.wait()
+        worker.conn.close()
+
+        # One that never got ready is likely to fail again, back off
+        delay = 0.0 if worker.ready else min(30.0, 2.0 ** worker.restarts)
+        with self._condition:
+            worker.respawn_at = time.monotonic() + delay
+            futures = [
+                self._pending.pop(job_id) for job_id in worker.jobs | worker.loads if job_id in self._pending
+            ]
+        logger.error(f"Inference process {worker.index} exited with code {exit_code}, restarting in {delay:.0f} s")
+        for future in futures:
+            future.set_exception(WorkerExited(f"Inference process {worker.index} exited"))
+
+    def _respawn(self, worker: _Worker):
+        if not self._running:
+            return
+        with self._condition:
+            replacement = self._spawn(worker.index)
+            replacement.restarts = worker.restarts + 1
+            replacement.completed = worker.completed
+            self._workers[worker.index] = replacement
+            self._condition.notify_all()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference worker process, started by InferenceProcessPool")
+    parser.add_argument("--index", type=int, required=True)
+    parser.add_argument("--fd", type=int, required=True)
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--models", default="{}", help="JSON: size to snapshot path and load options")
+    parser.add_argument("--preload", default="")
+    parser.add_argument("--budget-mb", type=int, default=4096)
+    parser.add_argument("--warmup-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    worker_main(
+        args.index,
+        Connection(args.fd),
+        args.replicas,
+        json.loads(args.models),
+        [size for size in args.preload.split(",") if size],
+        args.budget_mb,
+        args.warmup_seconds
+    )
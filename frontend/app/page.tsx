@@ -48,7 +48,7 @@ export default function Home() {
   const websocketRef = useRef<WebSocket | null>(null)
   const audioContextRef = useRef<AudioContext | null>(null)
   const audioWorkletNodeRef = useRef<AudioWorkletNode | null>(null)
-  const subtitleIdRef = useRef(0)
+  const connectionIdRef = useRef(0)
   const streamRef = useRef<MediaStream | null>(null)
   const subtitlesContainerRef = useRef<HTMLDivElement | null>(null)
   const translationsContainerRef = useRef<HTMLDivElement | null>(null)
@@ -85,6 +85,8 @@ export default function Home() {
     }
 
     setConnectionStatus('connecting')
+    // Segment ids restart with every connection
+    const connectionId = connectionIdRef.current++
     const ws = new WebSocket(`ws://localhost:8000/ws/transcribe?model=${settings.model}&vad=${settings.vadSensitivity}&instant=${settings.instantSubtitles}`)
     
     ws.onopen = () => {
@@ -95,34 +97,33 @@ export default function Home() {
     
     ws.onmessage = (event) => {
       const message = JSON.parse(event.data)
-      if (message.type === 'transcription') {
-        const isInstant = message.mode === 'instant'
-        const newSubtitle: Subtitle = {
-          text: message.data.text,
-          timestamp: Date.now(),
-          id: `subtitle-${subtitleIdRef.current++}`,
-          isInstant
-        }
+      if (message.type === 'caption') {
+        // Segments are partial -> replace* -> commit, updated in place by id
+        // Without instant subtitles only committed text is shown
+        if (!settings.instantSubtitles && message.op !== 'commit') return
+        const id = `subtitle-${connectionId}-${message.id}`
+        const isInstant = message.op !== 'commit'
         
         // Keep more history when not translating (5), less when translating (3)
         const maxSubtitles = settings.enableTranslation ? 3 : 5
         
-        if (isInstant) {
-          // For instant subtitles, just add them
-          setSubtitles(prev => [...prev, newSubtitle].slice(-maxSubtitles))
-        } else {
-          // For final subtitles, replace any instant ones from the same timeframe
-          setSubtitles(prev => {
-            // Remove recent instant subtitles (within last 3 seconds)
-            const now = Date.now()
-            const filtered = prev.filter(s => !s.isInstant || (now - s.timestamp > 3000))
-            return [...filtered, newSubtitle].slice(-maxSubtitles)
-          })
-          
-          // Trigger translation for final transcriptions
-          if (settings.enableTranslation && !isInstant) {
-            translateText(message.data.text, newSubtitle.id)
+        setSubtitles(prev => {
+          const index = prev.findIndex(s => s.id === id)
+          if (index === -1) {
+            if (!message.text) return prev
+            const newSubtitle: Subtitle = { text: message.text, timestamp: Date.now(), id, isInstant }
+            return [...prev, newSubtitle].slice(-maxSubtitles)
           }
+          // Empty text withdraws a segment that never got committed
+          if (!message.text) return prev.filter(s => s.id !== id)
+          const updated = [...prev]
+          updated[index] = { ...updated[index], text: message.text, isInstant }
+          return updated
+        })
+        
+        // Only committed text is translated
+        if (settings.enableTranslation && message.op === 'commit') {
+          translateText(message.text, id)
         }
       } else if (message.type === 'model_loading') {
         setIsLoadingModel(true)
@@ -346,15 +347,14 @@ export default function Home() {
               setModelReady(true)  // Model is now ready
               console.log(`Model ${newSettings.model} is ready`)
             } else if (statusData.is_downloading) {
-              // Still downloading - update message
-              if (!downloadProgress) {
-                setDownloadProgress({
-                  percentage: 0,
-                  status: `Laddar ner ${newSettings.model} modell...`,
-                  downloaded: '',
-                  total: ''
-                })
+              // Still downloading - show bytes, speed and time left
+              const progressResponse = await fetch(`http://localhost:8000/download-progress?model=${newSettings.model}`)
+              const progressData = await progressResponse.json()
+              if (progressData.status) {
+                setDownloadProgress(progressData)
               }
+              // Big downloads on slow links may take longer than the timeout
+              attempts = 0
             }
             
             attempts++